@@ -0,0 +1,333 @@
+"""
+Benchmark: the hot paths of signing and displaying a PSBT.
+
+Runs offline: Bitcoin Core is replaced by a stub adapter that answers the
+RPCs from precomputed data without a delay, so only the Python side of each
+operation is measured (the cost of spawning bitcoin-cli is not). Results are
+written as JSON with metadata about the environment, and can be compared
+against a saved baseline; operations slower than the baseline by more than
+the threshold are reported and make the run exit with status 1.
+
+Usage:
+    python -m benchmarks.hot_paths [--output FILE] [--baseline FILE] [--threshold RATIO]
+                                   [--filter SUBSTRING] [--repeat N]
+"""
+import argparse
+import base64
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.materialize_wallets import StubAdapter
+from crypto import bip32, secp256k1
+from crypto.mnemonic import Mnemonic
+from proof.addresses import BranchDeriver
+from proof.constants import *
+
+# Baseline the results are compared with by default
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# Slowdown (relative to the baseline) reported as a regression; timings of
+# separate runs on a busy machine easily differ by a third
+REGRESSION_THRESHOLD = 1.5
+# Minimum seconds each timed round takes (calls are repeated to reach it)
+MIN_ROUND_TIME = 0.05
+
+PSBT_INPUT_COUNTS = (1, 10, 100, 500)
+QR_CHUNK_SIZES = (100, 500, 1500)
+
+def xpub_from_xprv(xprv):
+    """The extended public key of an extended private key (without Bitcoin Core)"""
+    vbytes, depth, fingerprint, i, chaincode, key = bip32.bip32_deserialize(xprv)
+    point = secp256k1.to_affine(secp256k1.multiply_g(int.from_bytes(key[:32], 'big')))
+    public = bip32.PUBLIC[bip32.PRIVATE.index(vbytes)]
+    return bip32.bip32_serialize(public, depth, fingerprint, i, chaincode, secp256k1.compress(point))
+
+class PsbtAdapter(StubAdapter):
+    """Answers the RPCs made while validating a PSBT from precomputed data"""
+    latency = 0
+    decoded = None # the decodepsbt result
+    addresses = {} # {(descriptor, idx): address}
+
+    def respond(self, exe, args):
+        rpc = args[1] if len(args) > 1 else ""
+        if rpc == "decodepsbt":
+            return 0, json.dumps(self.decoded).encode()
+        if rpc == "analyzepsbt":
+            return 0, json.dumps({"inputs": [], "next": "signer"}).encode()
+        if rpc == "deriveaddresses":
+            lo, hi = json.loads(args[3])
+            return 0, json.dumps([self.addresses[(args[2], idx)] for idx in range(lo, hi + 1)]).encode()
+        return super().respond(exe, args)
+
+def bench_wallet():
+    """A 2-of-3 regtest wallet with keys derived from fixed entropy"""
+    from proof.wallet import Wallet, Cosigner
+    M = Mnemonic()
+    signers = []
+    for i in range(3):
+        mnemonic = M.to_mnemonic(bytes([i + 1]) * 32)
+        xpub = xpub_from_xprv(M.to_hd_master_key(M.to_seed(mnemonic), "regtest"))
+        signers.append((mnemonic, xpub, bip32.fingerprint(xpub)))
+    (mnemonic, xpub, fingerprint), cosigners = signers[0], signers[1:]
+    return Wallet(
+        mnemonic, [Cosigner(fp, x) for _, x, fp in cosigners], 2, 3, "regtest", "bench",
+        {"xpub": xpub, "fingerprint": fingerprint}
+    )
+
+def decoded_psbt(w, num_inputs):
+    """
+    A decodepsbt result that passes validate_psbt: num_inputs inputs spending
+    receive addresses, an external output and a change output
+
+    Also records the addresses it uses in PsbtAdapter.addresses.
+    """
+    fingerprints = [w.fingerprint] + [c.fingerprint for c in w.cosigners]
+
+    def entry(change, idx):
+        address, spk, ws = BranchDeriver.for_wallet(w, change).derive(idx)
+        PsbtAdapter.addresses[(w.public_descriptor(change), idx)] = address
+        pubkeys = [ws[4 + 68 * k: 4 + 68 * k + 66] for k in range(w.n)]
+        derivs = [
+            {"pubkey": pubkey, "master_fingerprint": fp, "path": f"m/{change}/{idx}"}
+            for pubkey, fp in zip(pubkeys, fingerprints)
+        ]
+        return address, spk, ws, derivs
+
+    inputs, vin = [], []
+    for idx in range(num_inputs):
+        address, spk, ws, derivs = entry(0, idx)
+        inputs.append({
+            PSBT_WITNESS_UTXO: {
+                PSBT_AMOUNT: 0.001,
+                PSBT_SCRIPTPUBKEY: {PSBT_ASM: f"0 {spk[4:]}", PSBT_HEX: spk, PSBT_TYPE: PSBT_WSH_TYPE, PSBT_ADDRESS: address}
+            },
+            PSBT_WITNESS_SCRIPT: {PSBT_ASM: "", PSBT_HEX: ws, PSBT_TYPE: "multisig"},
+            PSBT_BIP32_DERIVS: derivs
+        })
+        vin.append({PSBT_TX_TXID: f"{idx:064x}", "vout": 0})
+    change_address, change_spk, change_ws, change_derivs = entry(1, 0)
+    external = BranchDeriver(1, [bip32.derive_xpub(w.cosigners[0].xpub, 7)], 0, w.network).derive(0)
+    vout = [
+        {PSBT_TX_VALUE: 0.0005 * num_inputs, "n": 0, PSBT_SCRIPTPUBKEY: {
+            PSBT_HEX: external[1], PSBT_TYPE: PSBT_WSH_TYPE, PSBT_TX_ADDRESSES: [external[0]]}},
+        {PSBT_TX_VALUE: 0.0004 * num_inputs, "n": 1, PSBT_SCRIPTPUBKEY: {
+            PSBT_HEX: change_spk, PSBT_TYPE: PSBT_WSH_TYPE, PSBT_TX_ADDRESSES: [change_address]}},
+    ]
+    return {
+        PSBT_TX: {PSBT_TX_TXID: "00" * 32, PSBT_VSIZE: 100 * num_inputs, PSBT_TX_VIN: vin, PSBT_TX_VOUT: vout},
+        PSBT_UNKNOWN: {},
+        PSBT_INPUTS: inputs,
+        PSBT_OUTPUTS: [{}, {PSBT_WITNESS_SCRIPT: {PSBT_HEX: change_ws}, PSBT_BIP32_DERIVS: change_derivs}],
+        PSBT_FEE: 0.0001 * num_inputs
+    }
+
+def large_story():
+    """A story like a PSBT summary with many inputs: long wrapped paragraphs, colors and a QR code"""
+    from proof.utils import color_text, generate_qr, GREEN_COLOR, fg
+    paragraph = " ".join(["The following transaction spends bitcoin from this wallet."] * 20)
+    lines = [paragraph]
+    for i in range(500):
+        lines.append(f"Input {i}: {color_text('0.00100000 BTC', GREEN_COLOR, fg)} from bcrt1q{'x' * 58} (m/0/{i})")
+    lines.append(generate_qr("cHNidP8B" * 40))
+    return "\n".join(lines)
+
+def benchmarks():
+    """
+    The benchmarked operations
+
+    Returns:
+        list of (name, setup) where setup() prepares the operation and returns it as a function of no arguments
+    """
+    from proof.trie import RadixTrie
+    from proof.ux import Screen, word_wrap
+    from proof.utils import validate_psbt, generate_qr, render_qr
+    M = Mnemonic()
+    entropy = bytes(range(32))
+    mnemonic = M.to_mnemonic(entropy)
+    xpub = xpub_from_xprv(M.to_hd_master_key(M.to_seed(mnemonic), "mainnet"))
+    state = {}
+
+    def wallet():
+        if "wallet" not in state:
+            state["wallet"] = bench_wallet()
+            state["wallet"].xprv
+        return state["wallet"]
+
+    def validate(num_inputs):
+        def setup():
+            w = wallet()
+            PsbtAdapter.decoded = decoded_psbt(w, num_inputs)
+            psbt = base64.b64encode(os.urandom(100 * num_inputs)).decode()
+            def run():
+                result = validate_psbt(psbt, w)
+                assert not result["error"], result["error"]
+            return run
+        return setup
+
+    def render(size):
+        def setup():
+            chunk = base64.b64encode(os.urandom(size))[:size].decode()
+            return lambda: render_qr(chunk)
+        return setup
+
+    def cached_qr():
+        chunk = base64.b64encode(os.urandom(500)).decode()
+        generate_qr(chunk)
+        return lambda: generate_qr(chunk)
+
+    def wrap():
+        line = " ".join(["word"] * 20000)
+        return lambda: list(word_wrap(line, 80))
+
+    def layout():
+        story = large_story()
+        def run():
+            # a new screen has no cached layout, like the first draw of a story
+            screen = Screen()
+            screen.size = {"lines": 50, "columns": 100}
+            screen._resized = False
+            with contextlib.redirect_stdout(io.StringIO()):
+                screen.draw(story)
+        return run
+
+    return [
+        ("mnemonic.check", lambda: lambda: M.check(mnemonic)),
+        ("mnemonic.to_mnemonic", lambda: lambda: M.to_mnemonic(entropy)),
+        ("mnemonic.to_seed", lambda: lambda: M.to_seed(mnemonic)),
+        ("bip32.decode", lambda: lambda: bip32.decode(xpub)),
+        ("bip32.fingerprint", lambda: lambda: bip32.fingerprint(xpub)),
+        ("wallet.wsh_descriptor", lambda: lambda: wallet().wsh_descriptor(1)),
+    ] + [
+        (f"validate_psbt[{n} inputs]", validate(n)) for n in PSBT_INPUT_COUNTS
+    ] + [
+        (f"render_qr[{size} chars]", render(size)) for size in QR_CHUNK_SIZES
+    ] + [
+        ("generate_qr[cached]", cached_qr),
+        ("word_wrap[100k chars]", wrap),
+        ("ux_show_story layout[500 lines]", layout),
+        ("trie.build[bip39]", lambda: lambda: RadixTrie.build(M.wordlist)),
+    ]
+
+def measure(fn, repeat):
+    """
+    Times a function
+
+    Calls are repeated until a round takes at least MIN_ROUND_TIME.
+
+    Returns:
+        dict with the best and median seconds per call, the calls per round and the rounds
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_ROUND_TIME:
+            break
+        number *= 2 if elapsed == 0 else max(2, min(10, int(MIN_ROUND_TIME / elapsed) + 1))
+    times = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    times.sort()
+    return {"best": times[0], "median": times[len(times) // 2], "number": number, "repeat": repeat}
+
+def environment():
+    """Metadata about the machine and the code the benchmarks ran on"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Compares results with a baseline by the best time per call
+
+    Returns:
+        list of (name, baseline seconds, seconds, ratio) for the operations in both, and
+        the names of the operations slower than the baseline by more than threshold
+    """
+    rows, regressions = [], []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["best"], result["best"]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio))
+        if ratio > threshold:
+            regressions.append(name)
+    return rows, regressions
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--output", help="file to write the JSON results to (default: stdout)")
+    parser.add_argument("--baseline", default=BASELINE, help="results to compare with (default: %(default)s)")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                        help="slowdown reported as a regression (default: %(default)s)")
+    parser.add_argument("--filter", help="only run the operations whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="timed rounds per operation (default: %(default)s)")
+    args = parser.parse_args()
+
+    os.environ["HOME"] = tempfile.mkdtemp()
+    # the operations are timed without the phase log, even if it was turned on (see proof/telemetry.py)
+    os.environ["PROOF_TELEMETRY"] = "0"
+    from proof.wallet import Wallet
+    Wallet.adapter_class = PsbtAdapter
+
+    results = {}
+    for name, setup in benchmarks():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(setup(), args.repeat)
+        print(f"{name:<34} {format_seconds(results[name]['best']):>10}", file=sys.stderr)
+    report = json.dumps({"environment": environment(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+    if not os.path.exists(args.baseline):
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    rows, regressions = compare(results, baseline["results"], args.threshold)
+    env = baseline["environment"]
+    print(f"\ncompared with {args.baseline} (python {env['python']}, {env['platform']}, commit {env['commit']})",
+          file=sys.stderr)
+    for name, before, after, ratio in rows:
+        flag = "  REGRESSION" if name in regressions else ""
+        print(f"{name:<34} {format_seconds(before):>10} -> {format_seconds(after):>10} {ratio:>6.2f}x{flag}",
+              file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: loading many saved wallets serially vs concurrently.
+
+Bitcoin Core is replaced by a stub adapter that answers every bitcoin-cli
+call after a fixed delay (the cost of spawning bitcoin-cli and the RPC),
+so the benchmark runs anywhere and only measures how the work is scheduled.
+
+Usage:
+    python -m benchmarks.materialize_wallets [--latency SECONDS] [--counts 1 10 100]
+"""
+import argparse
+import asyncio as aio
+import json
+import os
+import tempfile
+import time
+
+from proof.bitcoind import BitcoindAdapter
+
+class StubAdapter(BitcoindAdapter):
+    """Answers bitcoin-cli calls after a delay without running Bitcoin Core"""
+    latency = 0.02
+
+    def respond(self, exe, args):
+        if exe == "bitcoind":
+            return 0, b""
+        rpc = args[1] if len(args) > 1 else ""
+        if rpc == "listwallets":
+            return 0, b"[]"
+        if rpc == "loadwallet": # wallets don't exist yet, so they are created
+            return 1, b"error code: -18"
+        if rpc == "createwallet":
+            return 0, json.dumps({"name": args[2], "warning": ""}).encode()
+        return 0, b"{}"
+
+    def run_subprocess(self, exe, *args):
+        time.sleep(self.latency)
+        retcode, output = self.respond(exe, args)
+        return ([exe] + list(args), retcode, output)
+
+    async def run_subprocess_async(self, exe, *args):
+        await aio.sleep(self.latency)
+        retcode, output = self.respond(exe, args)
+        return ([exe] + list(args), retcode, output)
+
+def create_wallets(count):
+    """Saves count random wallets (with their public data) to the wallet store"""
+    from crypto.mnemonic import Mnemonic
+    from proof.store import get_store
+    M = Mnemonic()
+    names = []
+    for i in range(count):
+        name = f"bench-{i}"
+        get_store().save_wallet({
+            "name": name, "network": "regtest", "m": 2, "n": 3,
+            "mnemonic": M.to_mnemonic(os.urandom(32)),
+            "xpub": "tpub", "fingerprint": f"{i:08x}", "format_version": 1,
+            "descriptors": {0: "wsh()#", 1: "wsh()#"}, "cosigners": []
+        })
+        names.append(name)
+    return names
+
+def load_serially(names):
+    from proof.wallet import Wallet
+    for name in names:
+        w = Wallet.load(name)
+        w.xprv
+        w.ensure_created()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--latency", type=float, default=StubAdapter.latency,
+                        help="seconds each stubbed bitcoin-cli call takes")
+    parser.add_argument("--counts", type=int, nargs="+", default=[1, 10, 100])
+    args = parser.parse_args()
+
+    os.environ["HOME"] = tempfile.mkdtemp()
+    from proof import bitcoind
+    from proof.wallet import Wallet, load_wallets
+    StubAdapter.latency = args.latency
+    Wallet.adapter_class = StubAdapter
+    names = create_wallets(max(args.counts))
+
+    print(f"stub RPC latency {args.latency * 1000:.0f} ms, {os.cpu_count()} cpu(s)")
+    print(f"{'wallets':>8} {'serial':>10} {'concurrent':>11} {'speedup':>8}")
+    for count in args.counts:
+        bitcoind.RUNNING_NETWORKS.clear()
+        start = time.perf_counter()
+        load_serially(names[:count])
+        serial = time.perf_counter() - start
+
+        bitcoind.RUNNING_NETWORKS.clear()
+        start = time.perf_counter()
+        aio.run(load_wallets(names[:count]))
+        concurrent = time.perf_counter() - start
+        print(f"{count:>8} {serial:>9.3f}s {concurrent:>10.3f}s {serial / concurrent:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Segwit v0 address encoding as specified in BIP 173
+# <https://github.com/bitcoin/bips/blob/master/bip-0173.mediawiki>
+
+CHARSET = "qpzry9x8gf2tvdw0s3jn54khce6mua7l"
+GENERATOR = [0x3b6a57b2, 0x26508e6d, 0x1ea119fa, 0x3d4233dd, 0x2a1462b3]
+
+# human-readable part of the addresses of each network
+HRP = {"mainnet": "bc", "testnet": "tb", "regtest": "bcrt"}
+
+def bech32_polymod(values):
+    """Internal function that computes the Bech32 checksum"""
+    chk = 1
+    for value in values:
+        top = chk >> 25
+        chk = (chk & 0x1ffffff) << 5 ^ value
+        for i in range(5):
+            chk ^= GENERATOR[i] if ((top >> i) & 1) else 0
+    return chk
+
+def bech32_hrp_expand(hrp):
+    """Expand the HRP into values for checksum computation"""
+    return [ord(x) >> 5 for x in hrp] + [0] + [ord(x) & 31 for x in hrp]
+
+def bech32_create_checksum(hrp, data):
+    """Compute the checksum values given HRP and data"""
+    values = bech32_hrp_expand(hrp) + data
+    polymod = bech32_polymod(values + [0, 0, 0, 0, 0, 0]) ^ 1
+    return [(polymod >> 5 * (5 - i)) & 31 for i in range(6)]
+
+def convertbits(data, frombits, tobits):
+    """General power-of-2 base conversion (pads the last group with zeros)"""
+    acc = 0
+    bits = 0
+    ret = []
+    maxv = (1 << tobits) - 1
+    for value in data:
+        acc = (acc << frombits) | value
+        bits += frombits
+        while bits >= tobits:
+            bits -= tobits
+            ret.append((acc >> bits) & maxv)
+    if bits:
+        ret.append((acc << (tobits - bits)) & maxv)
+    return ret
+
+def encode_segwit_address(hrp, witprog):
+    """
+    Encode a segwit v0 address
+
+    Parameters:
+        hrp       (str): human-readable part (see HRP)
+        witprog (bytes): witness program (20 or 32 bytes)
+    """
+    if len(witprog) not in (20, 32):
+        raise ValueError("Segwit v0 programs are 20 or 32 bytes")
+    data = [0] + convertbits(witprog, 8, 5)
+    return hrp + '1' + ''.join(CHARSET[d] for d in data + bech32_create_checksum(hrp, data))
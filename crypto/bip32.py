@@ -1,5 +1,7 @@
 import hashlib
+import hmac
 import binascii
+from crypto import secp256k1
 
 # Below code ASSUMES binary inputs and compressed pubkeys
 MAINNET_PRIVATE = b'\x04\x88\xAD\xE4'
@@ -48,6 +50,16 @@ def decode(s):
         else: break
     return b'\x00' * pad + res
 
+def encode(b):
+    """Encode bytes to a base58-encoded string"""
+    n = int.from_bytes(b, 'big')
+    res = ''
+    while n:
+        n, r = divmod(n, 58)
+        res = B58_DIGITS[r] + res
+    pad = len(b) - len(b.lstrip(b'\x00'))
+    return B58_DIGITS[0] * pad + res
+
 def bip32_deserialize(data):
     """
     Deserialize a string into a BIP32 extended key (assumes string is valid)
@@ -82,3 +94,45 @@ def fingerprint(xpub):
     vbytes, depth, fingerprint, i, chaincode, key = bip32_deserialize(xpub)
     fp_bytes = bin_hash160(key)[:4]
     return binascii.hexlify(fp_bytes).decode('ascii')
+
+def bip32_serialize(vbytes, depth, fingerprint, i, chaincode, key):
+    """Serialize a BIP32 extended public key (the inverse of bip32_deserialize)"""
+    data = vbytes + bytes([depth]) + fingerprint + i + chaincode + key
+    return encode(data + hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4])
+
+def ckd_pub(key, chaincode, index, point=None):
+    """
+    Public parent key -> public child key (BIP32 CKDpub)
+
+    Parameters:
+        key       (bytes): compressed parent public key
+        chaincode (bytes): parent chain code
+        index       (int): non-hardened child index
+        point     (tuple): (optional) the parent key decoded as a curve point (saves decoding it again)
+
+    Returns:
+        (compressed child public key, child chain code)
+    """
+    if not 0 <= index < 0x80000000:
+        raise ValueError("Hardened child keys can't be derived from a public key")
+    I = hmac.new(chaincode, key + index.to_bytes(4, 'big'), hashlib.sha512).digest()
+    tweak = int.from_bytes(I[:32], 'big')
+    child = None
+    if tweak < secp256k1.N:
+        child = secp256k1.tweak_add(point or secp256k1.decompress(key), tweak)
+    if child is None:
+        # probability below 2^-127; BIP32 says to proceed with the next index
+        raise ValueError(f"Child key {index} is invalid")
+    return secp256k1.compress(child), I[32:]
+
+def derive_xpub(xpub, index):
+    """
+    Derives the extended public key of a non-hardened child
+
+    Parameters:
+        xpub  (str): valid bip32 extended public key
+        index (int): non-hardened child index
+    """
+    vbytes, depth, _, _, chaincode, key = bip32_deserialize(xpub)
+    child, child_chaincode = ckd_pub(key, chaincode, index)
+    return bip32_serialize(vbytes, depth + 1, bin_hash160(key)[:4], index.to_bytes(4, 'big'), child_chaincode, child)
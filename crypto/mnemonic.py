@@ -55,12 +55,22 @@ def b58encode(v):
     return string
 
 
+_wordlist = None
+
+def load_wordlist():
+    """Reads the english wordlist on first use and shares it afterwards"""
+    global _wordlist
+    if _wordlist is None:
+        curdir = os.path.dirname(__file__)
+        with open("%s/%s.txt" % (curdir, "english"), "r", encoding="utf-8") as f:
+            _wordlist = [w.strip() for w in f.readlines()]
+    return _wordlist
+
+
 class Mnemonic(object):
     def __init__(self):
         self.radix = 2048
-        curdir = os.path.dirname(__file__)
-        with open("%s/%s.txt" % (curdir, "english"), "r", encoding="utf-8") as f:
-            self.wordlist = [w.strip() for w in f.readlines()]
+        self.wordlist = load_wordlist()
         if len(self.wordlist) != self.radix:
             raise ConfigurationError(
                 "Wordlist should contain %d words, but it contains %d words."
@@ -113,6 +123,38 @@ class Mnemonic(object):
         nh = bin(int(hashlib.sha256(nd).hexdigest(), 16))[2:].zfill(256)[: l // 33]
         return h == nh
 
+    def final_words(self, words):
+        """
+        Lists the words that complete a mnemonic with a valid checksum.
+
+        The last word of a mnemonic holds the remaining entropy bits and the
+        checksum, so only 2**(11 - checksum bits) words are valid (8 for a 24
+        word mnemonic). Each candidate is computed directly from the indexes of
+        the preceding words.
+
+        Parameters:
+            words (list[str]): every word of the mnemonic except the last
+
+        Returns:
+            list of valid final words
+        """
+        num_words = len(words) + 1
+        if num_words not in [12, 15, 18, 21, 24]:
+            raise ValueError("Mnemonic length should be one of the following: [12, 15, 18, 21, 24]")
+        acc = 0
+        for word in words:
+            idx = self.wordlist.index(word)
+            acc = (acc << 11) | idx
+        cs_bits = num_words * 11 // 33
+        free_bits = 11 - cs_bits # entropy bits held by the final word
+        ent_bytes = (num_words * 11 - cs_bits) // 8
+        candidates = []
+        for x in range(1 << free_bits):
+            entropy = ((acc << free_bits) | x).to_bytes(ent_bytes, "big")
+            checksum = hashlib.sha256(entropy).digest()[0] >> (8 - cs_bits)
+            candidates.append(self.wordlist[(x << cs_bits) | checksum])
+        return candidates
+
     @classmethod
     def to_seed(cls, mnemonic, passphrase=""):
         mnemonic = cls.normalize_string(mnemonic)
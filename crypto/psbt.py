@@ -0,0 +1,71 @@
+# Minimal reader and writer of the key-value maps of a BIP 174 PSBT
+# <https://github.com/bitcoin/bips/blob/master/bip-0174.mediawiki>
+import base64
+
+PSBT_MAGIC = b'psbt\xff'
+PSBT_GLOBAL_UNSIGNED_TX = 0x00
+PSBT_IN_NON_WITNESS_UTXO = 0x00
+
+def read_compact_size(b, pos):
+    """Reads a compact size integer at pos, returning (value, position after it)"""
+    first = b[pos]
+    if first < 0xfd:
+        return first, pos + 1
+    size = {0xfd: 2, 0xfe: 4, 0xff: 8}[first]
+    return int.from_bytes(b[pos + 1:pos + 1 + size], 'little'), pos + 1 + size
+
+def read_map(b, pos):
+    """Reads a map of (key, value) pairs at pos, returning (pairs, position after its separator)"""
+    pairs = []
+    while True:
+        key_len, pos = read_compact_size(b, pos)
+        if key_len == 0:
+            return pairs, pos
+        key, pos = b[pos:pos + key_len], pos + key_len
+        value_len, pos = read_compact_size(b, pos)
+        value, pos = b[pos:pos + value_len], pos + value_len
+        pairs.append((key, value))
+
+def serialize_map(pairs):
+    """Serializes a map of (key, value) pairs with its separator"""
+    out = b''
+    for key, value in pairs:
+        for item in (key, value):
+            n = len(item)
+            if n < 0xfd:
+                out += bytes([n])
+            else:
+                size = 2 if n <= 0xffff else 4
+                out += bytes([0xfd if size == 2 else 0xfe]) + n.to_bytes(size, 'little')
+            out += item
+    return out + b'\x00'
+
+def unsigned_tx_input_count(tx):
+    """Number of inputs of a transaction serialized without witnesses"""
+    count, _ = read_compact_size(tx, 4) # after the version
+    return count
+
+def remove_non_witness_utxos(psbt):
+    """
+    Removes the full previous transactions from the inputs of a PSBT.
+
+    Segwit inputs only need their witness UTXO; Bitcoin Core adds the full
+    previous transaction as well when it can find it.
+
+    Parameters:
+        psbt (str): base64 encoded psbt
+
+    Returns:
+        the base64 encoded psbt without non-witness UTXOs
+    """
+    b = base64.b64decode(psbt)
+    if b[:len(PSBT_MAGIC)] != PSBT_MAGIC:
+        raise ValueError("Not a PSBT")
+    global_map, pos = read_map(b, len(PSBT_MAGIC))
+    tx = dict((key[0], value) for key, value in global_map if len(key) == 1)[PSBT_GLOBAL_UNSIGNED_TX]
+    out = PSBT_MAGIC + serialize_map(global_map)
+    for _ in range(unsigned_tx_input_count(tx)):
+        input_map, pos = read_map(b, pos)
+        out += serialize_map([(k, v) for k, v in input_map if k != bytes([PSBT_IN_NON_WITNESS_UTXO])])
+    # the output maps are unchanged
+    return base64.b64encode(out + b[pos:]).decode()
@@ -0,0 +1,115 @@
+# Public key arithmetic on the secp256k1 curve (no secret data; not constant time)
+# <https://www.secg.org/sec2-v2.pdf>
+
+P = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEFFFFFC2F
+N = 0xFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFFEBAAEDCE6AF48A03BBFD25E8CD0364141
+G = (
+    0x79BE667EF9DCBBAC55A06295CE870B07029BFCDB2DCE28D959F2815B16F81798,
+    0x483ADA7726A3C4655DA4FBFC0E1108A8FD17B448A68554199C47D08FFB10D4B8
+)
+
+# Bits of the scalar handled by each window of the precomputed multiples of G
+WINDOW_BITS = 8
+
+def jacobian_double(p):
+    """Doubles a point in Jacobian coordinates (None is the point at infinity)"""
+    if p is None:
+        return None
+    x, y, z = p
+    if y == 0:
+        return None
+    yy = y * y % P
+    s = 4 * x * yy % P
+    m = 3 * x * x % P # a = 0
+    x3 = (m * m - 2 * s) % P
+    return (x3, (m * (s - x3) - 8 * yy * yy) % P, 2 * y * z % P)
+
+def jacobian_add_affine(p, q):
+    """Adds an affine point q to a point p in Jacobian coordinates"""
+    if p is None:
+        return (q[0], q[1], 1)
+    x1, y1, z1 = p
+    x2, y2 = q
+    zz = z1 * z1 % P
+    u2 = x2 * zz % P
+    s2 = y2 * zz * z1 % P
+    if u2 == x1:
+        return jacobian_double(p) if s2 == y1 else None
+    h = (u2 - x1) % P
+    r = (s2 - y1) % P
+    hh = h * h % P
+    hhh = h * hh % P
+    v = x1 * hh % P
+    x3 = (r * r - hhh - 2 * v) % P
+    return (x3, (r * (v - x3) - y1 * hhh) % P, z1 * h % P)
+
+def to_affine(p):
+    """Converts a point in Jacobian coordinates to affine coordinates"""
+    if p is None:
+        return None
+    x, y, z = p
+    zinv = pow(z, -1, P)
+    zz = zinv * zinv % P
+    return (x * zz % P, y * zz * zinv % P)
+
+_g_table = None
+
+def g_table():
+    """
+    Multiples of G for fixed-base multiplication: table[w][d] = d * 2^(WINDOW_BITS * w) * G
+
+    Built once per process (about a tenth of a second); afterwards a
+    multiplication by G is one point addition per window and no doublings.
+    """
+    global _g_table
+    if _g_table is None:
+        table = []
+        base = G
+        for _ in range((256 + WINDOW_BITS - 1) // WINDOW_BITS):
+            row = [None, base]
+            acc = (base[0], base[1], 1)
+            for _ in range(2, 1 << WINDOW_BITS):
+                acc = jacobian_add_affine(acc, base)
+                row.append(to_affine(acc))
+            table.append(row)
+            base = to_affine(jacobian_add_affine(acc, base)) # 2^WINDOW_BITS * base
+        _g_table = table
+    return _g_table
+
+def multiply_g(k):
+    """k * G in Jacobian coordinates"""
+    table = g_table()
+    mask = (1 << WINDOW_BITS) - 1
+    acc = None
+    w = 0
+    while k:
+        digit = k & mask
+        if digit:
+            acc = jacobian_add_affine(acc, table[w][digit])
+        k >>= WINDOW_BITS
+        w += 1
+    return acc
+
+def decompress(pubkey):
+    """Decodes a 33 byte compressed public key to an affine point"""
+    if len(pubkey) != 33 or pubkey[0] not in (2, 3):
+        raise ValueError("Not a compressed public key")
+    x = int.from_bytes(pubkey[1:], 'big')
+    y = pow((x * x * x + 7) % P, (P + 1) // 4, P)
+    if (x * x * x + 7 - y * y) % P:
+        raise ValueError("Public key is not on the curve")
+    if y & 1 != pubkey[0] & 1:
+        y = P - y
+    return (x, y)
+
+def compress(point):
+    """Encodes an affine point as a 33 byte compressed public key"""
+    x, y = point
+    return bytes([2 + (y & 1)]) + x.to_bytes(32, 'big')
+
+def tweak_add(point, tweak):
+    """point + tweak * G for an affine point, in affine coordinates (None if it's the point at infinity)"""
+    acc = multiply_g(tweak)
+    if acc is None:
+        return point
+    return to_affine(jacobian_add_affine(acc, point))
@@ -1,16 +1,63 @@
 import sys
+import time
+STARTED = time.perf_counter()
+import atexit
 import asyncio as aio
-import subprocess
-from proof.actions import *
 
-def is_installed(program):
-    return subprocess.call(["which", program]) == 0
+class StartupProfile:
+    """
+    Records how long each startup phase takes (see --profile-startup)
 
-async def intro():
+    Timings are printed when the program exits.
+    """
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.phases = []
+        self.started = STARTED
+
+    def phase(self, name, fn, *args):
+        """Runs fn(*args) as the named phase and returns its result"""
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def background(self, name, fn, *args):
+        """Runs fn(*args) as the named phase on a worker thread"""
+        start = time.perf_counter()
+        future = aio.get_event_loop().run_in_executor(None, fn, *args)
+        future.add_done_callback(lambda f: self.phases.append((name, time.perf_counter() - start)))
+        return future
+
+    def report(self):
+        """Prints the phase timings"""
+        if not self.enabled:
+            return
+        print("\nStartup profile:")
+        for name, seconds in self.phases:
+            print(f"  {name:<20} {seconds * 1000:8.1f} ms")
+
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Proof Wallet: the dedicated PSBT multisig UI for Bitcoin Core")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each startup phase took when exiting")
+    return parser.parse_args(argv)
+
+def check_dependencies(deps):
+    """Checks which of the given programs are on the path"""
+    import shutil
+    return {dep: shutil.which(dep) is not None for dep in deps}
+
+async def intro(profile):
     """
     Main control flow
     """
-    ch = await network_select()
+    import proof.actions as actions
+    # everything imported since the interpreter started running this file
+    profile.phases.append(("imports", time.perf_counter() - profile.started))
+    ch = await actions.network_select()
     if ch == 'q':
         sys.exit(0)
     network = {
@@ -19,16 +66,29 @@ async def intro():
         '3': "regtest"
     }[ch]
 
-    # Ensure all software dependencies are installed
-    deps_installed = False
-    deps = ['bitcoind', 'bitcoin-cli', 'qrencode', 'zbarcam', 'zbarimg']
-    while not deps_installed:
-        d = dict(map(lambda x: (x, is_installed(x)), deps))
-        deps_installed = all(d.values())
-        await diagnostic_report(d)
+    # Ensure all software dependencies are installed; only the missing ones
+    # are checked again after the user installs them
+    deps = ['bitcoind', 'bitcoin-cli', 'zbarcam', 'zbarimg']
+    d = profile.phase("dependency check", check_dependencies, deps)
+    while not all(d.values()):
+        await actions.diagnostic_report(d)
+        d.update(check_dependencies([dep for dep, ok in d.items() if not ok]))
+
+    # start bitcoind while the user finds their way around the menus. Every
+    # RPC goes through ensure_bitcoind_running, which waits for this start to
+    # finish; if it failed, the first action that needs Bitcoin Core tries
+    # again and shows the error, so it is only retrieved here
+    adapter = actions.BitcoindAdapter(network)
+    startup = profile.background("bitcoind readiness", adapter.ensure_bitcoind_running)
+    startup.add_done_callback(lambda f: f.cancelled() or f.exception())
+    registry = profile.phase("wallet discovery", actions.WalletRegistry.load, network)
+
+    await actions.home(network, registry)
+
+args = parse_args(sys.argv[1:])
+profile = StartupProfile(args.profile_startup)
+atexit.register(profile.report)
 
-    await home(network)
-    
 loop = aio.get_event_loop()
-loop.run_until_complete(intro())
+loop.run_until_complete(intro(profile))
 loop.close()
@@ -0,0 +1,2 @@
+# Recorded with the telemetry log (see proof/telemetry.py)
+__version__ = "0.1.0"
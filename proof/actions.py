@@ -1,21 +1,30 @@
 import asyncio as aio
+import math
 import subprocess
 import sys
 import os
+import threading
 from hashlib import sha256
 from binascii import hexlify
 from decimal import Decimal
-
-from proof.ux import ux_show_story
-from proof.wallet import Wallet, Cosigner
-from proof.trie import Trie
+from collections import deque
+
+from proof.ux import ux_show_story, CANCEL_KEYS
+from proof.wallet import Wallet, Cosigner, WalletRegistry, GAP_LIMIT
+from proof.utxos import format_btc
+from proof.profiling import profiled
+from proof import telemetry
+from proof.trie import bip39_trie
+from proof.fountain import FountainEncoder, is_fountain_part, max_fragment_len
+from proof.scanner import QRScanner
+from proof import qr
 from proof.utils import *
 from proof.constants import *
 from crypto.mnemonic import Mnemonic
 from crypto import bip32
 
-# In-memory cache of wallets
-WALLETS_GLOBAL = []
+# Wallets known to this session (see home)
+REGISTRY = WalletRegistry()
 
 async def network_select():
     """Select the Bitcoin network to use for the given session."""
@@ -39,23 +48,33 @@ async def diagnostic_report(d):
     msg += "\nOnce all the programs are installed, press ENTER to proceed."
     return await ux_show_story(msg, ['\r'])
 
-async def home(network):
-    """Proof Wallet home menu"""
-    for w in get_all_wallets():
-        WALLETS_GLOBAL.append(w)
+async def home(network, registry=None):
+    """
+    Proof Wallet home menu
+
+    Parameters:
+        network            (str): the network used this session
+        registry (WalletRegistry): wallets discovered on the filesystem at startup
+    """
+    global REGISTRY
+    if registry is not None:
+        REGISTRY = registry
     while True:
         msg = "Proof Wallet: Home\n\n"
         msg += "1) Create wallet\n"
         msg += "2) Load wallet\n"
         msg += "3) Restore wallet\n"
-        msg += "4) Exit\n"
-        ch = await ux_show_story(msg, ['1', '2', '3', '4'])
+        msg += "4) Find an address\n"
+        msg += "5) Exit\n"
+        ch = await ux_show_story(msg, ['1', '2', '3', '4', '5'])
         if ch == '1':
             await create_wallet(network)
         elif ch == '2':
             await load_wallet(network)
         elif ch == '3':
             await restore_wallet(network)
+        elif ch == '4':
+            await find_address(network)
         else:
             sys.exit(0)
 
@@ -176,17 +195,11 @@ Controls
 async def choose_bip39_words():
     """Interaction for selecting a BIP39 mnemonic phrase."""
 
-    # build Trie of bip39 wordlist
-    curdir = os.path.dirname(__file__)
-    f =  open(f"{curdir}/../crypto/english.txt", "r", encoding="utf-8")
-    wordlist = [w.strip() for w in f.readlines()]
-    trie = Trie()
-    for word in wordlist:
-        trie.add(word)
+    # radix trie of the bip39 wordlist (built once and shared)
+    trie = bip39_trie()
     # choose 24 words to create a complete mnemonic
     mnemonic = []
     cur = trie
-    prefix = ""
     while len(mnemonic) < 24: # escape when the mnemonic is complete
         msg_prefix = f"""Proof Wallet: Restore Wallet
 
@@ -194,48 +207,30 @@ Selected words: {" ".join(mnemonic)}
 
 Choose word #{len(mnemonic) + 1}:
 """
-        options = []
-        items = list(cur.children.items())
-        for c, child_trie in items:
-            # child trie contains one word
-            # child trie contains multiple direct children
-            # child trie contains multiple indirect
-            suffix = c
-            tmp = child_trie
-            while tmp.word_finished == False and len(tmp.children.items()) == 1:
-                next_char, tmp_child = list(tmp.children.items())[0]
-                suffix += next_char
-                tmp = tmp_child
-            if not tmp.word_finished: # multiple possible prefixes
-                options.append( (prefix + suffix + "*", c, False) )
-            elif len(tmp.children) == 0: # word is finished and no other prefixes below
-                options.append( (prefix + suffix, c, True) )
-            else: # word is finished and there are other prefixes
-                options.append( (prefix + suffix, c, True) )
-                options.append( (prefix + suffix + "*", c, False) )
-        idx = await choose_from_list(msg_prefix, list(map(lambda x: x[0], options)))
+        if len(mnemonic) == 23:
+            # only a few final words give a valid checksum; offer just those
+            candidates = Mnemonic().final_words(mnemonic)
+            idx = await choose_from_list(msg_prefix, candidates)
+            if idx is None:
+                mnemonic.pop()
+            else:
+                mnemonic.append(candidates[idx])
+            continue
+        idx = await choose_from_list(msg_prefix, cur.labels)
         if idx is None and cur.parent is not None: # go up a level
             cur = cur.parent
-            prefix = prefix[:-1]
         elif idx is None and len(mnemonic) > 0: # remove last chosen word
             mnemonic.pop()
             cur = trie
-            prefix = ""
         elif idx is None: # return to last menu
             return None
         else:
-            chosen_str, c, finished = options[idx]
-            child_trie = cur.children[c]
-            prefix += c
-            while child_trie.word_finished == False and len(child_trie.children.items()) == 1:
-                next_char, child_trie = list(child_trie.children.items())[0]
-                prefix += next_char
-            if finished:
-                mnemonic.append(prefix)
+            label, word, child = cur.options[idx]
+            if word is not None:
+                mnemonic.append(word)
                 cur = trie
-                prefix = ""
             else:
-                cur = child_trie
+                cur = child
     return " ".join(mnemonic)
 
 async def export_xpub(xpub):
@@ -263,6 +258,7 @@ Displayed data: {xpub}\n\n
         if ch == 'x':
             return
 
+@profiled
 async def restore_wallet(network):
     """Restore a wallet from a saved BIP39 phrase."""
 
@@ -306,9 +302,10 @@ Controls
     if ch == 'x':
         return
     w = Wallet(mnemonic, [], M, N, network)
-    WALLETS_GLOBAL.append(w)
+    REGISTRY.add(w)
     return await wallet_menu(w)
 
+@profiled
 async def create_wallet(network):
     """Create a new wallet with user-supplied entropy."""
 
@@ -376,11 +373,27 @@ Controls
     if ch == 'x':
         return
     w = Wallet(mnemonic, [], M, N, network)
-    WALLETS_GLOBAL.append(w)
+    REGISTRY.add(w)
     return await wallet_menu(w)
 
+@profiled
 async def finalize_wallet(w):
     """Finalize a multisig wallet by adding cosigner xpubs/fingerprints."""
+    # keep the camera on while all of the cosigner xpubs are imported
+    async with QRScanner() as scanner:
+        return await import_cosigners(w, scanner)
+
+async def import_cosigners(w, scanner):
+    """
+    Interaction for importing cosigner xpubs/fingerprints via QR code.
+
+    Parameters:
+        w          (Wallet): the wallet to finalize
+        scanner (QRScanner): scanner session used for every import
+
+    Returns:
+        the finalized wallet, or the original wallet if the user aborts
+    """
 
     title = "Proof Wallet: Finalize Wallet"
     # import N xpubs flow
@@ -396,7 +409,8 @@ async def finalize_wallet(w):
         if num_remaining == 0:
             # regenerate wallet with xpubs
             cosigners = list(map(lambda x: Cosigner(x[0], x[1]), cosigner_xpubs))
-            w_updated = Wallet(w.mnemonic, cosigners, w.m, w.n, w.network)
+            w_updated = Wallet(w.mnemonic, cosigners, w.m, w.n, w.network, w.name,
+                               {"xpub": w.xpub, "fingerprint": w.fingerprint})
             msg = f"""{title}
 
 {w.name} has now been finalized with the following cosigners:
@@ -408,9 +422,8 @@ You can now use this wallet to receive bitcoin and sign PSBTs.
 Press [Enter] to go to the wallet menu.
 """
             await ux_show_story(msg, ['\r'])
-            # update the wallet in WALLETS_GLOBAL
-            idx = list(map(lambda w: w.name, WALLETS_GLOBAL)).index(w.name)
-            WALLETS_GLOBAL[idx] = w_updated
+            # replace the wallet in the registry
+            REGISTRY.add(w_updated)
             return w_updated
 
         # wallet is not yet complete
@@ -423,32 +436,58 @@ left to import. The following list shows the cosigner xpubs you have imported so
 
 Controls:
 [Enter] -- initiate the qr code scanner
+'i'     -- import cosigner xpubs from photos of their QR codes
 'x'     -- abort finalize wallet process
 """
-        ch = await ux_show_story(msg, ['\r', 'x'])
+        ch = await ux_show_story(msg, ['\r', 'i', 'x'])
         if ch == 'x':
             return w
-        xpub = await scan_qr()
-        if not is_valid_xpub(xpub, w.network):
-            msg = f"""{title}
+        elif ch == 'i':
+            xpubs = await import_qr_images(title)
+            if xpubs is None:
+                continue
+        else:
+            scanner.flush() # ignore anything decoded while the menu was shown
+            xpubs = [await scan_qr(scanner)]
+
+        for xpub in xpubs[:num_remaining]:
+            if not is_valid_xpub(xpub, w.network):
+                msg = f"""{title}
 
 Import Error
 The data you attempted to import {xpub} is not a valid extended \
 public key.
 
 Controls:
-[Enter] -- retry the import
+[Enter] -- continue the import
 'x'     -- abort finalize wallet process
 """
-            ch = await ux_show_story(msg, ['\r', 'x'])
-            if ch == '\r':
+                ch = await ux_show_story(msg, ['\r', 'x'])
+                if ch == '\r':
+                    scanner.forget() # allow the same QR code to be scanned again
+                    continue
+                return w
+            if not await import_data_warning(xpub):
+                scanner.forget()
                 continue
-            return
-        if await import_data_warning(xpub):
-            derived_fingerprint = bip32.fingerprint(xpub)
-            input_fingerprint = ""
-            while True:
-                msg = f"""{title}
+            fingerprint = await choose_cosigner_fingerprint(title, xpub)
+            cosigner_xpubs.append((fingerprint, xpub))
+
+async def choose_cosigner_fingerprint(title, xpub):
+    """
+    Interaction for confirming the fingerprint of an imported cosigner xpub.
+
+    Parameters:
+        title (str): title of the finalize wallet screens
+        xpub  (str): the imported cosigner xpub
+
+    Returns:
+        the derived fingerprint or the fingerprint entered manually by the user
+    """
+    derived_fingerprint = bip32.fingerprint(xpub)
+    input_fingerprint = ""
+    while True:
+        msg = f"""{title}
 
 If the cosigner you imported is from another Proof Wallet or has \
 no hardened derivation (i.e. it's derivation is 'm'), the cosigner \
@@ -463,40 +502,31 @@ Controls:
 Derived fingerprint: {derived_fingerprint}
 Input fingerprint: {input_fingerprint}
 """
-                ch = await ux_show_story(msg, ['\r', 'u'] + HEX_CHARS)
-                if ch == '\r' and input_fingerprint == "":
-                    cosigner_xpubs.append((derived_fingerprint, xpub))
-                    break
-                elif ch == '\r' and len(input_fingerprint) == FINGERPRINT_LENGTH:
-                    cosigner_xpubs.append((input_fingerprint, xpub))
-                    break
-                elif ch in HEX_CHARS and len(input_fingerprint) < FINGERPRINT_LENGTH:
-                    input_fingerprint += ch
-                elif ch == 'u':
-                    input_fingerprint = input_fingerprint[:-1]
-
-async def view_receive_addresses(w):
-    """Show receive addresses for a given wallet."""
-    title = "Proof Wallet: View Receive Addresses"
-    start = 0
-    N = 10
-    while True:
-        external = w.deriveaddresses(start, start + N - 1, 0)
-        internal = w.deriveaddresses(start, start + N - 1, 1)
-
-        # display receive addreses
-        addr_str = "Derivation | Receive Address\n"
-        for i, addr in enumerate(external):
-            addr_str += f"m/0/{str(i + start)} | "
-            addr_str += f"{color_text(addr, GREEN_COLOR, fg)}\n"
-
-        # display change addreses
-        addr_str += f"\nDerivation | Change Address\n"
-        for i, addr in enumerate(internal):
-            addr_str += f"m/1/{str(i + start)} | "
-            addr_str += f"{color_text(addr, YELLOW_COLOR, fg)}\n"
-
-        msg = f"""{title}
+        ch = await ux_show_story(msg, ['\r', 'u'] + HEX_CHARS)
+        if ch == '\r' and input_fingerprint == "":
+            return derived_fingerprint
+        elif ch == '\r' and len(input_fingerprint) == FINGERPRINT_LENGTH:
+            return input_fingerprint
+        elif ch in HEX_CHARS and len(input_fingerprint) < FINGERPRINT_LENGTH:
+            input_fingerprint += ch
+        elif ch == 'u':
+            input_fingerprint = input_fingerprint[:-1]
+
+def format_addresses_page(title, start, N, external, internal):
+    """Formats a page of receive and change addresses starting at the given index"""
+    # display receive addreses
+    addr_str = "Derivation | Receive Address\n"
+    for i, addr in enumerate(external):
+        addr_str += f"m/0/{str(i + start)} | "
+        addr_str += f"{color_text(addr, GREEN_COLOR, fg)}\n"
+
+    # display change addreses
+    addr_str += f"\nDerivation | Change Address\n"
+    for i, addr in enumerate(internal):
+        addr_str += f"m/1/{str(i + start)} | "
+        addr_str += f"{color_text(addr, YELLOW_COLOR, fg)}\n"
+
+    return f"""{title}
 
 Addresses {start} to {start + N - 1}
 
@@ -505,16 +535,107 @@ Addresses {start} to {start + N - 1}
 Controls
 'n' -- Next {N} addresses
 'p' -- Previous {N} addresses
+'j' -- Jump to an address index
 'x' -- Go back to wallet menu
 """
-        ch = await ux_show_story(msg, ['n', 'p', 'x'])
+
+def addresses_page_size(title):
+    """Number of addresses per branch that fit on the terminal"""
+    base = len(wrap_lines(format_addresses_page(title, 0, 0, [], []), get_terminal_size()['columns']))
+    return max(1, (get_terminal_size()['lines'] - base) // 2)
+
+@profiled
+async def view_receive_addresses(w):
+    """
+    Show receive addresses for a given wallet.
+
+    Pages are sized to the terminal, kept in an LRU cache and the neighbouring
+    pages are derived in the background while the current one is displayed.
+    """
+    title = "Proof Wallet: View Receive Addresses"
+    if not await require_verified(w, title):
+        return
+    pages = AddressPages(w)
+    # start at the first receive address that hasn't been used (see scan_addresses)
+    start = w.highest_used[0] + 1
+    while True:
+        N = addresses_page_size(title)
+        # the last page ends at the highest unhardened index
+        start = min(start, MAX_ADDRESS_INDEX + 1 - N)
+        if not (pages.is_ready(0, start, N) and pages.is_ready(1, start, N)):
+            ux_show_message(f"{title}\n\nDeriving addresses {start} to {start + N - 1}...")
+        try:
+            external, internal = await aio.gather(pages.get(0, start, N), pages.get(1, start, N))
+        except subprocess.CalledProcessError as e:
+            await ux_show_story(f"{title}\n\nCould not derive the addresses:\n\n{e.output.decode(errors='replace').strip()}\n\nPress [Enter] to go back.", ['\r'])
+            return
+        pages.prefetch(start, N)
+
+        msg = format_addresses_page(title, start, N, external, internal)
+        ch = await ux_show_story(msg, ['n', 'p', 'j', 'x'])
         if ch == 'n':
             start = start + N
         elif ch == 'p' and start > 0:
-            start = start - N
+            start = max(0, start - N)
+        elif ch == 'j':
+            index = await ux_input(f"{title}\n\nEnter the address index to jump to (at most {MAX_ADDRESS_INDEX}):")
+            if index is not None and index.strip().isdigit():
+                start = int(index.strip())
         elif ch == 'x':
             return
 
+def format_usage(highest_used):
+    """Describes the highest used address of each branch"""
+    def describe(change, idx):
+        return f"m/{change}/{idx}" if idx >= 0 else "none"
+    return f"""Highest used receive address: {describe(0, highest_used[0])}
+Highest used change address: {describe(1, highest_used[1])}"""
+
+async def scan_addresses(w):
+    """Scans the UTXO set for the wallet's used addresses up to the gap limit."""
+    title = "Proof Wallet: Scan for Used Addresses"
+    if not await require_verified(w, title):
+        return
+    msg = f"""{title}
+
+{format_usage(w.highest_used)}
+
+Bitcoin Core will scan the UTXO set for coins held by this wallet's receive and \
+change addresses, {GAP_LIMIT} addresses at a time, until {GAP_LIMIT} consecutive \
+addresses are unused. Only addresses that still hold coins are found. Every batch \
+reads the entire UTXO set, which can take a few minutes.
+
+Controls
+[Enter] -- Start scanning
+'x'     -- Go back to wallet menu
+"""
+    if await ux_show_story(msg, ['\r', 'x']) == 'x':
+        return
+
+    def progress(next_start, highest_used):
+        ux_show_message(f"""{title}
+
+Scanned receive addresses up to m/0/{next_start[0] - 1}
+Scanned change addresses up to m/1/{next_start[1] - 1}
+
+{format_usage(highest_used)}
+
+Scanning...""")
+
+    progress({0: 0, 1: 0}, w.highest_used)
+    try:
+        highest_used = await w.scan_usage(progress=progress)
+        result = format_usage(highest_used)
+    except subprocess.CalledProcessError as e:
+        result = f"The scan failed:\n\n{e.output.decode(errors='replace').strip()}"
+    msg = f"""{title}
+
+{result}
+
+Press [Enter] to go back to the wallet menu.
+"""
+    await ux_show_story(msg, ['\r'])
+
 async def show_mnemonic(w):
     """Display BIP39 mnemonic phrase for wallet."""
 
@@ -532,18 +653,80 @@ Controls
 """
     return await ux_show_story(msg, ['\r'])
 
+def verification_status(w):
+    """Line shown in the wallet menu while or after verifying the wallet's persisted public data"""
+    if w.verification is None:
+        return ""
+    if not w.verification.done():
+        return "Verifying stored public key data...\n"
+    if w.verification.exception() is not None:
+        return color_text("Could not verify stored public key data (is bitcoind running?)", ORANGE_COLOR, fg) + "\n"
+    mismatches = w.verification.result()
+    if mismatches:
+        return color_text(f"Stored {', '.join(mismatches)} did not match the mnemonic and were recomputed", RED_COLOR, fg) + "\n"
+    return ""
+
+async def require_verified(w, title):
+    """
+    Waits for the wallet's stored public key data to be checked against its
+    mnemonic. Addresses, PSBT validation and lookups must not use data that
+    failed the check (e.g. a tampered or stale wallet store).
+
+    Parameters:
+        w  (Wallet): the wallet about to be used
+        title (str): title of the interaction shown while waiting or on failure
+
+    Returns:
+        True if the wallet can be used; otherwise the user was told why not
+    """
+    if w.verification is not None and not w.verification.done():
+        ux_show_message(f"{title}\n\nVerifying the stored public key data of {w.name}...")
+    try:
+        mismatches = await w.verified_public_data()
+    except Exception as e:
+        reason = f"The stored public key data of {w.name} could not be verified (is bitcoind running?):\n\n{e}"
+    else:
+        if not mismatches:
+            return True
+        reason = f"""The stored {', '.join(mismatches)} of {w.name} did not match its mnemonic. \
+They were recomputed from the mnemonic; restart Proof Wallet before using this wallet again."""
+    await ux_show_story(f"{title}\n\n{color_text(reason, RED_COLOR, fg)}\n\nPress [Enter] to go back.", ['\r'])
+    return False
+
+def balance_status(w):
+    """Line shown in the wallet menu with the balance from the wallet's UTXO cache"""
+    if w.utxo_sync is None:
+        return ""
+    cache = w.utxos
+    updating = not w.utxo_sync.done()
+    failed = not updating and w.utxo_sync.exception() is not None
+    if not cache.synced:
+        if updating:
+            return "Balance: scanning the UTXO set...\n"
+        return color_text("Could not load the balance (is bitcoind running?)", ORANGE_COLOR, fg) + "\n" if failed else ""
+    line = f"Balance: {format_btc(cache.balance())} BTC in {len(cache.utxos)} UTXOs (block {cache.height})"
+    if updating:
+        line += " updating..."
+    elif failed:
+        line += " " + color_text("could not update (is bitcoind running?)", ORANGE_COLOR, fg)
+    return line + "\n"
+
 async def wallet_menu(w):
     """Wallet home menu."""
-    header = f"""Proof Wallet: Wallet Menu
+    if is_complete(w):
+        # apply the blocks mined since the wallet was last opened
+        w.start_utxo_sync()
+    while True:
+        pending = any(task is not None and not task.done() for task in (w.verification, w.utxo_sync))
+        header = f"""Proof Wallet: Wallet Menu
 
 Wallet Name: {w.name}
 Fingerprint: {w.fingerprint}
 Policy: {w.m} of {w.n}
 Network: {w.network}
 Highest hardened derivation path: {"'m'"}
-
+{verification_status(w)}{balance_status(w)}
 """
-    while True:
         if is_complete(w):
             cosigner_info = ""
             for cosigner in w.cosigners:
@@ -558,10 +741,14 @@ What would you like to do?
 3) Sign PSBT
 4) Show mnemonic
 5) Save Wallet
-6) Go back
+6) Scan for used addresses
+7) Create PSBT
+8) Go back
 """
-            ch = await ux_show_story(msg, ['1', '2', '3', '4', '5', '6'])
-            if ch == '1':
+            ch = await ux_show_story(msg, ['1', '2', '3', '4', '5', '6', '7', '8'], timeout=0.25 if pending else None)
+            if ch is None: # redraw once the background tasks finish
+                continue
+            elif ch == '1':
                 await export_xpub(w.xpub)
             elif ch == '2':
                 await view_receive_addresses(w)
@@ -572,6 +759,10 @@ What would you like to do?
             elif ch == '5':
                 if await save_wallet_confirm(w):
                     w.save()
+            elif ch == '6':
+                await scan_addresses(w)
+            elif ch == '7':
+                await create_psbt(w)
             else:
                 return
         else:
@@ -583,8 +774,10 @@ What would you like to do?
 4) Save Wallet
 5) Go back
 """
-            ch = await ux_show_story(msg, ['1', '2', '3', '4', '5'])
-            if ch == '1':
+            ch = await ux_show_story(msg, ['1', '2', '3', '4', '5'], timeout=0.25 if pending else None)
+            if ch is None: # redraw once the background tasks finish
+                continue
+            elif ch == '1':
                 await export_xpub(w.xpub)
             elif ch == '2':
                 w = await finalize_wallet(w)
@@ -601,14 +794,90 @@ async def load_wallet(network):
     title = "Proof Wallet: Load Wallet"
     # choose wallet to finalize
     msg_prefix = f"{title}\n\nChoose a {network} wallet to load"
-    wallets = list(filter(lambda w: w.network == network, WALLETS_GLOBAL))
-    wallet_names = list(map(lambda w: w.name + " " + ("[FINALIZED]" if is_complete(w) else "[NOT FINALIZED]"), wallets))
+    wallets = REGISTRY.for_network(network)
+    wallet_names = list(map(lambda w: w.name + " " + ("[FINALIZED]" if w.finalized else "[NOT FINALIZED]"), wallets))
     idx = await choose_from_list(msg_prefix, wallet_names)
     if idx == None: # user wants to go back
         return
-    w = wallets[idx]
+    w = REGISTRY.get(wallets[idx].name)
+    # the wallet opens with its persisted public data; check it in the background
+    w.start_verification()
     return await wallet_menu(w)
 
+async def find_address(network):
+    """
+    Interaction to find which wallet and derivation path an address belongs to.
+
+    All finalized wallets on the network are searched (see proof/lookup.py).
+
+    Parameters:
+        network (str): the network used this session
+    """
+    from proof.lookup import lookup_address, LOOKUP_MAX_INDEX # loads multiprocessing and the store
+    title = "Proof Wallet: Find an Address"
+    names = [e.name for e in REGISTRY.for_network(network) if e.finalized]
+    if not names:
+        await ux_show_story(f"{title}\n\nThere are no finalized {network} wallets to search.\n\nPress [Enter] to go back.", ['\r'])
+        return
+    address = await ux_input(f"{title}\n\nEnter the address to find ([Esc] to go back):")
+    if not address:
+        return
+    ux_show_message(f"{title}\n\nLoading {len(names)} wallets...")
+    try:
+        wallets = await REGISTRY.get_many(names)
+    except subprocess.CalledProcessError as e:
+        await ux_show_story(f"{title}\n\nCould not load the wallets:\n\n{e.output.decode(errors='replace').strip()}\n\nPress [Enter] to go back.", ['\r'])
+        return
+    for w in wallets:
+        # the derived addresses are recorded in the address index
+        w.start_verification()
+    for w in wallets:
+        if not await require_verified(w, title):
+            return
+    searched = {"derivations": 0, "index": 0}
+    def progress(derivations, index):
+        searched.update(derivations=derivations, index=index)
+
+    # the search runs on a worker thread; [Esc] stops it after the batch being derived
+    cancel = threading.Event()
+    loop = aio.get_event_loop()
+    search = loop.run_in_executor(None, lambda: lookup_address(address, wallets, progress=progress, cancel=cancel))
+    while not search.done():
+        status = "Stopping..." if cancel.is_set() else "Press [Esc] to stop searching."
+        msg = f"""{title}
+
+Searching {len(names)} wallets for {address}...
+
+Searched the first {searched['index']} of {LOOKUP_MAX_INDEX} receive and change addresses ({searched['derivations']} derivations)
+
+{status}"""
+        if await ux_show_story(msg, CANCEL_KEYS, timeout=0.25) in CANCEL_KEYS:
+            cancel.set()
+    result = search.result()
+    stats = f"{result['derivations']} derivations in {result['seconds']:.2f} seconds"
+    if result["cancelled"]:
+        msg = f"""{title}
+
+The search for {result['address']} was stopped after the first {searched['index']} receive and change addresses of {len(names)} wallets ({stats}). The addresses derived so far were indexed, so the next search continues from there.
+"""
+    elif result["wallet"] is None:
+        msg = f"""{title}
+
+{color_text(f"{result['address']} was not found", RED_COLOR, fg)} in the first {LOOKUP_MAX_INDEX} receive and change addresses of {len(names)} wallets ({stats}).
+"""
+    else:
+        source = "the address index" if result["source"] == "index" else stats
+        msg = f"""{title}
+
+Address: {result['address']}
+Wallet:  {result['wallet']}
+Path:    m/{result['change']}/{result['idx']} ({"change" if result['change'] else "receive"})
+
+Found using {source}.
+"""
+    await ux_show_story(msg + "\nPress [Enter] to go back.", ['\r'])
+
+@telemetry.traced("display")
 async def display_psbt(w, psbt, analyze_result):
     """
     Display a PSBT in user-friendly format and ask user to sign.
@@ -673,20 +942,11 @@ Press 'x' to abort the signing process and return to the Wallet Menu.
 """
     return await ux_show_story(msg, ["\r", 'x'])
 
-async def export_psbt(psbt):
-    """Exports a base64 encoded psbt in a batch of QR codes."""
+def export_psbt_page(i, num_chunks, chunk, qr_code):
+    """Screen showing one static QR code (and its text) of an exported psbt"""
+    return f"""Proof Wallet: Sign PSBT [Export]
 
-    CHUNK_SIZE = 200 # don't display a QR code larger than CHUNK_SIZE bytes
-    chunked = [
-        # get chunk of bytes, convert to base64 bytes and decode to string
-        psbt[i: i + CHUNK_SIZE]
-        for i in range(0, len(psbt), CHUNK_SIZE)
-    ]
-    i = 0
-    while True:
-        msg = f"""Proof Wallet: Sign PSBT [Export]
-
-The following QR code is part {i+1}/{len(chunked)} of the PSBT you signed. \
+The following QR code is part {i+1}/{num_chunks} of the PSBT you signed. \
 You should scan each part with your phone and transfer them to a watch-only-wallet, \
 where you can recombine the parts and combine them with other PSBTs you've \
 signed, finalize the transaction, and broadcast it to the Bitcoin network.
@@ -694,45 +954,113 @@ signed, finalize the transaction, and broadcast it to the Bitcoin network.
 Controls:
 'n' -- view next QR code
 'p' -- view previous QR code
+'a' -- switch to an animated QR code
 'x' -- go back Wallet menu
 
-{chunked[i]}\n\n
-{generate_qr(chunked[i])}
+{chunk}\n\n
+{qr_code}
 """
-        ch = await ux_show_story(msg, ['n', 'p', 'x'])
+
+def export_psbt_animated_page(num_fragments, fps, qr_code):
+    """Screen showing one frame of the animated QR code of an exported psbt"""
+    return f"""Proof Wallet: Sign PSBT [Export]
+
+The following animated QR code contains the PSBT you signed, split into \
+{num_fragments} fragments. Keep scanning it with an animated QR capable \
+watch-only-wallet until the whole PSBT has been received. Missed frames don't \
+matter: any sufficiently large set of frames reconstructs the PSBT.
+
+Controls:
+'a' -- switch to static QR codes
+'+' -- speed up the animation (currently {fps} frames per second)
+'-' -- slow down the animation
+'x' -- go back Wallet menu
+
+{qr_code}
+"""
+
+@telemetry.traced("qr_export")
+async def export_psbt(psbt, fps=QR_ANIMATION_FPS):
+    """
+    Exports a base64 encoded psbt in a batch of QR codes.
+
+    The psbt can either be paged through as static chunks or displayed as an
+    animated QR code whose frames are fountain encoded, so that the receiver
+    can reconstruct the psbt from any sufficiently large subset of frames.
+    In both cases each QR code is as dense as the terminal can display.
+
+    Parameters:
+        psbt (str): base64 encoded psbt
+        fps (float): frames per second of the animated QR code
+    """
+
+    # size chunks so that each QR code fills (but fits on) the terminal
+    chunk_size = max_qr_payload(qr.MODE_BYTE, lambda chunk, qr_code: export_psbt_page(998, 999, chunk, qr_code))
+    chunked = [
+        psbt[i: i + chunk_size]
+        for i in range(0, len(psbt), chunk_size)
+    ]
+    part_size = max_qr_payload(qr.MODE_ALPHANUMERIC, lambda part, qr_code: export_psbt_animated_page(999, 99, qr_code))
+    fragment_size = max_fragment_len(part_size, len(psbt), FOUNTAIN_TYPE_PSBT)
+    encoder = FountainEncoder(psbt.encode(), fragment_size, FOUNTAIN_TYPE_PSBT)
+
+    telemetry.annotate(chars=len(psbt), chunks=len(chunked), fragments=encoder.seq_len)
+
+    # render every QR code up front so that navigating between them is instant
+    chunk_qrs = prerender_qrs(chunked)
+    # the animation shows a new fountain part in every frame for as long as it
+    # runs (after the fragments themselves, parts mix random fragments), so a
+    # receiver that missed frames keeps getting new information; a few frames
+    # are rendered ahead once the animation is requested
+    frames = deque()
+    animated = False
+    i = 0
+    while True:
+        if animated:
+            while len(frames) < QR_FRAMES_AHEAD:
+                frames.append(render_qr_async(encoder.next_part()))
+            msg = export_psbt_animated_page(encoder.seq_len, fps, await frames.popleft())
+            ch = await ux_show_story(msg, ['a', '+', '-', 'x'], timeout=1 / fps)
+        else:
+            msg = export_psbt_page(i, len(chunked), chunked[i], await chunk_qrs[i])
+            ch = await ux_show_story(msg, ['n', 'p', 'a', 'x'])
         if ch == 'n' and i < len(chunked) - 1:
             i += 1
         elif ch == 'p' and i > 0:
             i -= 1
+        elif ch == 'a':
+            animated = not animated
+        elif ch == '+':
+            fps = min(QR_ANIMATION_MAX_FPS, fps + 1)
+        elif ch == '-':
+            fps = max(1, fps - 1)
         elif ch == 'x':
             return
 
-async def sign_psbt(w):
+@telemetry.traced("qr_import")
+async def import_psbt():
     """
-    Interaction for wallet to sign psbt.
-
-    Includes import psbt in a batch of QR codes, performing automated
-    validations on the imported data, displaying a summarized view of
-    the transaction for the user to evaluate / sign.
+    Interaction to import a base64 encoded psbt via QR code, in chunks or as
+    an animated QR code. The camera stays on for the whole import.
 
-    Parameters:
-        w (Wallet): the wallet that would perform the signing role
+    Returns:
+        list of the imported chunks of the psbt (None if the import was aborted)
     """
-
-    # import psbt in chunks via QR code
-    psbt_raw_lst = []
-    while True:
-        psbt_str = ""
-        for part in psbt_raw_lst:
-            psbt_str += f"\t{part}\n\n"
-        msg = f"""Proof Wallet: Sign PSBT [Import]
+    async with QRScanner() as scanner:
+        psbt_raw_lst = []
+        while True:
+            psbt_str = ""
+            for part in psbt_raw_lst:
+                psbt_str += f"\t{part}\n\n"
+            msg = f"""Proof Wallet: Sign PSBT [Import]
 
 Import the incomplete Base64 encoded PSBT via QR code. If the PSBT is too large \
 to fit in a single QR code, you can import the data chunk-by-chunk with multiple \
-QR codes. Ensure that each QR code you import has the intended data before confirming.
+QR codes or scan an animated QR code containing the entire PSBT. Ensure that each QR code you import has the intended data before confirming.
 
 Controls:
 [Enter] --  activate the QR scanner to import the next piece of data
+'i'     -- import pieces of data from photos of the QR codes
 'd'     -- decode the PSBT once the data has been imported completely
 'u'     -- undo the last imported piece of data.
 'x'     -- abort this import altogether
@@ -741,20 +1069,60 @@ Below are the individual PSBT chunks you have imported so far:
 
 {"You have not yet imported any parts of a PSBT" if len(psbt_raw_lst) == 0 else psbt_str}
 """
-        ch = await ux_show_story(msg, ['\r', 'd', 'u', 'x'])
-        if ch == '\r':
-            chunk = await scan_qr()
-            psbt_raw_lst.append(chunk)
-        elif ch == 'd' and len(psbt_raw_lst) > 0:
-            break
-        elif ch == 'u' and len(psbt_raw_lst) > 0:
-            psbt_raw_lst.pop()
-        else:
-            return
+            ch = await ux_show_story(msg, ['\r', 'i', 'd', 'u', 'x'])
+            if ch == 'i':
+                chunks = await import_qr_images("Proof Wallet: Sign PSBT [Import]")
+                if chunks is not None:
+                    psbt_raw_lst.extend(chunks)
+            elif ch == '\r':
+                scanner.flush() # ignore anything decoded while the menu was shown
+                chunk = await scan_qr(scanner)
+                if is_fountain_part(chunk):
+                    # animated QR codes contain the entire psbt
+                    chunk = await scan_fountain_qr(chunk, scanner)
+                if chunk is None:
+                    continue
+                psbt_raw_lst.append(chunk)
+            elif ch == 'd' and len(psbt_raw_lst) > 0:
+                telemetry.annotate(chunks=len(psbt_raw_lst))
+                return psbt_raw_lst
+            elif ch == 'u' and len(psbt_raw_lst) > 0:
+                psbt_raw_lst.pop()
+                scanner.forget() # allow the same chunk to be scanned again
+            else:
+                return None
+
+@profiled
+@telemetry.traced("sign_psbt")
+async def sign_psbt(w):
+    """
+    Interaction for wallet to sign psbt.
+
+    Includes import psbt in a batch of QR codes, performing automated
+    validations on the imported data, displaying a summarized view of
+    the transaction for the user to evaluate / sign.
+
+    Parameters:
+        w (Wallet): the wallet that would perform the signing role
+    """
+    # validate_psbt checks ownership against the wallet's stored public data
+    if not await require_verified(w, "Proof Wallet: Sign PSBT"):
+        return
+    telemetry.annotate(m=w.m, n=w.n, network=w.network, signed=False)
+
+    # import psbt in chunks via QR code
+    psbt_raw_lst = await import_psbt()
+    if psbt_raw_lst is None:
+        return
 
     # perform validations on psbt
-    psbt_raw = "".join(psbt_raw_lst)
-    psbt_validation = validate_psbt(psbt_raw, w)
+    with telemetry.span("base64_assembly", chunks=len(psbt_raw_lst)):
+        psbt_raw = "".join(psbt_raw_lst)
+    with telemetry.span("validation", chars=len(psbt_raw)) as phase:
+        psbt_validation = validate_psbt(psbt_raw, w)
+        if psbt_validation["psbt"] is not None:
+            phase.set(inputs=len(psbt_validation["psbt"][PSBT_INPUTS]), outputs=len(psbt_validation["psbt"][PSBT_OUTPUTS]))
+        phase.set(errors=len(psbt_validation["error"]), warnings=len(psbt_validation["warning"]))
     # display result of validations
     success = len(psbt_validation["error"]) == 0
     success_str = "SUCCESSFUL" if success else "NOT SUCCESSFUL"
@@ -799,6 +1167,113 @@ PSBT you imported for the given wallet {w.name}. Press [Enter] to proceed and \
         psbt_validation["importmulti_lo"],
         psbt_validation["importmulti_hi"]
     )
+    telemetry.annotate(signed=True)
 
     # export signed psbt in chunks via QR code
     await export_psbt(psbt_processed["psbt"])
+
+def parse_btc(text):
+    """Parses an amount of BTC typed by the user (None if it isn't a positive amount of at most 21M BTC)"""
+    try:
+        amount = Decimal(text.strip())
+        if not amount.is_finite() or amount <= 0 or amount != amount.quantize(SATOSHI_PLACES):
+            return None
+    except ArithmeticError: # e.g. too many digits to quantize
+        return None
+    sats = int(amount * 10**8)
+    return sats if sats <= MAX_MONEY else None
+
+async def create_psbt(w):
+    """
+    Interaction to create an unsigned PSBT that spends the wallet's coins.
+
+    The PSBT is checked with the same validations as PSBTs imported for
+    signing and exported via QR code for the other signers.
+
+    Parameters:
+        w (Wallet): the wallet whose coins are spent
+    """
+    title = "Proof Wallet: Create PSBT"
+    if not await require_verified(w, title):
+        return
+    if w.utxo_sync is None or not w.utxo_sync.done():
+        ux_show_message(f"{title}\n\nLoading the wallet's UTXOs...")
+    try:
+        cache = await w.start_utxo_sync()
+    except subprocess.CalledProcessError as e:
+        await ux_show_story(f"{title}\n\nCould not load the wallet's UTXOs:\n\n{e.output.decode(errors='replace').strip()}\n\nPress [Enter] to go back.", ['\r'])
+        return
+    except ValueError as e:
+        await ux_show_story(f"{title}\n\n{color_text(str(e), RED_COLOR, fg)}\n\nPress [Enter] to go back.", ['\r'])
+        return
+    header = f"""{title}
+
+Balance: {format_btc(cache.balance())} BTC in {len(cache.utxos)} UTXOs"""
+
+    address = await ux_input(f"{header}\n\nEnter the address to pay ([Esc] to go back):")
+    if not address:
+        return
+    error = ""
+    while True:
+        text = await ux_input(f"{header}\n\nPaying {address}\n\n{error}Enter the amount to send in BTC:")
+        if text is None:
+            return
+        amount = parse_btc(text)
+        if amount is None:
+            error = color_text(f"'{text}' is not a valid amount", RED_COLOR, fg) + "\n\n"
+        elif amount > cache.balance():
+            error = color_text(f"{format_btc(amount)} BTC is more than the balance", RED_COLOR, fg) + "\n\n"
+        else:
+            break
+    error = ""
+    while True:
+        text = await ux_input(f"{header}\n\nPaying {format_btc(amount)} BTC to {address}\n\n{error}Enter the fee rate in sat/vB:")
+        if text is None:
+            return
+        try:
+            fee_rate = float(text)
+            if 0 < fee_rate < math.inf:
+                break
+        except ValueError:
+            pass
+        error = color_text(f"'{text}' is not a valid fee rate", RED_COLOR, fg) + "\n\n"
+
+    ux_show_message(f"{header}\n\nSelecting coins and creating the PSBT...")
+    loop = aio.get_event_loop()
+    try:
+        result = await loop.run_in_executor(None, w.create_psbt, {address: amount}, fee_rate)
+    except ValueError as e:
+        await ux_show_story(f"{header}\n\n{color_text(str(e), RED_COLOR, fg)}\n\nPress [Enter] to go back.", ['\r'])
+        return
+    except subprocess.CalledProcessError as e:
+        await ux_show_story(f"{header}\n\nBitcoin Core could not create the PSBT:\n\n{e.output.decode(errors='replace').strip()}\n\nPress [Enter] to go back.", ['\r'])
+        return
+
+    psbt_validation = validate_psbt(result["psbt"], w)
+    if psbt_validation["error"]:
+        msg = f"""{header}
+
+The created PSBT did not pass validation:
+
+* {color_text(psbt_validation['error'][0], RED_COLOR, fg)}
+
+Press [Enter] to go back.
+"""
+        await ux_show_story(msg, ['\r'])
+        return
+
+    change = f"{format_btc(result['change'])} BTC" if result["change"] else "none (the excess goes to fees)"
+    msg = f"""{header}
+
+Pay:           {format_btc(amount)} BTC to {address}
+Inputs:        {len(result['inputs'])} (chosen by {result['algorithm']})
+Change:        {change}
+Fee:           {format_btc(result['fee'])} BTC ({result['fee'] / result['vsize']:.1f} sat/vB for ~{result['vsize']} vB)
+
+Controls:
+[Enter] -- export the unsigned PSBT via QR code
+'x'     -- discard it and go back to the wallet menu
+"""
+    if await ux_show_story(msg, ['\r', 'x']) == 'x':
+        return
+    await export_psbt(result["psbt"])
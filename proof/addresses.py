@@ -0,0 +1,56 @@
+import hashlib
+from crypto import bip32, secp256k1
+from crypto.bech32 import encode_segwit_address, HRP
+
+OP_1 = 0x51
+OP_CHECKMULTISIG = 0xae
+
+def sortedmulti_script(m, pubkeys):
+    """Witness script of an m-of-n multisig with its public keys sorted as in BIP 67"""
+    script = bytes([OP_1 + m - 1])
+    for pubkey in sorted(pubkeys):
+        script += bytes([len(pubkey)]) + pubkey
+    return script + bytes([OP_1 + len(pubkeys) - 1, OP_CHECKMULTISIG])
+
+class BranchDeriver:
+    """
+    Derives the p2wsh multisig addresses of one branch of a wallet without
+    Bitcoin Core, i.e. the addresses of the wallet's wsh(sortedmulti(...))
+    descriptor for m/change/*.
+
+    Each xpub is derived to m/change once; every address then costs one
+    public child derivation (CKDpub) per xpub.
+
+    Parameters:
+        m             (int): the minimum number signatures required to spend bitcoin
+        xpubs   (list[str]): the xpubs of all signers
+        change        (int): the branch (0: receive, 1: change)
+        network       (str): the blockchain the addresses are for
+    """
+    def __init__(self, m, xpubs, change, network):
+        self.m = m
+        self.change = change
+        self.hrp = HRP[network]
+        self.nodes = []
+        for xpub in xpubs:
+            _, _, _, _, chaincode, key = bip32.bip32_deserialize(xpub)
+            key, chaincode = bip32.ckd_pub(key, chaincode, change)
+            self.nodes.append((key, chaincode, secp256k1.decompress(key)))
+
+    @classmethod
+    def for_wallet(cls, w, change):
+        """The deriver of a (finalized) wallet's branch"""
+        return cls(w.m, [w.xpub] + [c.xpub for c in w.cosigners], change, w.network)
+
+    def derive(self, idx):
+        """
+        Derives the address at m/change/idx
+
+        Returns:
+            (address, scriptPubKey, witness script); the scripts are hex encoded
+        """
+        pubkeys = [bip32.ckd_pub(key, chaincode, idx, point)[0] for key, chaincode, point in self.nodes]
+        witness_script = sortedmulti_script(self.m, pubkeys)
+        program = hashlib.sha256(witness_script).digest()
+        script_pubkey = b'\x00\x20' + program
+        return encode_segwit_address(self.hrp, program), script_pubkey.hex(), witness_script.hex()
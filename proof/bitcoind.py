@@ -1,7 +1,15 @@
+import asyncio as aio
 import subprocess
-import pipes
+import threading
 import time
 import json
+from proof import telemetry
+
+# Networks whose bitcoind was verified to be running during this session
+RUNNING_NETWORKS = set()
+# Held while bitcoind is being started, so that concurrent callers (e.g. the
+# startup thread and the first action) wait for one start instead of racing
+_STARTING = threading.Lock()
 
 class BitcoindAdapter:
 
@@ -17,11 +25,39 @@ class BitcoindAdapter:
         args: arguments to exe
         """
         cmd_list = [exe] + list(args)
+        telemetry.count_subprocess()
         pipe = subprocess.Popen(cmd_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, bufsize=1)
         output, _ = pipe.communicate()
         retcode = pipe.returncode
         return (cmd_list, retcode, output)
     
+    async def run_subprocess_async(self, exe, *args):
+        """
+        Run a subprocess without blocking the event loop
+        Returns => (command, return code, output)
+        """
+        cmd_list = [exe] + list(args)
+        telemetry.count_subprocess()
+        process = await aio.create_subprocess_exec(
+            *cmd_list, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        output, _ = await process.communicate()
+        return (cmd_list, process.returncode, output)
+
+    async def bitcoin_cli_checkoutput_async(self, *args):
+        """
+        Async `bitcoin_cli_checkoutput`
+        """
+        cmd_list, retcode, output = await self.run_subprocess_async("bitcoin-cli", f"-{self.network}", *args)
+        if retcode != 0: raise subprocess.CalledProcessError(retcode, cmd_list, output=output)
+        return output
+
+    async def bitcoin_cli_json_async(self, *args):
+        """
+        Async `bitcoin_cli_json`
+        """
+        return json.loads(await self.bitcoin_cli_checkoutput_async(*args))
+
     def bitcoin_cli_call(self, *args):
         """
         Run `bitcoin-cli`, return OS return code
@@ -53,18 +89,28 @@ class BitcoindAdapter:
     def ensure_bitcoind_running(self, *args):
         """
         Start bitcoind (if it's not already running) and ensure it's functioning properly
-        """
-        # start bitcoind.  If another bitcoind process is already running,
-        # this will just print an error message (to /dev/null) and exit.
 
-        self.bitcoind_call("-daemon", *args)
-    
-        # verify bitcoind started up and is functioning correctly
-        times = 0
-        while times <= 20:
-            times += 1
-            if self.bitcoin_cli_call("getnetworkinfo") == 0:
+        The check only runs once per network per session. Callers that arrive
+        while another thread is starting bitcoind wait for it to finish; if
+        that start failed, they try again and raise the error themselves.
+        """
+        if self.network in RUNNING_NETWORKS:
+            return
+        with _STARTING:
+            if self.network in RUNNING_NETWORKS:
                 return
-            time.sleep(0.5)
-    
-        raise Exception("Timeout while starting bitcoin server")
+            # start bitcoind.  If another bitcoind process is already running,
+            # this will just print an error message (to /dev/null) and exit.
+
+            self.bitcoind_call("-daemon", *args)
+
+            # verify bitcoind started up and is functioning correctly
+            times = 0
+            while times <= 20:
+                times += 1
+                if self.bitcoin_cli_call("getnetworkinfo") == 0:
+                    RUNNING_NETWORKS.add(self.network)
+                    return
+                time.sleep(0.5)
+
+            raise Exception("Timeout while starting bitcoin server")
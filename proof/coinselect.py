@@ -0,0 +1,228 @@
+import random
+from bisect import bisect_left
+
+# Selections branch and bound explores before giving up
+BNB_MAX_TRIES = 100000
+# Change the knapsack solver tries to leave so that it doesn't create tiny change outputs
+MIN_CHANGE = 1000000
+# Random subsets the knapsack solver tries
+KNAPSACK_ITERATIONS = 1000
+# Upper bound on the coins visited by all of those tries (keeps large UTXO sets fast)
+KNAPSACK_MAX_STEPS = 1000000
+# Smallest change output worth creating (the dust limit of a p2wsh output)
+DUST_LIMIT = 330
+
+# Transaction sizes in virtual bytes: version, locktime, input and output
+# counts and (a quarter of) the segwit marker and flag
+TX_OVERHEAD_VSIZE = 11
+P2WSH_SCRIPT_LEN = 34
+
+def compact_size_len(n):
+    """Number of bytes of the compact size encoding of n"""
+    return 1 if n < 0xfd else 3 if n <= 0xffff else 5
+
+def multisig_input_vsize(m, n):
+    """Virtual size of an input spending a p2wsh m-of-n multisig output"""
+    witness_script = 3 + 34 * n # OP_m <n pubkeys> OP_n OP_CHECKMULTISIG
+    # item count, the empty item for OP_CHECKMULTISIG, m signatures and the witness script
+    witness = 1 + 1 + m * 73 + compact_size_len(witness_script) + witness_script
+    # outpoint, empty scriptSig and sequence
+    return 41 + (witness + 3) // 4
+
+def output_vsize(script_len):
+    """Virtual size of an output with a scriptPubKey of the given length"""
+    return 8 + compact_size_len(script_len) + script_len
+
+class CoinIndex:
+    """
+    Coins indexed by effective value (amount minus the fee to spend them)
+
+    Answers "the smallest coin worth at least x" and "the coins worth less
+    than x" with a binary search, so selections that are settled by one
+    coin or by the small coins don't scan the whole UTXO set.
+
+    Parameters:
+        values (list[int]): effective value of each coin in satoshis
+    """
+    def __init__(self, values):
+        self.values = values
+        # coins worth spending, in ascending order of effective value
+        self.order = sorted((i for i, v in enumerate(values) if v > 0), key=values.__getitem__)
+        self.sorted = [values[i] for i in self.order]
+        self.total = sum(self.sorted)
+
+    def __len__(self):
+        return len(self.order)
+
+    def lowest_larger(self, target):
+        """Index of the smallest coin worth at least target (None if there is none)"""
+        pos = bisect_left(self.sorted, target)
+        return self.order[pos] if pos < len(self.order) else None
+
+    def exact(self, target):
+        """Index of a coin worth exactly target (None if there is none)"""
+        pos = bisect_left(self.sorted, target)
+        if pos < len(self.order) and self.sorted[pos] == target:
+            return self.order[pos]
+        return None
+
+    def below(self, limit):
+        """Indexes of the coins worth less than limit, largest first"""
+        return self.order[:bisect_left(self.sorted, limit)][::-1]
+
+    def descending(self):
+        """Indexes of all coins, largest first"""
+        return self.order[::-1]
+
+def branch_and_bound(index, target, cost_of_change, max_tries=BNB_MAX_TRIES):
+    """
+    Searches for a selection that needs no change output.
+
+    A depth-first search over the coins (largest first, including a coin
+    before excluding it) for a selection worth between target and
+    target + cost_of_change, i.e. where dropping the excess to fees is
+    cheaper than creating and later spending a change output. Branches that
+    can no longer reach the target or already overshoot it are pruned.
+    The selection with the least excess found within max_tries is returned.
+
+    Parameters:
+        index         (CoinIndex): coins to choose from
+        target              (int): effective value to select
+        cost_of_change      (int): fees of creating and spending a change output
+        max_tries           (int): selections explored before giving up
+
+    Returns:
+        list of coin indexes or None if no changeless selection was found
+    """
+    coins = index.descending()
+    values = [index.values[i] for i in coins]
+    best, best_excess = None, None
+    selection = [] # positions in coins
+    value, available = 0, index.total
+    pos = 0
+    for _ in range(max_tries):
+        backtrack = False
+        if value + available < target or value > target + cost_of_change:
+            backtrack = True
+        elif value >= target:
+            if best_excess is None or value - target < best_excess:
+                best, best_excess = list(selection), value - target
+                if best_excess == 0:
+                    break
+            backtrack = True
+
+        if backtrack:
+            if not selection:
+                break # searched everything
+            # give back the coins skipped since the last included one, then exclude it
+            pos -= 1
+            while pos > selection[-1]:
+                available += values[pos]
+                pos -= 1
+            value -= values[pos]
+            selection.pop()
+        else:
+            available -= values[pos]
+            # excluding a coin and including an equal one next gives the same selections
+            if not selection or selection[-1] == pos - 1 or values[pos] != values[pos - 1]:
+                selection.append(pos)
+                value += values[pos]
+        pos += 1
+    return None if best is None else [coins[p] for p in best]
+
+def approximate_best_subset(values, total, target, iterations, rng):
+    """
+    Randomly searches for the subset of coins worth the least amount that is
+    at least target (stochastic approximation of the subset sum problem)
+
+    Returns:
+        (list of positions in values of the included coins, value of the subset)
+    """
+    best, best_value = list(range(len(values))), total
+    for _ in range(iterations):
+        if best_value == target:
+            break
+        included = [False] * len(values)
+        chosen = [] # included positions; a coin is only ever removed right after being added
+        value = 0
+        reached = False
+        for npass in range(2):
+            if reached:
+                break
+            for i in range(len(values)):
+                # the first pass includes coins at random, the second one tries the rest
+                if (rng.random() < 0.5) if npass == 0 else not included[i]:
+                    value += values[i]
+                    included[i] = True
+                    chosen.append(i)
+                    if value >= target:
+                        reached = True
+                        if value < best_value:
+                            best, best_value = list(chosen), value
+                        value -= values[i]
+                        included[i] = False
+                        chosen.pop()
+    return best, best_value
+
+def knapsack(index, target, min_change=MIN_CHANGE, rng=None):
+    """
+    Selects coins that leave (ideally) at least min_change as change.
+
+    Uses a coin worth exactly target, all of the smaller coins if they add up
+    to exactly target, or otherwise the better of the smallest coin worth at
+    least target + min_change and a random approximation of the best subset
+    of the smaller coins.
+
+    Returns:
+        list of coin indexes or None if the coins are worth less than target
+    """
+    rng = rng or random.SystemRandom()
+    exact = index.exact(target)
+    if exact is not None:
+        return [exact]
+    smaller = index.below(target + min_change)
+    values = [index.values[i] for i in smaller]
+    total_lower = sum(values)
+    larger = index.lowest_larger(target + min_change)
+    if total_lower == target:
+        return smaller
+    if total_lower < target:
+        return None if larger is None else [larger]
+
+    # every try visits each coin up to twice
+    iterations = max(1, min(KNAPSACK_ITERATIONS, KNAPSACK_MAX_STEPS // (2 * len(smaller))))
+    best, best_value = approximate_best_subset(values, total_lower, target, iterations, rng)
+    if best_value != target and total_lower >= target + min_change:
+        best, best_value = approximate_best_subset(values, total_lower, target + min_change, iterations, rng)
+    if larger is not None and (
+        (best_value != target and best_value < target + min_change) or index.values[larger] <= best_value
+    ):
+        return [larger]
+    return [smaller[pos] for pos in best]
+
+def select_coins(values, target, cost_of_change, min_change=MIN_CHANGE, rng=None):
+    """
+    Selects the coins to fund a transaction.
+
+    Tries branch and bound for a selection that needs no change output and
+    falls back to the knapsack solver.
+
+    Parameters:
+        values     (list[int]): effective value of each coin in satoshis (amount minus the fee to spend it)
+        target           (int): amount to pay plus the fees of everything but the inputs and change
+        cost_of_change   (int): fees of creating and spending a change output
+        min_change       (int): change the knapsack solver tries to leave
+
+    Returns:
+        (list of indexes into values, name of the algorithm that found them)
+    """
+    index = CoinIndex(values)
+    if index.total < target:
+        raise ValueError(f"Insufficient funds: {index.total} of {target} satoshis available")
+    selection = branch_and_bound(index, target, cost_of_change)
+    if selection is not None:
+        return selection, "branch and bound"
+    selection = knapsack(index, target, min_change, rng)
+    if selection is None:
+        raise ValueError(f"Insufficient funds: no selection of coins is worth {target} satoshis")
+    return selection, "knapsack"
@@ -1,5 +1,7 @@
 from decimal import Decimal
 SATOSHI_PLACES = Decimal("0.00000001")
+MAX_MONEY = 21000000 * 10**8 # satoshis
+MAX_ADDRESS_INDEX = 2**31 - 1 # highest unhardened BIP32 child index
 FEE_RATE_MULTIPLIER = 10**5 # BTC/kB -> sat/byte
 
 PSBT_INPUTS = "inputs"
@@ -44,3 +46,13 @@ ORANGE_COLOR = 208
 ROLLS_PER_ROW  = 30
 ROLLS_NUM_COLS = 3
 ROLLS_PER_COL = 10
+
+QR_ANIMATION_FPS = 4 # default frames per second of animated QR exports
+QR_ANIMATION_MAX_FPS = 10
+FOUNTAIN_TYPE_PSBT = "PSBT"
+
+QR_ECC_LEVEL = 'L' # lowest error correction level yields the densest QR codes
+QR_MARGIN = 4 # quiet zone (in modules) surrounding each rendered QR code (ISO/IEC 18004 requires 4)
+QR_FRAMES_AHEAD = 8 # frames of an animated QR code rendered ahead of the one displayed
+
+ADDRESS_PAGE_CACHE_SIZE = 16 # derived address pages kept in memory while viewing addresses
@@ -0,0 +1,179 @@
+"""
+Streams the addresses of a saved wallet to CSV or JSONL.
+
+Every row holds (change, index, address, scriptPubKey, witness script).
+Addresses are derived in pure Python (see proof/addresses.py) in fixed-size
+batches spread across worker processes, and written in order as they are
+ready. Only a few batches are in flight at a time, so memory use doesn't
+depend on the number of addresses exported. The wallet's stored xpub is
+first checked against its mnemonic (this needs Bitcoin Core).
+
+Usage:
+    python -m proof.export WALLET [--count N] [--start I] [--branch {0,1}]
+                                  [--format {csv,jsonl}] [--output FILE]
+                                  [--batch-size N] [--processes N]
+"""
+import csv
+import json
+import os
+import sys
+from collections import deque
+from proof.addresses import BranchDeriver
+
+FIELDS = ("change", "index", "address", "scriptPubKey", "witness_script")
+EXPORT_BATCH_SIZE = 1000
+# batches queued per worker process
+BATCHES_PER_PROCESS = 2
+
+# wallets whose addresses are derived ({key: (m, xpubs, network)}) and their
+# derivers (one per branch, created on first use); set in each worker process
+_wallets = None
+_derivers = None
+
+def init_derivers(wallets):
+    """Sets up this process to derive the addresses of the given wallets"""
+    global _wallets, _derivers
+    _wallets = wallets
+    _derivers = {}
+
+def derive_batch(batch):
+    """Derives the rows of a (wallet key, change, start, end) batch of addresses"""
+    key, change, start, end = batch
+    if (key, change) not in _derivers:
+        m, xpubs, network = _wallets[key]
+        _derivers[(key, change)] = BranchDeriver(m, xpubs, change, network)
+    deriver = _derivers[(key, change)]
+    return [(change, idx) + deriver.derive(idx) for idx in range(start, end)]
+
+def derive_batches(wallets, batches, processes=None):
+    """
+    Derives batches of addresses across worker processes.
+
+    Only a few batches per process are in flight, so batches are derived
+    as fast as they are consumed. Closing the generator stops the workers.
+
+    Parameters:
+        wallets     (dict): {key: (m, xpubs, network)} of the wallets to derive addresses of
+        batches (iterable): (wallet key, change, start, end) batches
+        processes    (int): worker processes (defaults to the cpu count; 1 derives in this process)
+
+    Returns:
+        generator of (batch, list of rows (see FIELDS)) in the order of batches
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        init_derivers(wallets)
+        for batch in batches:
+            yield batch, derive_batch(batch)
+        return
+    import multiprocessing # slow to import
+    # Workers aren't forked from this process: it may be running threads
+    # (the keyboard reader, a lookup) and holds the wallet database open
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    with multiprocessing.get_context(method).Pool(processes, init_derivers, (wallets,)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.apply_async(derive_batch, (batch,))))
+            if len(pending) >= BATCHES_PER_PROCESS * processes:
+                batch, result = pending.popleft()
+                yield batch, result.get()
+        while pending:
+            batch, result = pending.popleft()
+            yield batch, result.get()
+
+def address_batches(m, xpubs, network, branches=(0, 1), start=0, count=100000,
+                    batch_size=EXPORT_BATCH_SIZE, processes=None):
+    """
+    Derives the rows of a wallet's addresses.
+
+    Parameters:
+        m              (int): the minimum number signatures required to spend bitcoin
+        xpubs    (list[str]): the xpubs of all signers
+        network        (str): the blockchain the addresses are for
+        branches (list[int]): branches to export (0: receive, 1: change)
+        start          (int): first address index
+        count          (int): number of addresses per branch
+        batch_size     (int): addresses derived per task
+        processes      (int): worker processes (defaults to the cpu count; 1 derives in this process)
+
+    Returns:
+        generator of lists of rows (see FIELDS) in order of branch and index
+    """
+    batches = (
+        (None, change, lo, min(lo + batch_size, start + count))
+        for change in branches for lo in range(start, start + count, batch_size)
+    )
+    for _, rows in derive_batches({None: (m, xpubs, network)}, batches, processes):
+        yield rows
+
+def write_rows(batches, fp, fmt="csv", progress=None):
+    """
+    Writes batches of rows as CSV (with a header) or JSONL
+
+    Parameters:
+        batches (iterable): lists of rows (see FIELDS)
+        fp   (file object): text file to write to
+        fmt          (str): "csv" or "jsonl"
+        progress    (func): (optional) called with the number of rows written after each batch
+
+    Returns:
+        the number of rows written
+    """
+    written = 0
+    writer = csv.writer(fp) if fmt == "csv" else None
+    if writer is not None:
+        writer.writerow(FIELDS)
+    for rows in batches:
+        if writer is not None:
+            writer.writerows(rows)
+        else:
+            fp.writelines(json.dumps(dict(zip(FIELDS, row))) + "\n" for row in rows)
+        written += len(rows)
+        if progress is not None:
+            progress(written)
+    return written
+
+def parse_args(argv):
+    import argparse
+    parser = argparse.ArgumentParser(description="Export the addresses of a saved wallet")
+    parser.add_argument("wallet", help="name of the saved wallet")
+    parser.add_argument("--count", type=int, default=100000, help="addresses per branch (default: %(default)s)")
+    parser.add_argument("--start", type=int, default=0, help="first address index (default: %(default)s)")
+    parser.add_argument("--branch", type=int, choices=(0, 1), action="append",
+                        help="only export this branch (0: receive, 1: change); can be repeated")
+    parser.add_argument("--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("--output", default="-", help="file to write to (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=EXPORT_BATCH_SIZE)
+    parser.add_argument("--processes", type=int, default=None, help="worker processes (default: cpu count)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from proof.wallet import Wallet
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    w = Wallet.load(args.wallet)
+    if not w.finalized:
+        sys.exit(f"Wallet {w.name} does not have all of its cosigners yet")
+    # the stored xpub must match the mnemonic before addresses are derived from it
+    mismatches = w.verify_public_data()
+    if mismatches:
+        sys.exit(f"The stored {', '.join(mismatches)} of wallet {w.name} did not match its mnemonic "
+                 "and were recomputed; run the export again")
+    branches = args.branch or [0, 1]
+    total = len(branches) * args.count
+
+    def progress(written):
+        print(f"\rExported {written} of {total} addresses", end="", file=sys.stderr, flush=True)
+
+    batches = address_batches(
+        w.m, [w.xpub] + [c.xpub for c in w.cosigners], w.network,
+        branches, args.start, args.count, args.batch_size, args.processes
+    )
+    if args.output == "-":
+        write_rows(batches, sys.stdout, args.format, progress)
+    else:
+        with open(args.output, "w", newline="") as fp:
+            write_rows(batches, fp, args.format, progress)
+    print(file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
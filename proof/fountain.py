@@ -0,0 +1,214 @@
+"""
+Rateless fountain codes for animated QR code transfers.
+
+Modeled after the multipart encoding of Blockchain Commons' Uniform Resources
+(UR): a message is split into equally sized fragments and every part carries
+either a single fragment (the first seq_len parts) or the XOR of a pseudo-random
+subset of fragments. The subset is derived deterministically from the part's
+sequence number and the message checksum, so a decoder can reconstruct the
+message from any sufficiently large set of parts received in any order.
+
+Parts are serialized as uppercase text so they fit in the QR alphanumeric mode:
+
+    PW:{type}/{seq_num}-{seq_len}/{message_len}-{checksum}/{fragment hex}
+"""
+import random
+import re
+import zlib
+from functools import lru_cache
+
+PART_PREFIX = "PW:"
+PART_PATTERN = re.compile(
+    r"^PW:([A-Z0-9-]+)/([1-9][0-9]*)-([1-9][0-9]*)/([0-9]+)-([0-9A-F]{8})/([0-9A-F]*)$"
+)
+
+def xor_bytes(a, b):
+    """XOR two byte strings of equal length"""
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+def fragment_length(message_len, max_fragment_len):
+    """
+    Chooses a fragment length no larger than max_fragment_len that splits a
+    message into fragments of (nearly) equal size.
+    """
+    seq_len = max(1, -(-message_len // max_fragment_len))
+    return max(1, -(-message_len // seq_len))
+
+def max_fragment_len(max_part_len, message_len, type):
+    """
+    Largest fragment length for which every serialized part of the message
+    is at most max_part_len characters long.
+    """
+    max_seq = "9" * 6
+    overhead = len(f"{PART_PREFIX}{type}/{max_seq}-{max_seq}/{message_len}-{0:08X}/")
+    return max(1, (max_part_len - overhead) // 2) # fragments are hex encoded
+
+@lru_cache(maxsize=32)
+def _degree_cum_weights(seq_len):
+    """Cumulative weights of the degree distribution (degree i has weight 1/i)"""
+    total = 0.0
+    cum_weights = []
+    for i in range(1, seq_len + 1):
+        total += 1.0 / i
+        cum_weights.append(total)
+    return cum_weights
+
+def choose_fragments(seq_num, seq_len, checksum):
+    """
+    Chooses the set of fragment indexes that are mixed into the given part.
+
+    Parameters:
+        seq_num  (int): 1-based sequence number of the part
+        seq_len  (int): number of fragments in the message
+        checksum (int): crc32 checksum of the message
+
+    Returns:
+        frozenset of fragment indexes
+    """
+    if seq_num <= seq_len:
+        return frozenset([seq_num - 1])
+    rng = random.Random((seq_num << 32) | checksum)
+    degree = rng.choices(range(1, seq_len + 1), cum_weights=_degree_cum_weights(seq_len))[0]
+    return frozenset(rng.sample(range(seq_len), degree))
+
+def is_fountain_part(data):
+    """Utility to determine whether scanned data is a fountain encoded part"""
+    return data is not None and data.startswith(PART_PREFIX)
+
+class FountainEncoder:
+    """
+    Produces an endless stream of fountain encoded parts for a message.
+
+    Attributes:
+        message       (bytes): data to encode
+        fragments (list[bytes]): message split into equally sized fragments
+        seq_num         (int): sequence number of the last part produced
+        type            (str): label describing the encoded data (e.g. "PSBT")
+    """
+    def __init__(self, message, max_fragment_len, type="BYTES"):
+        self.message = message
+        self.type = type
+        self.checksum = zlib.crc32(message)
+        frag_len = fragment_length(len(message), max_fragment_len)
+        padded = message + b"\x00" * (-len(message) % frag_len)
+        self.fragments = [padded[i: i + frag_len] for i in range(0, len(padded), frag_len)]
+        self.seq_num = 0
+
+    @property
+    def seq_len(self):
+        """Number of fragments the message was split into"""
+        return len(self.fragments)
+
+    def part(self, seq_num):
+        """Serializes the part with the given sequence number"""
+        indexes = choose_fragments(seq_num, self.seq_len, self.checksum)
+        data = None
+        for i in indexes:
+            data = self.fragments[i] if data is None else xor_bytes(data, self.fragments[i])
+        return "{}{}/{}-{}/{}-{:08X}/{}".format(
+            PART_PREFIX, self.type, seq_num, self.seq_len,
+            len(self.message), self.checksum, data.hex().upper()
+        )
+
+    def next_part(self):
+        """Serializes the next part in the stream"""
+        self.seq_num += 1
+        return self.part(self.seq_num)
+
+class FountainDecoder:
+    """
+    Reconstructs a message from fountain encoded parts received in any order.
+
+    Simple parts (a single fragment) are stored directly; mixed parts are
+    reduced by every known fragment until they too become simple.
+    """
+    def __init__(self):
+        self.type = None
+        self.seq_len = None
+        self.message_len = None
+        self.checksum = None
+        self._simple = {}
+        self._mixed = {}
+        self._seen = set()
+
+    def receive_part(self, data):
+        """
+        Processes a serialized part.
+
+        Returns:
+            True if the part belongs to the message being decoded, otherwise False
+        """
+        match = PART_PATTERN.match(data.strip()) if data else None
+        if match is None:
+            return False
+        _type, seq_num, seq_len, message_len, checksum, fragment = match.groups()
+        seq_num, seq_len, message_len = int(seq_num), int(seq_len), int(message_len)
+        checksum = int(checksum, 16)
+        if len(fragment) % 2 != 0:
+            return False
+        fragment = bytes.fromhex(fragment)
+
+        if self.seq_len is None:
+            if not (seq_len - 1) * len(fragment) < message_len <= seq_len * len(fragment):
+                return False
+            self.type, self.seq_len = _type, seq_len
+            self.message_len, self.checksum = message_len, checksum
+        elif (_type, seq_len, message_len, checksum) != \
+                (self.type, self.seq_len, self.message_len, self.checksum):
+            return False
+        if self._simple and len(fragment) != len(next(iter(self._simple.values()))):
+            return False
+
+        if seq_num in self._seen or self.is_complete():
+            return True
+        self._seen.add(seq_num)
+        self._process(choose_fragments(seq_num, seq_len, checksum), fragment)
+        return True
+
+    def _process(self, indexes, fragment):
+        """Peels known fragments off of a part and propagates new fragments"""
+        queue = [(indexes, fragment)]
+        while queue:
+            indexes, fragment = queue.pop()
+            for i in indexes & self._simple.keys():
+                fragment = xor_bytes(fragment, self._simple[i])
+            indexes = frozenset(indexes - self._simple.keys())
+            if len(indexes) == 0 or indexes in self._mixed:
+                continue
+            if len(indexes) == 1:
+                [i] = indexes
+                self._simple[i] = fragment
+                # any mixed part containing the new fragment can now be reduced
+                for key in [k for k in self._mixed if i in k]:
+                    queue.append((key, self._mixed.pop(key)))
+            else:
+                self._mixed[indexes] = fragment
+
+    def is_complete(self):
+        """True once every fragment of the message is known"""
+        return self.seq_len is not None and len(self._simple) == self.seq_len
+
+    @property
+    def progress(self):
+        """Fraction of the message's fragments that have been recovered"""
+        if self.seq_len is None:
+            return 0.0
+        return len(self._simple) / self.seq_len
+
+    def result(self):
+        """
+        Assembles the decoded message.
+
+        Returns:
+            message bytes
+
+        Raises:
+            ValueError if the message is incomplete or fails its checksum
+        """
+        if not self.is_complete():
+            raise ValueError("Message is not yet completely decoded")
+        joined = b"".join(self._simple[i] for i in range(self.seq_len))
+        message = joined[:self.message_len]
+        if zlib.crc32(message) != self.checksum:
+            raise ValueError("Decoded message does not match its checksum")
+        return message
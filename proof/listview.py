@@ -0,0 +1,150 @@
+from bisect import bisect_left
+from proof.ux import (
+    SCREEN, getch, visible_len, PRINTABLE_KEYS, BACKSPACE_KEYS, CANCEL_KEYS,
+    KEY_UP, KEY_DOWN, KEY_PAGE_UP, KEY_PAGE_DOWN, KEY_HOME, KEY_END
+)
+
+# sorts after every character a query can be extended with
+FILTER_END = chr(0x10ffff)
+
+POINTER = " --> "
+
+class ListView:
+    """
+    A virtualized, filterable list of options.
+
+    Only the rows that fit on the terminal below the header are rendered, so
+    each keypress costs O(visible rows) no matter how many options there are.
+    Options are indexed once (sorted by their lowercased text) so that
+    type-to-filter narrows the list to the options starting with the query
+    with a binary search instead of a scan.
+
+    Parameters:
+        header          (str): informational text shown above the list
+        options   (list[str]): options to choose from
+    """
+    def __init__(self, header, options):
+        self.header = header
+        self.options = options
+        order = sorted(range(len(options)), key=lambda i: (options[i].lower(), i))
+        self._order = order
+        self._keys = [options[i].lower() for i in order]
+        self.query = None # None while not filtering
+        self.lo, self.hi = 0, len(options) # matching range of the index
+        self.selected = 0 # position in the current view
+        self.top = 0 # position of the first visible row
+
+    def __len__(self):
+        """Number of options in the current view"""
+        return self.hi - self.lo
+
+    def option_index(self, pos):
+        """Index into options of the given position in the current view"""
+        if self.query is None:
+            return pos
+        return self._order[self.lo + pos]
+
+    def set_query(self, query):
+        """Filters the view to the options that start with query (None shows all)"""
+        if query is None:
+            self.lo, self.hi = 0, len(self.options)
+        else:
+            q = query.lower()
+            # extending the query can only narrow the current range
+            narrowing = self.query is not None and q.startswith(self.query.lower())
+            lo, hi = (self.lo, self.hi) if narrowing else (0, len(self.options))
+            self.lo = bisect_left(self._keys, q, lo, hi)
+            self.hi = bisect_left(self._keys, q + FILTER_END, self.lo, hi)
+        self.query = query
+        self.selected = 0
+        self.top = 0
+
+    def move(self, delta):
+        """Moves the selection, wrapping around at either end for single steps"""
+        if len(self) == 0:
+            return
+        if abs(delta) == 1:
+            self.selected = (self.selected + delta) % len(self)
+        else:
+            self.selected = max(0, min(len(self) - 1, self.selected + delta))
+
+    def rows_available(self, header_lines):
+        """Number of list rows that fit below the header and above the status line"""
+        return max(1, SCREEN.terminal_size()['lines'] - header_lines - 1)
+
+    def render(self, controls):
+        """
+        Draws the header and the visible rows
+
+        Returns:
+            the number of list rows on screen (used as the page size)
+        """
+        header = f"{self.header}\n\n{controls}\n"
+        header_lines = len(SCREEN.wrap(header))
+        rows = self.rows_available(header_lines)
+        # keep the selection in view
+        if self.selected < self.top:
+            self.top = self.selected
+        elif self.selected >= self.top + rows:
+            self.top = self.selected - rows + 1
+
+        W = SCREEN.terminal_size()['columns']
+        lines = []
+        for pos in range(self.top, min(len(self), self.top + rows)):
+            prefix = POINTER if pos == self.selected else len(POINTER) * " "
+            line = prefix + self.options[self.option_index(pos)]
+            lines.append(line[:W] if visible_len(line) > W else line)
+        lines += [''] * (rows - len(lines))
+
+        if self.query is not None:
+            status = f"Filter: /{self.query}  ({len(self)} of {len(self.options)})"
+        elif len(self) > rows:
+            status = f"[{self.selected + 1}/{len(self)}]"
+        else:
+            status = ""
+        SCREEN.draw(header + "\n".join(lines) + "\n" + status[:W])
+        return rows
+
+    async def choose(self):
+        """
+        Lets the user pick an option
+
+        Returns:
+            index into options or None if user cancels
+        """
+        controls = """Controls:
+[Enter]       -- make selection
+'n' / 'p'     -- next / previous item (or the arrow keys)
+[PgDn] [PgUp] -- next / previous page
+[Home] [End]  -- first / last item
+'/'           -- type to filter, [Esc] to clear the filter
+'x'           -- go back"""
+        while True:
+            page = self.render(controls)
+            ch = await getch()
+            if ch in ('\r', '\n'):
+                if len(self) > 0:
+                    return self.option_index(self.selected)
+            elif ch == KEY_DOWN or (ch == 'n' and self.query is None):
+                self.move(1)
+            elif ch == KEY_UP or (ch == 'p' and self.query is None):
+                self.move(-1)
+            elif ch == KEY_PAGE_DOWN:
+                self.move(page)
+            elif ch == KEY_PAGE_UP:
+                self.move(-page)
+            elif ch == KEY_HOME:
+                self.move(-len(self))
+            elif ch == KEY_END:
+                self.move(len(self))
+            elif self.query is not None:
+                if ch in CANCEL_KEYS:
+                    self.set_query(None)
+                elif ch in BACKSPACE_KEYS:
+                    self.set_query(self.query[:-1])
+                elif ch in PRINTABLE_KEYS:
+                    self.set_query(self.query + ch)
+            elif ch == '/':
+                self.set_query("")
+            elif ch == 'x' or ch == '':
+                return None
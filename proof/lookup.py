@@ -0,0 +1,102 @@
+"""
+Finds which wallet, branch and index an address belongs to.
+
+Addresses that were seen before are answered from the address index in the
+wallet store. Otherwise the addresses of all the given wallets are derived
+in pure Python (see proof/addresses.py) across worker processes, window by
+window from index 0 outward, interleaving every wallet and both branches,
+until the address turns up or max_index addresses per branch were checked.
+Everything derived for a saved wallet is added to its index, so the next
+lookup starts where this one stopped.
+"""
+import time
+from proof.store import get_store
+
+# Addresses per branch searched before giving up
+LOOKUP_MAX_INDEX = 10000
+# Addresses derived per task
+LOOKUP_BATCH_SIZE = 250
+
+def normalize_address(address):
+    """Strips whitespace and lowercases bech32 addresses given in uppercase (e.g. from QR codes)"""
+    address = address.strip()
+    return address.lower() if address.upper() == address else address
+
+def search_batches(counts, max_index, batch_size):
+    """
+    Interleaves the branches of every wallet window by window
+
+    Parameters:
+        counts    (dict): {wallet name: {change: addresses already indexed}}
+        max_index  (int): addresses per branch to search
+        batch_size (int): addresses per batch
+
+    Returns:
+        generator of (wallet name, change, start, end) batches
+    """
+    for lo in range(0, max_index, batch_size):
+        hi = min(lo + batch_size, max_index)
+        for name in counts:
+            for change in (0, 1):
+                start = max(lo, counts[name][change])
+                if start < hi:
+                    yield (name, change, start, hi)
+
+def lookup_address(address, wallets, store=None, max_index=LOOKUP_MAX_INDEX,
+                   batch_size=LOOKUP_BATCH_SIZE, processes=None, progress=None, cancel=None):
+    """
+    Finds the derivation path of an address (blocking)
+
+    Parameters:
+        address          (str): the address to look up
+        wallets (list[Wallet]): finalized wallets to search, whose public data has been
+                                verified (see Wallet.verified_public_data)
+        store    (WalletStore): (optional) store holding the address index (defaults to get_store())
+        max_index        (int): addresses per branch to search
+        batch_size       (int): addresses derived per task
+        processes        (int): worker processes (defaults to the cpu count)
+        progress        (func): (optional) called with (derivations made, addresses searched per branch)
+                                after each batch
+        cancel (threading.Event): (optional) stops the search when set
+
+    Returns:
+        dict with the address, the wallet name, change and idx of the address
+        (None if it wasn't found), the number of derivations made, the seconds
+        taken, the source of the answer ("index" or "search") and whether the
+        search was cancelled
+    """
+    from proof.export import derive_batches # multiprocessing is slow to import
+    start_time = time.perf_counter()
+    store = store or get_store()
+    address = normalize_address(address)
+    result = {"address": address, "wallet": None, "change": None, "idx": None, "derivations": 0, "cancelled": False}
+
+    names = [w.name for w in wallets]
+    hits = [hit for hit in store.find_address(address) if hit["wallet"] in names]
+    if hits:
+        result.update(hits[0], seconds=time.perf_counter() - start_time, source="index")
+        return result
+
+    keys = {w.name: (w.m, [w.xpub] + [c.xpub for c in w.cosigners], w.network) for w in wallets}
+    saved = {name for name in names if store.has_wallet(name)}
+    counts = {name: store.indexed_counts(name) if name in saved else {0: 0, 1: 0} for name in names}
+    results = derive_batches(keys, search_batches(counts, max_index, batch_size), processes)
+    try:
+        for (name, change, start, end), rows in results:
+            result["derivations"] += len(rows)
+            addresses = [row[2] for row in rows]
+            if name in saved:
+                store.index_addresses(name, change, start, addresses)
+            if address in addresses:
+                result.update(wallet=name, change=change, idx=start + addresses.index(address))
+                break
+            if progress is not None:
+                progress(result["derivations"], end)
+            if cancel is not None and cancel.is_set():
+                result["cancelled"] = True
+                break
+    finally:
+        # stops the workers still deriving
+        results.close()
+    result.update(seconds=time.perf_counter() - start_time, source="search")
+    return result
@@ -0,0 +1,155 @@
+"""
+Opt-in profiling of the top-level actions (set PROOF_PROFILE=1).
+
+Each run of a profiled action writes two files to ~/.proof/profiles (or to
+PROOF_PROFILE_DIR):
+
+    <time>-<action>.pstats  -- cProfile statistics (python -m pstats, snakeviz)
+    <time>-<action>.folded  -- collapsed stacks sampled from the main thread;
+                               render with flamegraph.pl or speedscope
+
+The profiler only runs while the action's coroutine is executing: every
+step of the coroutine is wrapped, so time spent suspended (waiting for a
+keystroke, a subprocess or an executor) is left out. When a profiled action
+awaits another one (e.g. create_wallet opening the wallet menu and then
+sign_psbt), the inner action's time only counts towards its own profile.
+Work handed to other threads or processes is not profiled.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_ENV = "PROOF_PROFILE"
+PROFILE_DIR_ENV = "PROOF_PROFILE_DIR"
+# Seconds between stack samples
+SAMPLE_INTERVAL = 0.001
+
+# The profile whose coroutine step is running on the main thread
+_current = None
+_sampler = None
+
+def enabled():
+    """Whether profiling was requested with PROOF_PROFILE=1"""
+    return os.getenv(PROFILE_ENV) == "1"
+
+def profile_dir():
+    """Directory the profiles are written to (created on first use)"""
+    _dir = os.getenv(PROFILE_DIR_ENV) or os.path.join(os.getenv("HOME"), ".proof", "profiles")
+    os.makedirs(_dir, exist_ok=True)
+    return _dir
+
+def collapse(frame):
+    """The stack of a frame in collapsed format (root first, separated by ';')"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class Sampler(threading.Thread):
+    """Samples the main thread's stack into the profile of the running coroutine step"""
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = interval
+        self.thread_id = threading.main_thread().ident
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            profile = _current
+            if profile is None:
+                continue
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                profile.stacks[collapse(frame)] += 1
+
+class ActionProfile:
+    """
+    The profile of one run of an action
+
+    Parameters:
+        name (str): name of the action
+    """
+    def __init__(self, name):
+        self.name = name
+        import cProfile # only loaded when profiling is enabled
+        self.profiler = cProfile.Profile()
+        self.stacks = Counter()
+        now = time.time()
+        self.started = time.strftime("%Y%m%d-%H%M%S", time.localtime(now)) + f".{int(now * 1000) % 1000:03d}"
+
+    def step(self, fn, *args):
+        """Runs one step of the action's coroutine with this profile active"""
+        global _current
+        outer = _current
+        if outer is not None:
+            outer.profiler.disable()
+        _current = self
+        self.profiler.enable()
+        try:
+            return fn(*args)
+        finally:
+            self.profiler.disable()
+            _current = outer
+            if outer is not None:
+                outer.profiler.enable()
+
+    def write(self):
+        """
+        Writes the .pstats and .folded files
+
+        Returns:
+            the path of the files without the extension
+        """
+        path = os.path.join(profile_dir(), f"{self.started}-{self.name}")
+        self.profiler.dump_stats(path + ".pstats")
+        with open(path + ".folded", "w") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(f"{stack} {count}\n")
+        return path
+
+class ProfiledCoroutine:
+    """Awaitable that drives a coroutine step by step under an ActionProfile"""
+    def __init__(self, coro, profile):
+        self.coro = coro
+        self.profile = profile
+
+    def __await__(self):
+        value, error = None, None
+        try:
+            while True:
+                try:
+                    if error is None:
+                        yielded = self.profile.step(self.coro.send, value)
+                    else:
+                        yielded = self.profile.step(self.coro.throw, error)
+                except StopIteration as e:
+                    return e.value
+                try:
+                    value, error = (yield yielded), None
+                except BaseException as e: # e.g. a cancellation; handled by the coroutine
+                    value, error = None, e
+        finally:
+            self.profile.write()
+
+def profiled(fn):
+    """
+    Decorator that profiles every run of an async action when PROOF_PROFILE=1
+
+    The environment is checked on every call, so the decorated action runs
+    unchanged (one extra call) unless profiling is enabled.
+    """
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        global _sampler
+        if not enabled():
+            return await fn(*args, **kwargs)
+        if _sampler is None:
+            _sampler = Sampler()
+            _sampler.start()
+        return await ProfiledCoroutine(fn(*args, **kwargs), ActionProfile(fn.__name__))
+    return wrapper
@@ -0,0 +1,502 @@
+"""
+Pure python QR code encoder.
+
+Handles encoding mode and version selection, Reed-Solomon error correction,
+masking and rendering to ANSI half-block characters, so that QR codes can be
+displayed in the terminal without any external programs or temporary files.
+
+Tables and algorithms follow ISO/IEC 18004 as laid out in Project Nayuki's
+QR Code generator library; index 0 of every table is unused padding so that
+tables can be indexed by version number directly.
+"""
+from itertools import groupby
+
+MIN_VERSION = 1
+MAX_VERSION = 40
+
+ECC_LOW = 'L'
+ECC_MEDIUM = 'M'
+ECC_QUARTILE = 'Q'
+ECC_HIGH = 'H'
+
+MODE_NUMERIC = "numeric"
+MODE_ALPHANUMERIC = "alphanumeric"
+MODE_BYTE = "byte"
+
+ALPHANUMERIC_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+NUMERIC_CHARSET = "0123456789"
+
+ECC_CODEWORDS_PER_BLOCK = {
+    ECC_LOW:      (-1,  7, 10, 15, 20, 26, 18, 20, 24, 30, 18, 20, 24, 26, 30, 22, 24, 28, 30, 28, 28, 28, 28, 30, 30, 26, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    ECC_MEDIUM:   (-1, 10, 16, 26, 18, 24, 16, 18, 22, 22, 26, 30, 22, 22, 24, 24, 28, 28, 26, 26, 26, 26, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28, 28),
+    ECC_QUARTILE: (-1, 13, 22, 18, 26, 18, 24, 18, 22, 20, 24, 28, 26, 24, 20, 30, 24, 28, 28, 26, 30, 28, 30, 30, 30, 30, 28, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+    ECC_HIGH:     (-1, 17, 28, 22, 16, 22, 28, 26, 26, 24, 28, 24, 28, 22, 24, 24, 30, 28, 28, 26, 28, 30, 24, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30, 30),
+}
+
+NUM_ERROR_CORRECTION_BLOCKS = {
+    ECC_LOW:      (-1, 1, 1, 1, 1, 1, 2, 2, 2, 2,  4,  4,  4,  4,  4,  6,  6,  6,  6,  7,  8,  8,  9,  9, 10, 12, 12, 12, 13, 14, 15, 16, 17, 18, 19, 19, 20, 21, 22, 24, 25),
+    ECC_MEDIUM:   (-1, 1, 1, 1, 2, 2, 4, 4, 4, 5,  5,  5,  8,  9,  9, 10, 10, 11, 13, 14, 16, 17, 17, 18, 20, 21, 23, 25, 26, 28, 29, 31, 33, 35, 37, 38, 40, 43, 45, 47, 49),
+    ECC_QUARTILE: (-1, 1, 1, 2, 2, 4, 4, 6, 6, 8,  8,  8, 10, 12, 16, 12, 17, 16, 18, 21, 20, 23, 23, 25, 27, 29, 34, 34, 35, 38, 40, 43, 45, 48, 51, 53, 56, 59, 62, 65, 68),
+    ECC_HIGH:     (-1, 1, 1, 2, 4, 4, 4, 5, 6, 8,  8, 11, 11, 16, 16, 18, 16, 19, 21, 25, 25, 25, 34, 30, 32, 35, 37, 40, 42, 45, 48, 51, 54, 57, 60, 63, 66, 70, 74, 77, 81),
+}
+
+MODE_INDICATOR_BITS = 4
+
+def symbol_size(version):
+    """Number of modules along each side of a QR code of the given version"""
+    return 4 * version + 17
+
+def num_raw_data_modules(version):
+    """
+    Number of modules available for data and error correction codewords after
+    excluding the function patterns (finders, timing, alignment, format and
+    version information).
+    """
+    result = (16 * version + 128) * version + 64
+    if version >= 2:
+        num_align = version // 7 + 2
+        result -= (25 * num_align - 10) * num_align - 55
+        if version >= 7:
+            result -= 36
+    return result
+
+def num_data_codewords(version, ecl):
+    """Number of 8-bit data codewords a QR code of the given version and ECC level holds"""
+    return num_raw_data_modules(version) // 8 \
+        - ECC_CODEWORDS_PER_BLOCK[ecl][version] * NUM_ERROR_CORRECTION_BLOCKS[ecl][version]
+
+def char_count_bits(mode, version):
+    """Width of the character count indicator for the given mode and version"""
+    i = 0 if version <= 9 else 1 if version <= 26 else 2
+    return {
+        MODE_NUMERIC: (10, 12, 14),
+        MODE_ALPHANUMERIC: (9, 11, 13),
+        MODE_BYTE: (8, 16, 16),
+    }[mode][i]
+
+def encoding_mode(data):
+    """Chooses the densest single-segment mode that can represent the string data"""
+    if all(c in NUMERIC_CHARSET for c in data):
+        return MODE_NUMERIC
+    if all(c in ALPHANUMERIC_CHARSET for c in data):
+        return MODE_ALPHANUMERIC
+    return MODE_BYTE
+
+def segment_bits(mode, num_chars):
+    """Number of payload bits needed to encode num_chars characters in the given mode"""
+    if mode == MODE_NUMERIC:
+        return 10 * (num_chars // 3) + (0, 4, 7)[num_chars % 3]
+    if mode == MODE_ALPHANUMERIC:
+        return 11 * (num_chars // 2) + 6 * (num_chars % 2)
+    return 8 * num_chars
+
+def capacity(version, ecl, mode):
+    """
+    Maximum number of characters (bytes in byte mode) that fit into a single
+    segment QR code of the given version, ECC level and encoding mode.
+    """
+    available = 8 * num_data_codewords(version, ecl) - MODE_INDICATOR_BITS \
+        - char_count_bits(mode, version)
+    chars_per_bits = {
+        MODE_NUMERIC: (3, 10),
+        MODE_ALPHANUMERIC: (2, 11),
+        MODE_BYTE: (1, 8),
+    }[mode]
+    num_chars, group_bits = chars_per_bits
+    result = (available // group_bits) * num_chars
+    # a trailing partial group may still fit
+    while segment_bits(mode, result + 1) <= available:
+        result += 1
+    return min(result, (1 << char_count_bits(mode, version)) - 1)
+
+# Encoding
+
+MODE_INDICATORS = {
+    MODE_NUMERIC: 0x1,
+    MODE_ALPHANUMERIC: 0x2,
+    MODE_BYTE: 0x4,
+}
+
+ECC_FORMAT_BITS = {
+    ECC_LOW: 1,
+    ECC_MEDIUM: 0,
+    ECC_QUARTILE: 3,
+    ECC_HIGH: 2,
+}
+
+PAD_CODEWORDS = (0xEC, 0x11)
+
+def _segment_bits(data, mode):
+    """Encodes string data in the given mode as a string of '0' and '1' characters"""
+    if mode == MODE_NUMERIC:
+        groups = [data[i: i + 3] for i in range(0, len(data), 3)]
+        return "".join(format(int(g), f"0{len(g) * 3 + 1}b") for g in groups)
+    if mode == MODE_ALPHANUMERIC:
+        values = [ALPHANUMERIC_CHARSET.index(c) for c in data]
+        bits = ""
+        for i in range(0, len(values) - 1, 2):
+            bits += format(values[i] * 45 + values[i + 1], "011b")
+        if len(values) % 2:
+            bits += format(values[-1], "06b")
+        return bits
+    return "".join(format(b, "08b") for b in data.encode("utf-8"))
+
+def encode(data, ecl=ECC_LOW, boost_ecl=True):
+    """
+    Encodes string data in the smallest QR code that holds it.
+
+    Parameters:
+        data       (str): data to encode
+        ecl        (str): minimum error correction level
+        boost_ecl (bool): raise the error correction level if it doesn't increase the version
+
+    Returns:
+        QrCode
+
+    Raises:
+        ValueError if the data does not fit in a version 40 QR code
+    """
+    mode = encoding_mode(data)
+    payload = _segment_bits(data, mode)
+    num_chars = len(data.encode("utf-8")) if mode == MODE_BYTE else len(data)
+    for version in range(MIN_VERSION, MAX_VERSION + 1):
+        cc_bits = char_count_bits(mode, version)
+        used_bits = MODE_INDICATOR_BITS + cc_bits + len(payload)
+        if num_chars < (1 << cc_bits) and used_bits <= 8 * num_data_codewords(version, ecl):
+            break
+    else:
+        raise ValueError("Data too long to fit in a QR code")
+
+    if boost_ecl:
+        for new_ecl in (ECC_MEDIUM, ECC_QUARTILE, ECC_HIGH):
+            if used_bits <= 8 * num_data_codewords(version, new_ecl):
+                ecl = new_ecl
+
+    capacity_bits = 8 * num_data_codewords(version, ecl)
+    bits = format(MODE_INDICATORS[mode], "04b") + format(num_chars, f"0{cc_bits}b") + payload
+    bits += "0" * min(4, capacity_bits - len(bits)) # terminator
+    bits += "0" * (-len(bits) % 8)
+    codewords = bytearray(int(bits[i: i + 8], 2) for i in range(0, len(bits), 8))
+    i = 0
+    while len(codewords) < capacity_bits // 8:
+        codewords.append(PAD_CODEWORDS[i % 2])
+        i += 1
+    return QrCode(version, ecl, codewords)
+
+# Reed-Solomon error correction over GF(2^8) with the polynomial 0x11D
+
+GF_EXP = [0] * 512
+GF_LOG = [0] * 256
+_x = 1
+for _i in range(255):
+    GF_EXP[_i] = _x
+    GF_LOG[_x] = _i
+    _x <<= 1
+    if _x & 0x100:
+        _x ^= 0x11D
+for _i in range(255, 512):
+    GF_EXP[_i] = GF_EXP[_i - 255]
+del _x, _i
+
+def gf_multiply(x, y):
+    """Multiplies two elements of GF(2^8)"""
+    if x == 0 or y == 0:
+        return 0
+    return GF_EXP[GF_LOG[x] + GF_LOG[y]]
+
+def reed_solomon_divisor(degree):
+    """Coefficients (highest power first, leading 1 omitted) of the generator polynomial"""
+    result = [0] * (degree - 1) + [1]
+    root = 1
+    for _ in range(degree):
+        for j in range(degree):
+            result[j] = gf_multiply(result[j], root)
+            if j + 1 < degree:
+                result[j] ^= result[j + 1]
+        root = gf_multiply(root, 0x02)
+    return result
+
+def reed_solomon_remainder(data, divisor):
+    """Error correction codewords for a block of data codewords"""
+    result = [0] * len(divisor)
+    for b in data:
+        factor = b ^ result.pop(0)
+        result.append(0)
+        if factor:
+            log_factor = GF_LOG[factor]
+            for i, coef in enumerate(divisor):
+                if coef:
+                    result[i] ^= GF_EXP[GF_LOG[coef] + log_factor]
+    return result
+
+# Symbol construction
+
+PENALTY_N1 = 3
+PENALTY_N2 = 3
+PENALTY_N3 = 40
+PENALTY_N4 = 10
+
+FINDER_LIKE_PATTERNS = ("00001011101", "10111010000")
+
+MASK_PATTERNS = (
+    lambda x, y: (x + y) % 2 == 0,
+    lambda x, y: y % 2 == 0,
+    lambda x, y: x % 3 == 0,
+    lambda x, y: (x + y) % 3 == 0,
+    lambda x, y: (x // 3 + y // 2) % 2 == 0,
+    lambda x, y: x * y % 2 + x * y % 3 == 0,
+    lambda x, y: (x * y % 2 + x * y % 3) % 2 == 0,
+    lambda x, y: ((x + y) % 2 + x * y % 3) % 2 == 0,
+)
+
+ANSI_RESET = "\33[0m"
+ANSI_FG = {True: 30, False: 97} # dark, light
+ANSI_BG = {True: 40, False: 107}
+UPPER_HALF_BLOCK = "\u2580"
+
+class QrCode:
+    """
+    A QR code symbol.
+
+    Attributes:
+        version (int): QR code version (1 to 40)
+        size    (int): number of modules along each side
+        ecl     (str): error correction level
+        mask    (int): mask pattern applied to the data modules (0 to 7)
+        modules (list[list[int]]): module grid indexed [y][x]; 1 is dark, 0 is light
+    """
+    def __init__(self, version, ecl, data_codewords, mask=None):
+        self.version = version
+        self.size = symbol_size(version)
+        self.ecl = ecl
+        self.modules = [[0] * self.size for _ in range(self.size)]
+        self._is_function = [[False] * self.size for _ in range(self.size)]
+
+        self._draw_function_patterns()
+        self._draw_codewords(self._add_ecc_and_interleave(data_codewords))
+
+        if mask is None:
+            # choose the mask with the lowest penalty score
+            min_penalty = None
+            for i in range(len(MASK_PATTERNS)):
+                self._apply_mask(i)
+                self._draw_format_bits(i)
+                penalty = self._penalty_score()
+                if min_penalty is None or penalty < min_penalty:
+                    mask, min_penalty = i, penalty
+                self._apply_mask(i) # XOR again to undo
+        self.mask = mask
+        self._apply_mask(mask)
+        self._draw_format_bits(mask)
+        del self._is_function
+
+    def _set_function_module(self, x, y, is_dark):
+        self.modules[y][x] = 1 if is_dark else 0
+        self._is_function[y][x] = True
+
+    def _draw_function_patterns(self):
+        """Draws timing, finder and alignment patterns and the version information"""
+        for i in range(self.size):
+            self._set_function_module(6, i, i % 2 == 0)
+            self._set_function_module(i, 6, i % 2 == 0)
+
+        self._draw_finder_pattern(3, 3)
+        self._draw_finder_pattern(self.size - 4, 3)
+        self._draw_finder_pattern(3, self.size - 4)
+
+        positions = self._alignment_pattern_positions()
+        last = len(positions) - 1
+        for i, x in enumerate(positions):
+            for j, y in enumerate(positions):
+                # skip the three corners occupied by finder patterns
+                if (i, j) not in ((0, 0), (0, last), (last, 0)):
+                    self._draw_alignment_pattern(x, y)
+
+        self._draw_format_bits(0) # dummy value, overwritten once the mask is chosen
+        self._draw_version()
+
+    def _draw_finder_pattern(self, x, y):
+        """Draws a finder pattern (and its separator) centered at (x, y)"""
+        for dy in range(-4, 5):
+            for dx in range(-4, 5):
+                xx, yy = x + dx, y + dy
+                if 0 <= xx < self.size and 0 <= yy < self.size:
+                    self._set_function_module(xx, yy, max(abs(dx), abs(dy)) not in (2, 4))
+
+    def _draw_alignment_pattern(self, x, y):
+        """Draws an alignment pattern centered at (x, y)"""
+        for dy in range(-2, 3):
+            for dx in range(-2, 3):
+                self._set_function_module(x + dx, y + dy, max(abs(dx), abs(dy)) != 1)
+
+    def _alignment_pattern_positions(self):
+        """Ascending center coordinates of the alignment patterns"""
+        if self.version == 1:
+            return []
+        num_align = self.version // 7 + 2
+        if self.version == 32:
+            step = 26
+        else:
+            step = (self.version * 4 + num_align * 2 + 1) // (num_align * 2 - 2) * 2
+        result = [self.size - 7 - i * step for i in range(num_align - 1)] + [6]
+        return list(reversed(result))
+
+    def _draw_format_bits(self, mask):
+        """Draws both copies of the format information for the given mask"""
+        data = ECC_FORMAT_BITS[self.ecl] << 3 | mask
+        rem = data
+        for _ in range(10):
+            rem = (rem << 1) ^ ((rem >> 9) * 0x537)
+        bits = (data << 10 | rem) ^ 0x5412
+        bit = lambda i: (bits >> i) & 1 != 0
+
+        # first copy, around the top left finder pattern
+        for i in range(0, 6):
+            self._set_function_module(8, i, bit(i))
+        self._set_function_module(8, 7, bit(6))
+        self._set_function_module(8, 8, bit(7))
+        self._set_function_module(7, 8, bit(8))
+        for i in range(9, 15):
+            self._set_function_module(14 - i, 8, bit(i))
+
+        # second copy, split between the other two finder patterns
+        for i in range(0, 8):
+            self._set_function_module(self.size - 1 - i, 8, bit(i))
+        for i in range(8, 15):
+            self._set_function_module(8, self.size - 15 + i, bit(i))
+        self._set_function_module(8, self.size - 8, True) # always dark
+
+    def _draw_version(self):
+        """Draws both copies of the version information (versions 7 and up)"""
+        if self.version < 7:
+            return
+        rem = self.version
+        for _ in range(12):
+            rem = (rem << 1) ^ ((rem >> 11) * 0x1F25)
+        bits = self.version << 12 | rem
+        for i in range(18):
+            is_dark = (bits >> i) & 1 != 0
+            a = self.size - 11 + i % 3
+            b = i // 3
+            self._set_function_module(a, b, is_dark)
+            self._set_function_module(b, a, is_dark)
+
+    def _add_ecc_and_interleave(self, data):
+        """Splits data codewords into blocks, appends their ECC and interleaves the blocks"""
+        num_blocks = NUM_ERROR_CORRECTION_BLOCKS[self.ecl][self.version]
+        block_ecc_len = ECC_CODEWORDS_PER_BLOCK[self.ecl][self.version]
+        raw_codewords = num_raw_data_modules(self.version) // 8
+        num_short_blocks = num_blocks - raw_codewords % num_blocks
+        short_block_len = raw_codewords // num_blocks
+
+        divisor = reed_solomon_divisor(block_ecc_len)
+        blocks = []
+        k = 0
+        for i in range(num_blocks):
+            length = short_block_len - block_ecc_len + (0 if i < num_short_blocks else 1)
+            block = list(data[k: k + length])
+            k += length
+            ecc = reed_solomon_remainder(block, divisor)
+            if i < num_short_blocks:
+                block.append(0) # placeholder so that all blocks have equal length
+            blocks.append(block + ecc)
+
+        result = bytearray()
+        for i in range(len(blocks[0])):
+            for j, block in enumerate(blocks):
+                if i != short_block_len - block_ecc_len or j >= num_short_blocks:
+                    result.append(block[i])
+        return result
+
+    def _draw_codewords(self, data):
+        """Places codewords in the zigzag pattern over the non-function modules"""
+        i = 0
+        num_bits = len(data) * 8
+        right = self.size - 1
+        while right >= 1:
+            if right == 6: # skip the vertical timing pattern
+                right = 5
+            upward = (right + 1) & 2 == 0
+            for vert in range(self.size):
+                y = self.size - 1 - vert if upward else vert
+                for x in (right, right - 1):
+                    if not self._is_function[y][x] and i < num_bits:
+                        self.modules[y][x] = (data[i >> 3] >> (7 - (i & 7))) & 1
+                        i += 1
+            right -= 2
+
+    def _apply_mask(self, mask):
+        """XORs the data modules with the given mask pattern"""
+        pattern = MASK_PATTERNS[mask]
+        for y in range(self.size):
+            row = self.modules[y]
+            is_function = self._is_function[y]
+            for x in range(self.size):
+                if not is_function[x] and pattern(x, y):
+                    row[x] ^= 1
+
+    def _penalty_score(self):
+        """Penalty score of the current module grid (lower is easier to scan)"""
+        size = self.size
+        rows = ["".join("1" if m else "0" for m in row) for row in self.modules]
+        columns = ["".join(column) for column in zip(*rows)]
+        result = 0
+
+        for line in rows + columns:
+            # runs of five or more modules of the same color
+            for _, run in groupby(line):
+                n = sum(1 for _ in run)
+                if n >= 5:
+                    result += PENALTY_N1 + n - 5
+            # finder-like patterns (the light border counts as light modules)
+            padded = "0000" + line + "0000"
+            for pattern in FINDER_LIKE_PATTERNS:
+                result += PENALTY_N3 * padded.count(pattern)
+
+        # 2x2 blocks of the same color
+        full = (1 << size) - 1
+        ints = [int(row, 2) for row in rows]
+        for a, b in zip(ints, ints[1:]):
+            vertical = ~(a ^ b) & full
+            horizontal = ~(a ^ (a >> 1)) & (full >> 1)
+            result += PENALTY_N2 * bin(vertical & (vertical >> 1) & horizontal).count("1")
+
+        # balance of dark and light modules
+        dark = sum(row.count("1") for row in rows)
+        total = size * size
+        k = (abs(dark * 20 - total * 10) + total - 1) // total - 1
+        result += k * PENALTY_N4
+        return result
+
+    def to_ansi(self, margin=4):
+        """
+        Renders the QR code with ANSI colored half-block characters.
+
+        Every character cell draws two vertically stacked modules, so the code
+        takes (size + 2 * margin) columns and half as many lines.
+
+        Parameters:
+            margin (int): width of the light quiet zone in modules
+
+        Returns:
+            rendered QR code as string
+        """
+        full = self.size + 2 * margin
+        light_row = [0] * full
+        padded = [light_row] * margin
+        padded += [[0] * margin + row + [0] * margin for row in self.modules]
+        padded += [light_row] * (margin + full % 2)
+
+        lines = []
+        for y in range(0, full, 2):
+            out = []
+            previous = None
+            for top, bottom in zip(padded[y], padded[y + 1]):
+                cell = (top == 1, bottom == 1)
+                if cell != previous:
+                    out.append(f"\33[{ANSI_FG[cell[0]]};{ANSI_BG[cell[1]]}m")
+                    previous = cell
+                out.append(UPPER_HALF_BLOCK)
+            out.append(ANSI_RESET)
+            lines.append("".join(out))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,158 @@
+import asyncio as aio
+import os
+import re
+import time
+from proof import telemetry
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".tif", ".tiff", ".webp", ".pnm", ".ppm", ".pgm"}
+
+class QRScanner:
+    """
+    A long running zbarcam session that streams decoded QR codes.
+
+    zbarcam is started once (on the first scan) and keeps the camera open for
+    the life of the session; every payload it decodes is pushed onto an async
+    queue. Repeated reads of the frame that was just decoded are dropped, so a
+    QR code held in front of the camera is only delivered once.
+
+    Usage:
+        async with QRScanner() as scanner:
+            data = await scanner.scan()
+    """
+    def __init__(self):
+        self.process = None
+        self.queue = aio.Queue()
+        self._reader = None
+        self._last = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    @property
+    def running(self):
+        """True while the zbarcam process is alive"""
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self):
+        """Starts zbarcam unless it is already running"""
+        if self.running:
+            return
+        telemetry.count_subprocess()
+        self.process = await aio.create_subprocess_exec(
+            "zbarcam", "--raw", "--nodisplay",
+            stdout=aio.subprocess.PIPE,
+            stderr=aio.subprocess.DEVNULL
+        )
+        self._reader = aio.ensure_future(self._read(self.process))
+
+    async def _read(self, process):
+        """Pushes each decoded payload onto the queue until zbarcam exits"""
+        while True:
+            line = await process.stdout.readline()
+            if not line:
+                break
+            data = line.decode(errors="replace").rstrip('\n')
+            if data == "" or data == self._last:
+                continue
+            self._last = data
+            self.queue.put_nowait(data)
+        await process.wait()
+        self.queue.put_nowait(None) # wake up any pending scan
+
+    async def scan(self):
+        """
+        Waits for the next decoded QR code.
+
+        Returns:
+            scanned data as string or None if zbarcam exited
+        """
+        await self.start()
+        started = time.perf_counter()
+        try:
+            return await self.queue.get()
+        finally:
+            telemetry.count_wait(time.perf_counter() - started)
+
+    def flush(self):
+        """
+        Discards payloads that were decoded before the caller was ready for them.
+        A discarded QR code is delivered again if it is still in front of the camera.
+        """
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self._last = None
+
+    def forget(self):
+        """Allows the most recently decoded QR code to be delivered again"""
+        self._last = None
+
+    async def close(self):
+        """Stops zbarcam and releases the camera"""
+        if self.running:
+            self.process.terminate()
+            await self.process.wait()
+        if self._reader is not None:
+            await aio.gather(self._reader, return_exceptions=True)
+        self.process = None
+        self._reader = None
+
+def natural_key(path):
+    """Sort key that orders 'part2.png' before 'part10.png'"""
+    return [int(t) if t.isdigit() else t.lower() for t in re.split(r'(\d+)', path)]
+
+def list_images(source):
+    """
+    Lists the image files to import.
+
+    Parameters:
+        source (str): a directory of images or a single image file
+
+    Returns:
+        list of image paths in natural sort order (so photos are imported in the order taken)
+    """
+    source = os.path.expanduser(source.strip())
+    if os.path.isfile(source):
+        return [source]
+    if not os.path.isdir(source):
+        return []
+    paths = [
+        os.path.join(source, f) for f in os.listdir(source)
+        if os.path.splitext(f)[1].lower() in IMAGE_EXTENSIONS
+        and os.path.isfile(os.path.join(source, f))
+    ]
+    return sorted(paths, key=natural_key)
+
+async def decode_image(path, semaphore):
+    """
+    Decodes every QR code in an image file with zbarimg.
+
+    Returns:
+        list of scanned data strings (empty if the image contains no QR code)
+    """
+    async with semaphore:
+        telemetry.count_subprocess()
+        process = await aio.create_subprocess_exec(
+            "zbarimg", "--raw", "--quiet", "-Sdisable", "-Sqrcode.enable", path,
+            stdout=aio.subprocess.PIPE,
+            stderr=aio.subprocess.DEVNULL
+        )
+        output, _ = await process.communicate()
+    return [line for line in output.decode(errors="replace").split('\n') if line]
+
+async def decode_images(paths, concurrency=None):
+    """
+    Decodes a batch of image files concurrently with a pool of zbarimg workers.
+
+    Parameters:
+        paths   (list[str]): image files to decode
+        concurrency   (int): maximum number of zbarimg processes (defaults to the cpu count)
+
+    Returns:
+        list of (path, list of scanned data) tuples in the order of paths
+    """
+    semaphore = aio.Semaphore(concurrency or os.cpu_count() or 1)
+    results = await aio.gather(*[decode_image(path, semaphore) for path in paths])
+    return list(zip(paths, results))
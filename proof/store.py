@@ -0,0 +1,422 @@
+import json
+import os
+import threading
+
+SCHEMA_VERSION = 6
+DB_NAME = "proof.db"
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )""",
+    """CREATE TABLE IF NOT EXISTS wallets (
+        name TEXT PRIMARY KEY,
+        network TEXT NOT NULL,
+        m INTEGER NOT NULL,
+        n INTEGER NOT NULL,
+        mnemonic TEXT NOT NULL,
+        xpub TEXT,
+        fingerprint TEXT
+    )""",
+    "CREATE INDEX IF NOT EXISTS wallets_network ON wallets (network)",
+    """CREATE TABLE IF NOT EXISTS cosigners (
+        wallet TEXT NOT NULL REFERENCES wallets (name) ON DELETE CASCADE,
+        position INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        xpub TEXT NOT NULL,
+        PRIMARY KEY (wallet, position)
+    )""",
+]
+
+# statements that upgrade the schema to each version
+UPGRADES = {
+    2: [
+        # version of the public artifacts stored with a wallet (0: none)
+        "ALTER TABLE wallets ADD COLUMN format_version INTEGER NOT NULL DEFAULT 0",
+        """CREATE TABLE descriptors (
+            wallet TEXT NOT NULL REFERENCES wallets (name) ON DELETE CASCADE,
+            change INTEGER NOT NULL,
+            descriptor TEXT NOT NULL,
+            PRIMARY KEY (wallet, change)
+        )""",
+    ],
+    3: [
+        # highest address index found to be used on each branch (see Wallet.scan_usage)
+        """CREATE TABLE address_usage (
+            wallet TEXT NOT NULL REFERENCES wallets (name) ON DELETE CASCADE,
+            change INTEGER NOT NULL,
+            highest_used INTEGER NOT NULL,
+            PRIMARY KEY (wallet, change)
+        )""",
+    ],
+    4: [
+        # the wallet's UTXO cache: the block it is synced to and the undo log
+        # of the latest blocks (see proof/utxos.py)
+        """CREATE TABLE utxo_tips (
+            wallet TEXT PRIMARY KEY REFERENCES wallets (name) ON DELETE CASCADE,
+            height INTEGER NOT NULL,
+            hash TEXT NOT NULL,
+            watched TEXT NOT NULL,
+            undo TEXT NOT NULL
+        )""",
+        """CREATE TABLE utxos (
+            wallet TEXT NOT NULL REFERENCES wallets (name) ON DELETE CASCADE,
+            txid TEXT NOT NULL,
+            vout INTEGER NOT NULL,
+            change INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            amount INTEGER NOT NULL,
+            height INTEGER NOT NULL,
+            PRIMARY KEY (wallet, txid, vout)
+        )""",
+    ],
+    5: [
+        # addresses derived for reverse lookups (see proof/lookup.py) and the
+        # number of addresses of each branch that are indexed
+        """CREATE TABLE address_index (
+            address TEXT NOT NULL,
+            wallet TEXT NOT NULL REFERENCES wallets (name) ON DELETE CASCADE,
+            change INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            PRIMARY KEY (address, wallet)
+        )""",
+        "CREATE INDEX address_index_wallet ON address_index (wallet)",
+        """CREATE TABLE indexed_ranges (
+            wallet TEXT NOT NULL REFERENCES wallets (name) ON DELETE CASCADE,
+            change INTEGER NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (wallet, change)
+        )""",
+    ],
+    6: [
+        # wallets are no longer looked up by fingerprint
+        "DROP INDEX IF EXISTS wallets_fingerprint",
+        "DROP INDEX IF EXISTS cosigners_fingerprint",
+    ],
+}
+
+# metadata needed to list a wallet without loading its key data
+SUMMARY_QUERY = """
+    SELECT w.name, w.network, w.m, w.n, w.fingerprint,
+           (SELECT COUNT(*) FROM cosigners c WHERE c.wallet = w.name) + 1 = w.n AS finalized
+    FROM wallets w
+"""
+
+class WalletStore:
+    """
+    SQLite-backed storage for wallets and their cosigners.
+
+    Every write happens in a single transaction, so a wallet and its
+    cosigners are always stored together. Wallets can be listed by network
+    through an index without reading any key data. The connection is shared between threads and guarded by a lock.
+    The database holds mnemonics, so only the user can read it: the file is
+    created 0600 (SQLite gives its journal the same mode) and its directory 0700.
+
+    Parameters:
+        path (str): location of the database file
+    """
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.chmod(directory, 0o700)
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        os.chmod(path, 0o600) # also for databases created before
+        import sqlite3 # loaded when the store is first opened, not at startup
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        with self.lock, self.conn:
+            for statement in SCHEMA:
+                self.conn.execute(statement)
+            self.conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', '1')")
+            version = int(self.conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0])
+            for upgrade in sorted(UPGRADES):
+                if upgrade > version:
+                    for statement in UPGRADES[upgrade]:
+                        self.conn.execute(statement)
+            self.conn.execute(
+                "UPDATE meta SET value = ? WHERE key = 'schema_version'", (str(max(version, SCHEMA_VERSION)),)
+            )
+
+    def close(self):
+        self.conn.close()
+
+    def get_meta(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return None if row is None else row["value"]
+
+    def save_wallet(self, d):
+        """
+        Inserts or replaces a wallet and its cosigners in one transaction
+
+        Parameters:
+            d (dict): wallet fields (name, network, m, n, mnemonic, xpub, fingerprint,
+                      format_version), a list of cosigner dicts (fingerprint, xpub) under
+                      "cosigners" and (optionally) {change: descriptor} under "descriptors"
+        """
+        with self.lock, self.conn:
+            self._save_wallet(d)
+
+    def _save_wallet(self, d):
+        self.conn.execute(
+            # an upsert rather than INSERT OR REPLACE, which would cascade the delete
+            # to the rows that reference the wallet (e.g. its address usage)
+            """INSERT INTO wallets (name, network, m, n, mnemonic, xpub, fingerprint, format_version)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (name) DO UPDATE SET
+                   network = excluded.network, m = excluded.m, n = excluded.n,
+                   mnemonic = excluded.mnemonic, xpub = excluded.xpub,
+                   fingerprint = excluded.fingerprint, format_version = excluded.format_version""",
+            (d["name"], d["network"], d["m"], d["n"], d["mnemonic"],
+             d.get("xpub"), d.get("fingerprint"), d.get("format_version", 0))
+        )
+        self.conn.execute("DELETE FROM cosigners WHERE wallet = ?", (d["name"],))
+        self.conn.executemany(
+            "INSERT INTO cosigners (wallet, position, fingerprint, xpub) VALUES (?, ?, ?, ?)",
+            [(d["name"], i, c["fingerprint"], c["xpub"]) for i, c in enumerate(d["cosigners"])]
+        )
+        self._save_descriptors(d["name"], d.get("descriptors") or {})
+
+    def _save_descriptors(self, name, descriptors):
+        rows = self.conn.execute("SELECT change, descriptor FROM descriptors WHERE wallet = ?", (name,)).fetchall()
+        if {r["change"]: r["descriptor"] for r in rows} != descriptors:
+            # the indexed addresses belong to the wallet's previous keys
+            self.conn.execute("DELETE FROM address_index WHERE wallet = ?", (name,))
+            self.conn.execute("DELETE FROM indexed_ranges WHERE wallet = ?", (name,))
+        self.conn.execute("DELETE FROM descriptors WHERE wallet = ?", (name,))
+        self.conn.executemany(
+            "INSERT INTO descriptors (wallet, change, descriptor) VALUES (?, ?, ?)",
+            [(name, change, desc) for change, desc in descriptors.items()]
+        )
+
+    def save_public(self, name, public):
+        """
+        Replaces the public artifacts of a saved wallet
+
+        Parameters:
+            name    (str): name of the wallet
+            public (dict): xpub, fingerprint, descriptors ({change: descriptor}) and format_version
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "UPDATE wallets SET xpub = ?, fingerprint = ?, format_version = ? WHERE name = ?",
+                (public["xpub"], public["fingerprint"], public["format_version"], name)
+            )
+            self._save_descriptors(name, public["descriptors"])
+
+    def load_wallet(self, name):
+        """
+        Reads a wallet and its cosigners
+
+        Returns:
+            dict in the format accepted by save_wallet or None if there is no such wallet
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT * FROM wallets WHERE name = ?", (name,)).fetchone()
+            if row is None:
+                return None
+            cosigners = self.conn.execute(
+                "SELECT fingerprint, xpub FROM cosigners WHERE wallet = ? ORDER BY position", (name,)
+            ).fetchall()
+            descriptors = self.conn.execute(
+                "SELECT change, descriptor FROM descriptors WHERE wallet = ?", (name,)
+            ).fetchall()
+            usage = self.conn.execute(
+                "SELECT change, highest_used FROM address_usage WHERE wallet = ?", (name,)
+            ).fetchall()
+        d = dict(row)
+        d["cosigners"] = [dict(c) for c in cosigners]
+        d["descriptors"] = {r["change"]: r["descriptor"] for r in descriptors}
+        d["highest_used"] = {r["change"]: r["highest_used"] for r in usage}
+        return d
+
+    def save_usage(self, name, highest_used):
+        """
+        Records the highest used address index of each branch of a saved wallet
+
+        Parameters:
+            name          (str): name of the wallet
+            highest_used (dict): {change: highest used index (-1 if none)}
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO address_usage (wallet, change, highest_used) VALUES (?, ?, ?)",
+                [(name, change, idx) for change, idx in highest_used.items()]
+            )
+
+    def save_utxos(self, name, state):
+        """
+        Replaces the UTXO cache of a saved wallet
+
+        Parameters:
+            name   (str): name of the wallet
+            state (dict): height and hash of the tip, the number of addresses watched on
+                          each branch ({change: count}), the undo log (JSON serializable)
+                          and a list of utxo dicts (txid, vout, change, idx, amount, height)
+        """
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO utxo_tips (wallet, height, hash, watched, undo) VALUES (?, ?, ?, ?, ?)",
+                (name, state["height"], state["hash"], json.dumps(state["watched"]), json.dumps(state["undo"]))
+            )
+            self.conn.execute("DELETE FROM utxos WHERE wallet = ?", (name,))
+            self.conn.executemany(
+                """INSERT INTO utxos (wallet, txid, vout, change, idx, amount, height)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(name, u["txid"], u["vout"], u["change"], u["idx"], u["amount"], u["height"])
+                 for u in state["utxos"]]
+            )
+
+    def load_utxos(self, name):
+        """
+        Reads the UTXO cache of a wallet
+
+        Returns:
+            dict in the format accepted by save_utxos or None if the wallet has no cache
+        """
+        with self.lock:
+            tip = self.conn.execute("SELECT * FROM utxo_tips WHERE wallet = ?", (name,)).fetchone()
+            if tip is None:
+                return None
+            utxos = self.conn.execute(
+                "SELECT txid, vout, change, idx, amount, height FROM utxos WHERE wallet = ?", (name,)
+            ).fetchall()
+        return {
+            "height": tip["height"], "hash": tip["hash"],
+            "watched": {int(change): count for change, count in json.loads(tip["watched"]).items()},
+            "undo": json.loads(tip["undo"]),
+            "utxos": [dict(u) for u in utxos]
+        }
+
+    def index_addresses(self, name, change, start, addresses):
+        """
+        Records addresses of a saved wallet for reverse lookups
+
+        Parameters:
+            name             (str): name of the wallet
+            change           (int): branch of the addresses
+            start            (int): index of the first address
+            addresses  (list[str]): consecutive addresses of the branch starting at start
+        """
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO address_index (address, wallet, change, idx) VALUES (?, ?, ?, ?)",
+                [(address, name, change, start + i) for i, address in enumerate(addresses)]
+            )
+            row = self.conn.execute(
+                "SELECT count FROM indexed_ranges WHERE wallet = ? AND change = ?", (name, change)
+            ).fetchone()
+            count = 0 if row is None else row["count"]
+            # only a contiguous range from index 0 counts as indexed
+            if start <= count < start + len(addresses):
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO indexed_ranges (wallet, change, count) VALUES (?, ?, ?)",
+                    (name, change, start + len(addresses))
+                )
+
+    def indexed_counts(self, name):
+        """
+        Returns:
+            {change: number of addresses from index 0 that are indexed}
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT change, count FROM indexed_ranges WHERE wallet = ?", (name,)).fetchall()
+        counts = {0: 0, 1: 0}
+        counts.update({r["change"]: r["count"] for r in rows})
+        return counts
+
+    def find_address(self, address):
+        """
+        Looks up an indexed address
+
+        Returns:
+            list of dicts with the wallet, change and idx of the address
+        """
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT wallet, change, idx FROM address_index WHERE address = ? ORDER BY wallet", (address,)
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def has_wallet(self, name):
+        """Whether a wallet with this name is saved (without reading its key data)"""
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM wallets WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    def delete_wallet(self, name):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM wallets WHERE name = ?", (name,))
+
+    def list_wallets(self, network=None):
+        """
+        Lists wallet metadata (no key data)
+
+        Parameters:
+            network (str): (optional) only list wallets on this network
+
+        Returns:
+            list of dicts with name, network, m, n, fingerprint and finalized
+        """
+        query, args = SUMMARY_QUERY, ()
+        if network is not None:
+            query, args = query + " WHERE w.network = ?", (network,)
+        with self.lock:
+            rows = self.conn.execute(query + " ORDER BY w.name", args).fetchall()
+        return [dict(r, finalized=bool(r["finalized"])) for r in rows]
+
+    def migrate_json(self, directory):
+        """
+        Imports the wallets saved as one JSON file per wallet (the previous format).
+
+        Runs once per store; every file is imported in a single transaction and
+        the JSON files are left in place. Files that aren't wallets are skipped.
+
+        Returns:
+            number of wallets imported
+        """
+        if self.get_meta("json_migrated") is not None:
+            return 0
+        wallets = []
+        for f in sorted(os.listdir(directory)):
+            path = os.path.join(directory, f)
+            if f.startswith(DB_NAME) or not os.path.isfile(path):
+                continue
+            try:
+                with open(path, 'r') as fp:
+                    d = json.loads(fp.read())
+                if not isinstance(d, dict):
+                    continue
+                wallets.append({
+                    "name": d["name"], "network": d["network"], "m": d["m"], "n": d["n"],
+                    "mnemonic": d["mnemonic"],
+                    "cosigners": [{"fingerprint": c["fingerprint"], "xpub": c["xpub"]} for c in d["cosigners"]]
+                })
+            except (OSError, ValueError, KeyError, TypeError):
+                continue # not a wallet file
+        imported = 0
+        with self.lock, self.conn:
+            for d in wallets:
+                # wallets already in the store are newer than their JSON file
+                exists = self.conn.execute("SELECT 1 FROM wallets WHERE name = ?", (d["name"],)).fetchone()
+                if exists is None:
+                    self._save_wallet(d)
+                    imported += 1
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', '1')")
+        return imported
+
+_store = None
+
+def get_store():
+    """The wallet store in ~/.proof, opened (and migrated) on first use"""
+    global _store
+    if _store is None:
+        from proof.wallet import Wallet
+        _dir = Wallet.get_dir()
+        _store = WalletStore(os.path.join(_dir, DB_NAME))
+        _store.migrate_json(_dir)
+    return _store
@@ -0,0 +1,197 @@
+"""
+Local phase timing for the signing pipeline (and anything else worth timing).
+
+Telemetry is off unless PROOF_TELEMETRY=1 is set; spans are then no-ops.
+A span measures one phase:
+
+    with telemetry.span("decodepsbt") as s:
+        psbt = ...
+        s.set(inputs=len(psbt["inputs"]))
+
+When it ends, one JSON line is appended to ~/.proof/telemetry.jsonl (or to
+PROOF_TELEMETRY_LOG) with its start and end (unix time), duration, the
+seconds spent waiting for the user (keystrokes and the camera), the number
+of subprocesses (bitcoin-cli, bitcoind, zbarcam, zbarimg) started during it,
+the release of Proof Wallet and, if it failed, the exception type. The
+attributes set on it (e.g. item counts) are recorded under "attrs", so
+they can't overwrite those fields. Spans opened inside another span record
+the enclosing span as their parent and share its trace id, so the phases of
+one signing session can be grouped. Events are points in time recorded the
+same way.
+
+Nothing leaves the computer. Failing to write the log never interrupts the
+wallet.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from proof import __version__
+
+TELEMETRY_ENV = "PROOF_TELEMETRY"
+TELEMETRY_LOG_ENV = "PROOF_TELEMETRY_LOG"
+
+# The innermost open span of the running task (or thread)
+_current = contextvars.ContextVar("span", default=None)
+_lock = threading.Lock()
+# the log file, kept open for appending (reopened if the path changes)
+_log = None
+
+def enabled():
+    """Whether telemetry was turned on with PROOF_TELEMETRY=1"""
+    return os.getenv(TELEMETRY_ENV) == "1"
+
+def log_path():
+    """File the events are appended to"""
+    return os.getenv(TELEMETRY_LOG_ENV) or os.path.join(os.getenv("HOME"), ".proof", "telemetry.jsonl")
+
+def write(record):
+    """Appends a record to the log (one line, flushed right away)"""
+    global _log
+    try:
+        line = json.dumps(record, default=str) + "\n"
+        path = log_path()
+        with _lock:
+            if _log is None or _log.name != path:
+                if _log is not None:
+                    _log.close()
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                _log = open(path, "a", buffering=1)
+            _log.write(line)
+    except (OSError, TypeError, ValueError):
+        pass
+
+class Span:
+    """
+    A timed phase (see span)
+
+    Attributes:
+        name          (str): name of the phase
+        attrs        (dict): attributes recorded with the span
+        subprocesses  (int): subprocesses started while the span was open
+        waiting     (float): seconds spent waiting for the user while the span was open
+    """
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.subprocesses = 0
+        self.waiting = 0.0
+        self.id = os.urandom(8).hex()
+        self.parent = None
+        self.trace = self.id
+        self._token = None
+
+    def set(self, **attrs):
+        """Records attributes with the span (e.g. item counts)"""
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.parent = _current.get()
+        if self.parent is not None:
+            self.trace = self.parent.trace
+        self._token = _current.set(self)
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def start(self):
+        """Opens the span without a with block (see finish)"""
+        return self.__enter__()
+
+    def finish(self):
+        """Closes a span opened with start"""
+        self.__exit__(None, None, None)
+
+    def __exit__(self, exc_type, exc, tb):
+        duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+        record = {
+            "type": "span", "name": self.name, "start": self.started_at, "end": self.started_at + duration,
+            "duration": duration, "waiting": self.waiting, "subprocesses": self.subprocesses,
+            "id": self.id, "parent": None if self.parent is None else self.parent.id,
+            "trace": self.trace, "release": __version__, "attrs": self.attrs
+        }
+        if exc_type is not None:
+            record["error"] = exc_type.__name__
+        write(record)
+        return False
+
+class NoSpan:
+    """Stands in for a span when telemetry is off"""
+    def set(self, **attrs):
+        pass
+
+    def start(self):
+        return self
+
+    def finish(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+NO_SPAN = NoSpan()
+
+def span(name, **attrs):
+    """
+    Context manager that times a phase
+
+    Parameters:
+        name   (str): name of the phase
+        attrs (dict): attributes recorded with the span
+
+    Returns:
+        the Span (a no-op when telemetry is off)
+    """
+    return Span(name, attrs) if enabled() else NO_SPAN
+
+def traced(name):
+    """
+    Decorator that runs every call of an async function in a span
+
+    Attributes of the span can be set from within the function with annotate.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            with span(name):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def event(name, **attrs):
+    """Records a point in time (within the open span's trace, if any)"""
+    if not enabled():
+        return
+    parent = _current.get()
+    write({
+        "type": "event", "name": name, "time": time.time(),
+        "parent": None if parent is None else parent.id,
+        "trace": None if parent is None else parent.trace,
+        "release": __version__, "attrs": attrs
+    })
+
+def annotate(**attrs):
+    """Records attributes with the innermost open span (if any)"""
+    current = _current.get()
+    if current is not None:
+        current.set(**attrs)
+
+def count_subprocess():
+    """Counts a subprocess towards every open span"""
+    current = _current.get()
+    while current is not None:
+        current.subprocesses += 1
+        current = current.parent
+
+def count_wait(seconds):
+    """Counts time spent waiting for the user (a keystroke, the camera) towards every open span"""
+    current = _current.get()
+    while current is not None:
+        current.waiting += seconds
+        current = current.parent
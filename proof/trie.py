@@ -1,3 +1,5 @@
+from os.path import commonprefix
+
 class Trie:
     """
     Trie implementation. 
@@ -19,11 +21,79 @@ class Trie:
             if char not in self.children:
                 self.children[char] = Trie(self)
             self.children[char].add(word[1:])
-            
 
-    
-        
-            
-            
+class RadixTrie:
+    """
+    Compact (radix) trie with collapsed edges.
+
+    Only prefixes where the word list branches get a node; chains of single
+    children are collapsed into one edge at build time. Each node precomputes
+    the menu options it offers, so walking the trie does no work per step.
+
+    Attributes:
+        prefix             (str): the prefix this node represents
+        parent       (RadixTrie): the node this one was reached from (None for the root)
+        options (tuple[(str, str, RadixTrie)]): (label, word, child) for each choice
+            at this node; word is set when the choice completes a word, child when it
+            leads to a node with more choices (labels of those end with '*')
+        labels      (tuple[str]): the option labels in order
+    """
+    __slots__ = ('prefix', 'parent', 'options', 'labels')
+
+    def __init__(self, prefix="", parent=None):
+        self.prefix = prefix
+        self.parent = parent
+        self.options = ()
+        self.labels = ()
+
+    @classmethod
+    def build(cls, words):
+        """
+        Builds the trie for a list of words
+
+        Parameters:
+            words (list[str]): the words; need not be sorted
+
+        Returns:
+            the root node
+        """
+        words = sorted(set(words))
+        root = cls()
+        # each pending node covers the range words[lo:hi] of words starting with its prefix
+        stack = [(root, 0, len(words))]
+        while stack:
+            node, lo, hi = stack.pop()
+            depth = len(node.prefix)
+            if words[lo] == node.prefix:
+                lo += 1 # the node's own word sorts first and is offered by the parent
+            options = []
+            while lo < hi:
+                # find the range of words sharing the next character
+                c = words[lo][depth]
+                end = lo + 1
+                while end < hi and words[end][depth] == c:
+                    end += 1
+                if end - lo == 1:
+                    options.append((words[lo], words[lo], None))
+                else:
+                    # collapse the chain of single children up to the next word or branching point
+                    label = commonprefix([words[lo], words[end - 1]])
+                    child = cls(label, node)
+                    if words[lo] == label:
+                        options.append((label, label, None))
+                    options.append((label + "*", None, child))
+                    stack.append((child, lo, end))
+                lo = end
+            node.options = tuple(options)
+            node.labels = tuple(o[0] for o in options)
+        return root
 
+_bip39_trie = None
 
+def bip39_trie():
+    """The radix trie of the english BIP39 wordlist, built once per process"""
+    global _bip39_trie
+    if _bip39_trie is None:
+        from crypto.mnemonic import Mnemonic
+        _bip39_trie = RadixTrie.build(Mnemonic().wordlist)
+    return _bip39_trie
@@ -1,14 +1,17 @@
-import os
+import asyncio as aio
 import subprocess
 import re
+from collections import OrderedDict
 from binascii import hexlify, unhexlify
 from hashlib import sha256
-from tempfile import NamedTemporaryFile
-from proof.ux import ux_show_story
+from proof.ux import ux_show_story, ux_show_message, ux_input, get_terminal_size, wrap_lines
 from proof.wallet import Wallet
 from proof.bitcoind import BitcoindAdapter
-from os import listdir
-from os.path import isfile, join
+from proof.fountain import FountainDecoder, is_fountain_part
+from proof.scanner import QRScanner, list_images, decode_images
+from proof.listview import ListView
+from proof import qr
+from proof import telemetry
 from proof.constants import *
 
 fg = lambda text, color: "\33[38;5;" + str(color) + "m" + text + "\33[0m"
@@ -76,38 +79,310 @@ def display_mnemonic(mnemonic):
         result += f"{' ' if i < 9 else ''}{str(i+1)}. {word}\n"
     return result
 
+# Rendered QR codes keyed by content hash; kept for the life of the session
+QR_CACHE = {}
+# Renders in progress keyed by content hash
+QR_PENDING = {}
+_qr_executor = None
+
+def qr_cache_key(data):
+    """Content hash identifying a rendered QR code"""
+    return sha256(f"{QR_ECC_LEVEL}|{QR_MARGIN}|{data}".encode()).hexdigest()
+
+def render_qr(data):
+    """Encodes and renders string data as an ANSI encoded QR code (uncached)"""
+    return qr.encode(data, QR_ECC_LEVEL).to_ansi(QR_MARGIN)
+
 def generate_qr(data):
     """Generates an ANSI encoded QR code from string data"""
+    key = qr_cache_key(data)
+    if key not in QR_CACHE:
+        QR_CACHE[key] = render_qr(data)
+    return QR_CACHE[key]
+
+def get_qr_executor():
+    """Lazily creates the process pool used to render QR codes in parallel"""
+    global _qr_executor
+    if _qr_executor is None:
+        from concurrent.futures import ProcessPoolExecutor # multiprocessing is slow to import
+        _qr_executor = ProcessPoolExecutor()
+    return _qr_executor
+
+def render_qr_async(data):
+    """
+    Renders a QR code on the process pool without caching it (e.g. the
+    frames of an animated QR code, which are only displayed once)
 
-    # create temp files
-    tmp1 = NamedTemporaryFile()
-    tmp2 = NamedTemporaryFile()
-    # write raw data to file 1
-    with open(tmp1.name, 'w') as f1:
-        f1.write(data)
-    # write ANSII qr code from file 1 to file 2
-    cmd = f"qrencode --read-from={tmp1.name} --output={tmp2.name} --type=ANSI"
-    outcode = os.system(cmd)
-    # read qr data and return
-    with open(tmp2.name, 'r') as f2:
-        out = f2.read()
-    tmp1.delete
-    tmp2.delete
-    return out
+    Returns:
+        asyncio future resolving to the rendered QR code
+    """
+    return aio.get_event_loop().run_in_executor(get_qr_executor(), render_qr, data)
+
+def prerender_qrs(chunks):
+    """
+    Renders the QR codes for a list of chunks in parallel on a process pool.
+
+    Chunks are submitted in order so the first QR code is ready before the
+    rest; rendered codes are added to QR_CACHE as they complete and chunks
+    that are already cached or being rendered are not rendered again.
+
+    Parameters:
+        chunks (list[str]): data to render
+
+    Returns:
+        list of asyncio futures resolving to the rendered QR codes
+    """
+    loop = aio.get_event_loop()
+    futures = []
+    for data in chunks:
+        key = qr_cache_key(data)
+        if key in QR_CACHE:
+            future = loop.create_future()
+            future.set_result(QR_CACHE[key])
+        elif key in QR_PENDING:
+            future = QR_PENDING[key]
+        else:
+            future = loop.run_in_executor(get_qr_executor(), render_qr, data)
+            QR_PENDING[key] = future
+            def cache(f, key=key):
+                QR_PENDING.pop(key, None)
+                if not f.cancelled() and f.exception() is None:
+                    QR_CACHE[key] = f.result()
+            future.add_done_callback(cache)
+        futures.append(future)
+    return futures
+
+class AddressPages:
+    """
+    LRU cache of derived address pages for one wallet.
+
+    Pages are keyed by (change, start, count) and derived with
+    deriveaddresses on a worker thread. The cache holds futures, so a page
+    that is being prefetched in the background is awaited rather than derived
+    a second time.
 
-async def scan_qr():
+    Parameters:
+        w        (Wallet): wallet to derive addresses for
+        size        (int): maximum number of pages kept
+    """
+    def __init__(self, w, size=ADDRESS_PAGE_CACHE_SIZE):
+        self.w = w
+        self.size = size
+        self.pages = OrderedDict()
+
+    def fetch(self, change, start, count):
+        """Starts (or reuses) the derivation of a page and returns its future"""
+        key = (change, start, count)
+        future = self.pages.get(key)
+        if future is not None:
+            self.pages.move_to_end(key)
+            return future
+        loop = aio.get_event_loop()
+        future = loop.run_in_executor(None, self.w.deriveaddresses, start, start + count - 1, change)
+        def forget_failure(f, key=key):
+            if f.cancelled() or f.exception() is not None:
+                if self.pages.get(key) is f:
+                    del self.pages[key]
+        future.add_done_callback(forget_failure)
+        self.pages[key] = future
+        while len(self.pages) > self.size:
+            self.pages.popitem(last=False)
+        return future
+
+    def is_ready(self, change, start, count):
+        """True if the page has already been derived"""
+        future = self.pages.get((change, start, count))
+        return future is not None and future.done()
+
+    async def get(self, change, start, count):
+        """Derives a page of addresses (or returns it from the cache)"""
+        return await self.fetch(change, start, count)
+
+    def prefetch(self, start, count):
+        """Derives the receive and change pages around the given one in the background"""
+        for page_start in (start + count, start - count):
+            if page_start < 0 or page_start + count - 1 > MAX_ADDRESS_INDEX:
+                continue
+            for change in (0, 1):
+                self.fetch(change, page_start, count)
+
+def qr_render_size(version):
+    """
+    Terminal space taken by a QR code of the given version rendered by generate_qr.
+
+    Returns:
+        (lines, columns) tuple
+    """
+    modules = qr.symbol_size(version) + 2 * QR_MARGIN
+    return -(-modules // 2), modules # each character displays two stacked modules
+
+def max_qr_payload(mode, page):
+    """
+    Chooses the largest payload whose QR code fits on the terminal.
+
+    Picks the highest QR version whose QR code can be displayed in full on
+    the page that shows it, given the current terminal size, and returns its
+    capacity. The page is laid out with a payload of that size and a
+    placeholder of the size of the QR code, so every line it takes is counted.
+
+    Parameters:
+        mode  (str): QR encoding mode of the payload (see proof.qr)
+        page (func): called with (payload, rendered QR code) to lay out the screen
+
+    Returns:
+        maximum number of characters per QR code
+    """
+    size = get_terminal_size()
+    H = size['lines']
+    W = size['columns']
+    for version in range(qr.MAX_VERSION, qr.MIN_VERSION - 1, -1):
+        lines, columns = qr_render_size(version)
+        if columns > W:
+            continue
+        payload = qr.capacity(version, QR_ECC_LEVEL, mode)
+        placeholder = (' ' * columns + '\n') * lines
+        if len(wrap_lines(page('x' * payload, placeholder), W)) <= H:
+            return payload
+    # the terminal is too small for any QR code; use the smallest and let the user scroll
+    return qr.capacity(qr.MIN_VERSION, QR_ECC_LEVEL, mode)
+
+async def scan_qr(scanner=None):
     """
     Async utility for scanning a qr code using zbarcam.
 
+    Parameters:
+        scanner (QRScanner): (optional) scanner session to read from; without one
+                             zbarcam is started for this single scan
+
     Returns:
         scanned data as string
     """
-    cmd = ["zbarcam", "--raw", "--nodisplay"]
-    popen = subprocess.Popen(cmd, stdout=subprocess.PIPE, universal_newlines=True)
-    for stdout_line in iter(popen.stdout.readline, ""):
-        popen.stdout.close()
-        popen.wait()
-        return stdout_line.rstrip('\n')
+    if scanner is None:
+        async with QRScanner() as scanner:
+            return await scanner.scan()
+    return await scanner.scan()
+
+async def scan_fountain_qr(first_part, scanner=None):
+    """
+    Async utility for scanning an animated (fountain encoded) QR code.
+
+    Keeps the scanner running until enough parts have been captured to
+    reconstruct the message; parts may be captured in any order.
+
+    Parameters:
+        first_part      (str): the fountain encoded part that was already scanned
+        scanner   (QRScanner): (optional) scanner session to read the other parts from
+
+    Returns:
+        decoded data as string or None if the parts do not form a valid message
+    """
+    decoder = FountainDecoder()
+    if not decoder.receive_part(first_part):
+        return None
+    if scanner is None:
+        async with QRScanner() as scanner:
+            return await scan_fountain_qr(first_part, scanner)
+    while not decoder.is_complete():
+        ux_show_message(f"""Proof Wallet: Scanning Animated QR Code
+
+Keep the animated QR code in front of the camera.
+
+Progress: {round(100 * decoder.progress)}%
+""")
+        part = await scanner.scan()
+        if part is None: # the scanner stopped
+            return None
+        decoder.receive_part(part)
+    try:
+        return decoder.result().decode()
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def assemble_chunks(payloads):
+    """
+    Assembles decoded QR payloads into data chunks.
+
+    Fountain encoded parts (frames of an animated QR code) are combined into
+    the single message they encode; every other payload is a chunk of its own.
+
+    Parameters:
+        payloads (list[str]): scanned data in import order
+
+    Returns:
+        list of chunks in import order, or None if the fountain encoded parts
+        do not form a complete message
+    """
+    chunks = []
+    decoder = None
+    for data in payloads:
+        if is_fountain_part(data):
+            if decoder is None:
+                decoder = FountainDecoder()
+                chunks.append(decoder) # placeholder for the decoded message
+            decoder.receive_part(data)
+        else:
+            chunks.append(data)
+    if decoder is not None:
+        if not decoder.is_complete():
+            return None
+        try:
+            message = decoder.result().decode()
+        except (ValueError, UnicodeDecodeError):
+            return None
+        chunks = [message if c is decoder else c for c in chunks]
+    return chunks
+
+async def import_qr_images(title):
+    """
+    Interaction for importing QR codes from image files instead of the camera.
+
+    Every image is decoded concurrently with zbarimg and the results are
+    assembled in file name order.
+
+    Parameters:
+        title (str): title of the screen that started the import
+
+    Returns:
+        list of imported chunks (see assemble_chunks) or None if the import failed
+    """
+    source = await ux_input(f"""{title}
+
+Enter the path of a directory containing photos of the QR codes (they are \
+imported in file name order) or the path of a single image file.
+
+Controls:
+[Enter] -- import the images
+[Esc]   -- cancel the import
+""")
+    if not source:
+        return None
+    paths = list_images(source)
+    error = None
+    if len(paths) == 0:
+        error = f"No image files were found at {source}."
+    else:
+        ux_show_message(f"{title}\n\nDecoding {len(paths)} images...")
+        results = await decode_images(paths)
+        payloads = [data for _, decoded in results for data in decoded]
+        missing = [path for path, decoded in results if len(decoded) == 0]
+        chunks = assemble_chunks(payloads)
+        if chunks is None:
+            error = "The images do not contain enough frames of the animated QR code."
+        elif len(missing) > 0 and not all(map(is_fountain_part, payloads)):
+            error = "No QR code could be decoded in the following images:\n\n" + "\n".join(missing)
+        elif len(chunks) == 0:
+            error = "The images do not contain any QR codes."
+    if error is not None:
+        msg = f"""{title}
+
+Import Error
+{error}
+
+Press [Enter] to go back.
+"""
+        await ux_show_story(msg, ['\r'])
+        return None
+    return chunks
 
 def is_complete(w):
     """
@@ -118,44 +393,19 @@ def is_complete(w):
     """
     return len(w.cosigners) + 1 == w.n
 
-def get_all_wallets():
-    """Fetches all Wallets persisted to the filesystem"""
-    path = Wallet.get_dir()
-    wallet_files = [f for f in listdir(path) if isfile(join(path, f))]
-    return list(map(lambda f: Wallet.load(f), wallet_files))
-
 async def choose_from_list(msg_prefix, options):
     """
     Async utility for choosing an item from a list.
 
+    Only the visible part of the list is rendered; see ListView.
+
     Parameters:
         msg_prefix       (str): informational text
         options    (list[str]): options to choose from
     Returns:
         index selected or None if user cancels menu
     """
-    selected = 0
-    pointer = " --> "
-    controls = """Controls:
-[Enter] -- make selection
-'n'     -- next item in list
-'p'     -- previous item in list
-'x'     -- go back
-"""
-    while True:
-        msg = f"{msg_prefix}\n\n{controls}\n\n"
-        for i, opt in enumerate(options):
-            prefix = pointer if i == selected else len(pointer) * " "
-            msg += prefix + options[i] + "\n"
-        ch = await ux_show_story(msg, ['n', 'p', '\r', 'x'])
-        if ch == 'n' and len(options) > 0:
-            selected = (selected + 1) % len(options)
-        elif ch == 'p' and len(options) > 0:
-            selected = (selected - 1) % len(options)
-        elif ch == '\r' and len(options) > 0:
-            return selected
-        elif ch == 'x':
-            return None
+    return await ListView(msg_prefix, options).choose()
 
 async def import_data_warning(data):
     """
@@ -226,6 +476,7 @@ def is_valid_xpub(xpub, network):
         boolean
     """
     adapter = BitcoindAdapter(network)
+    adapter.ensure_bitcoind_running()
     desc = f"pk({xpub})"
     try:
         adapter.bitcoin_cli_checkoutput("getdescriptorinfo", desc)
@@ -265,6 +516,7 @@ def validate_psbt(psbt_raw, w):
         "importmulti_hi": None,
         "analyze_result": None
     }
+    checks = telemetry.NO_SPAN
     try:
         # attempt to decode psbt
         psbt = w.decodepsbt(psbt_raw)
@@ -275,6 +527,10 @@ def validate_psbt(psbt_raw, w):
         response["success"].append("The provided base64 encoded input is a valid PSBT.")
 
         fps = set(wallet_fingerprints(w))
+        # times the checks of every input and output (the RPCs above are timed by the wallet)
+        checks = telemetry.span(
+            "per_input_validation", inputs=len(psbt[PSBT_INPUTS]), outputs=len(psbt[PSBT_OUTPUTS])
+        ).start()
 
         # GENERAL VALIDATIONS
         if len(psbt[PSBT_INPUTS]) < 1:
@@ -438,4 +694,7 @@ If not, you can safely ignore this warning""")
     # Catch any other unexpected exception that may occur
     except:
         response["error"].append("An unexpected error occurred during the PSBT validation process")
+    finally:
+        checks.set(errors=len(response["error"]), warnings=len(response["warning"]))
+        checks.finish()
     return response
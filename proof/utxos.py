@@ -0,0 +1,269 @@
+import asyncio as aio
+import json
+import re
+
+# Blocks whose changes are kept to rewind a reorg; deeper reorgs rebuild the cache
+UNDO_DEPTH = 100
+# Catching up on more blocks than this rescans the UTXO set instead
+REBUILD_AFTER = 1000
+# Blocks fetched concurrently while catching up
+BLOCK_CONCURRENCY = 8
+SATS_PER_BTC = 100000000
+# Matches the address in the descriptor scantxoutset reports for an addr() scan object
+ADDR_DESCRIPTOR = re.compile(r'^addr\(([^)]+)\)')
+
+def to_sats(btc):
+    """Converts an amount in BTC (as reported by Bitcoin Core) to satoshis"""
+    return int(round(btc * SATS_PER_BTC))
+
+def format_btc(sats):
+    """Formats an amount in satoshis as BTC with all 8 decimals"""
+    return f"{sats // SATS_PER_BTC}.{sats % SATS_PER_BTC:08d}"
+
+def output_address(out):
+    """The address paid by a transaction output from getblock (None if it has none)"""
+    script = out.get("scriptPubKey", {})
+    if "address" in script:
+        return script["address"]
+    addresses = script.get("addresses") or [] # Bitcoin Core before v22
+    return addresses[0] if len(addresses) == 1 else None
+
+class Utxo:
+    """
+    An unspent output held by the wallet
+
+    Attributes:
+        txid    (str): id of the transaction that created the output
+        vout    (int): index of the output in that transaction
+        change  (int): derivation branch of the address it pays (0: receive, 1: change)
+        idx     (int): derivation index of the address it pays
+        amount  (int): value in satoshis
+        height  (int): height of the block that confirmed it
+    """
+    __slots__ = ("txid", "vout", "change", "idx", "amount", "height")
+
+    def __init__(self, txid, vout, change, idx, amount, height):
+        self.txid = txid
+        self.vout = vout
+        self.change = change
+        self.idx = idx
+        self.amount = amount
+        self.height = height
+
+    @property
+    def outpoint(self):
+        return (self.txid, self.vout)
+
+    def to_dict(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+class UtxoCache:
+    """
+    A wallet's unspent outputs, kept up to date block by block.
+
+    The cache records the block it is synced to. Each sync asks Bitcoin Core
+    for the chain tip and only applies the blocks mined since (read with
+    `getblock` at verbosity 2), so a visit to the wallet menu costs a few
+    RPCs instead of a scan of the whole UTXO set. The changes of the last
+    UNDO_DEPTH blocks are kept so that a reorg is handled by rewinding to the
+    fork point and applying the new branch. The UTXO set is only scanned
+    (`scantxoutset`) to build the cache, after a deeper reorg or when the
+    cache is more than REBUILD_AFTER blocks behind.
+
+    Outputs are matched against the wallet's addresses up to the gap limit
+    past the highest used address of each branch. Only confirmed outputs
+    are tracked.
+
+    Parameters:
+        wallet (Wallet): the wallet whose outputs are tracked
+        state    (dict): (optional) a cache saved with `state()`
+    """
+    def __init__(self, wallet, state=None):
+        self.wallet = wallet
+        self.height = None
+        self.hash = None
+        # changes of the latest blocks, oldest first
+        self.undo = []
+        self.utxos = {}
+        # number of addresses of each branch whose outputs are in the cache
+        self.watched = {0: 0, 1: 0}
+        # derived addresses: {address: (change, idx)}
+        self.addresses = {}
+        self.derived = {0: 0, 1: 0}
+        if state is not None:
+            self.height, self.hash = state["height"], state["hash"]
+            self.undo = state["undo"]
+            self.watched.update(state["watched"])
+            for u in state["utxos"]:
+                utxo = Utxo(**u)
+                self.utxos[utxo.outpoint] = utxo
+
+    @classmethod
+    def load(cls, wallet, store):
+        """Loads the wallet's cache from the wallet store (empty if it has none)"""
+        return cls(wallet, store.load_utxos(wallet.name))
+
+    def state(self):
+        """The cache in the format accepted by WalletStore.save_utxos"""
+        return {
+            "height": self.height,
+            "hash": self.hash,
+            "watched": dict(self.watched),
+            "undo": self.undo,
+            "utxos": [u.to_dict() for u in self.utxos.values()]
+        }
+
+    @property
+    def synced(self):
+        """True once the cache has been built"""
+        return self.hash is not None
+
+    def balance(self):
+        """Total value of the unspent outputs in satoshis"""
+        return sum(u.amount for u in self.utxos.values())
+
+    def spendable(self, min_conf=1):
+        """
+        Lists the outputs that can be spent
+
+        Parameters:
+            min_conf (int): minimum number of confirmations
+
+        Returns:
+            list of Utxos, largest first
+        """
+        if not self.synced:
+            return []
+        utxos = [u for u in self.utxos.values() if self.height - u.height + 1 >= min_conf]
+        return sorted(utxos, key=lambda u: (-u.amount, u.txid, u.vout))
+
+    async def watch(self, adapter, gap_limit):
+        """Derives the wallet's addresses up to gap_limit past the highest used address of each branch"""
+        for change in (0, 1):
+            # (and at least the addresses whose outputs are already in the cache)
+            start = self.derived[change]
+            end = max(self.watched[change], self.wallet.highest_used[change] + gap_limit + 1)
+            if end <= start:
+                continue
+            addresses = await adapter.bitcoin_cli_json_async(
+                "deriveaddresses", self.wallet.public_descriptor(change), json.dumps([start, end - 1])
+            )
+            for i, address in enumerate(addresses):
+                self.addresses[address] = (change, start + i)
+            self.derived[change] = end
+
+    async def sync(self, adapter, gap_limit):
+        """
+        Brings the cache up to date with Bitcoin Core's chain tip
+
+        Parameters:
+            adapter (BitcoindAdapter): adapter used to talk to Bitcoin Core
+            gap_limit          (int): number of unused addresses watched past the highest used one
+
+        Returns:
+            True if the cache changed
+        """
+        await self.watch(adapter, gap_limit)
+        if self.synced and any(self.derived[c] > self.watched[c] for c in (0, 1)):
+            # addresses that may have received coins before they were watched
+            self.height = self.hash = None
+        info = await adapter.bitcoin_cli_json_async("getblockchaininfo")
+        best_height, best_hash = info["blocks"], info["bestblockhash"]
+        if self.hash == best_hash:
+            return False
+        if self.synced:
+            await self.rewind_to_fork(adapter, best_height)
+        if not self.synced or best_height - self.height > REBUILD_AFTER:
+            await self.rebuild(adapter, gap_limit)
+            return True
+
+        while self.height < best_height:
+            heights = range(self.height + 1, min(best_height, self.height + BLOCK_CONCURRENCY) + 1)
+            blocks = await aio.gather(*[self.fetch_block(adapter, h) for h in heights])
+            for block in blocks:
+                if block.get("previousblockhash") != self.hash:
+                    # the chain changed while catching up
+                    await self.sync(adapter, gap_limit)
+                    return True
+                self.apply_block(block)
+            # outputs in these blocks may have moved the gap limit
+            await self.watch(adapter, gap_limit)
+            self.watched = {c: max(self.watched[c], self.derived[c]) for c in (0, 1)}
+        return True
+
+    async def fetch_block(self, adapter, height):
+        """Reads the block at the given height with its decoded transactions"""
+        block_hash = (await adapter.bitcoin_cli_checkoutput_async("getblockhash", str(height))).decode().strip()
+        return await adapter.bitcoin_cli_json_async("getblock", block_hash, "2")
+
+    async def rewind_to_fork(self, adapter, best_height):
+        """Undoes the cached blocks that are no longer in the best chain (forgets the cache if it can't)"""
+        while self.synced:
+            if self.height <= best_height:
+                block_hash = (await adapter.bitcoin_cli_checkoutput_async("getblockhash", str(self.height))).decode().strip()
+                if block_hash == self.hash:
+                    return
+            if not self.undo:
+                self.height = self.hash = None
+                return
+            self.rewind()
+
+    def apply_block(self, block):
+        """Applies the wallet's spent and received outputs in a block and records how to undo them"""
+        added, spent = [], []
+        highest_used = self.wallet.highest_used
+        for tx in block["tx"]:
+            for vin in tx["vin"]:
+                utxo = self.utxos.pop((vin.get("txid"), vin.get("vout")), None)
+                if utxo is not None:
+                    spent.append(utxo.to_dict())
+            for out in tx["vout"]:
+                address = output_address(out)
+                if address not in self.addresses:
+                    continue
+                change, idx = self.addresses[address]
+                utxo = Utxo(tx["txid"], out["n"], change, idx, to_sats(out["value"]), block["height"])
+                self.utxos[utxo.outpoint] = utxo
+                added.append([utxo.txid, utxo.vout])
+                highest_used[change] = max(highest_used[change], idx)
+        self.undo.append({
+            "height": block["height"], "hash": block["hash"], "prev": block["previousblockhash"],
+            "added": added, "spent": spent
+        })
+        del self.undo[:-UNDO_DEPTH]
+        self.height, self.hash = block["height"], block["hash"]
+
+    def rewind(self):
+        """Undoes the latest block"""
+        entry = self.undo.pop()
+        # restore first: an output may have been created and spent in the same block
+        for u in entry["spent"]:
+            utxo = Utxo(**u)
+            self.utxos[utxo.outpoint] = utxo
+        for txid, vout in entry["added"]:
+            self.utxos.pop((txid, vout), None)
+        self.height, self.hash = entry["height"] - 1, entry["prev"]
+
+    async def rebuild(self, adapter, gap_limit):
+        """Builds the cache from scans of the UTXO set for the watched addresses"""
+        highest_used = self.wallet.highest_used
+        while True:
+            # look ahead so that coins close to the end of the watched
+            # addresses rarely need another scan (each one reads the whole UTXO set)
+            await self.watch(adapter, 2 * gap_limit)
+            scan_objects = [f"addr({address})" for address in self.addresses]
+            result = await adapter.bitcoin_cli_json_async("scantxoutset", "start", json.dumps(scan_objects))
+            self.utxos = {}
+            for u in result.get("unspents", []):
+                match = ADDR_DESCRIPTOR.match(u.get("desc", ""))
+                if not match or match.group(1) not in self.addresses:
+                    continue
+                change, idx = self.addresses[match.group(1)]
+                utxo = Utxo(u["txid"], u["vout"], change, idx, to_sats(u["amount"]), u["height"])
+                self.utxos[utxo.outpoint] = utxo
+                highest_used[change] = max(highest_used[change], idx)
+            self.height, self.hash = result["height"], result["bestblock"]
+            self.undo = []
+            self.watched = dict(self.derived)
+            if all(self.derived[c] > highest_used[c] + gap_limit for c in (0, 1)):
+                return
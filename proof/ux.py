@@ -1,30 +1,232 @@
 import asyncio as aio
-import shutil
+import atexit
+import codecs
 import os
+import shutil
+import re
+import signal
 import sys
+import time
+from collections import OrderedDict
+from proof import telemetry
+
+ANSI_ESCAPE = re.compile(r'\x1b\[[0-9;]*m')
+
+# Keys that arrive as escape sequences
+KEY_UP = '\x1b[A'
+KEY_DOWN = '\x1b[B'
+KEY_RIGHT = '\x1b[C'
+KEY_LEFT = '\x1b[D'
+KEY_HOME = '\x1b[H'
+KEY_END = '\x1b[F'
+KEY_PAGE_UP = '\x1b[5~'
+KEY_PAGE_DOWN = '\x1b[6~'
+KEY_DELETE = '\x1b[3~'
+
+# Alternative encodings sent by some terminals (application cursor mode, vt220 keypads)
+KEY_ALIASES = {
+    '\x1bOA': KEY_UP,
+    '\x1bOB': KEY_DOWN,
+    '\x1bOC': KEY_RIGHT,
+    '\x1bOD': KEY_LEFT,
+    '\x1bOH': KEY_HOME,
+    '\x1bOF': KEY_END,
+    '\x1b[1~': KEY_HOME,
+    '\x1b[7~': KEY_HOME,
+    '\x1b[4~': KEY_END,
+    '\x1b[8~': KEY_END,
+}
+
+PASTE_START = '\x1b[200~'
+PASTE_END = '\x1b[201~'
+
+class KeyReader:
+    """
+    Reads keys from stdin without blocking the event loop.
+
+    The terminal is put in raw mode once for the whole session (output
+    processing stays on so the screen can be redrawn while waiting for a key)
+    and stdin is watched with loop.add_reader. Whatever bytes are available
+    are decoded into keys and pushed onto an async queue: printable and
+    control characters as themselves, escape sequences (arrows, home/end,
+    page up/down) as one of the KEY_* constants, and bracketed pastes as the
+    individual characters pasted. A lone Esc is told apart from the start of
+    an escape sequence by waiting ESCAPE_TIMEOUT seconds for the rest of it.
+    The terminal settings are restored on close and at exit.
+    """
+    ESCAPE_TIMEOUT = 0.05
 
-# Adapted from https://stackoverflow.com/questions/510357/python-read-a-single-character-from-the-user
-class Getch:
     def __init__(self):
-        import tty
+        self.queue = aio.Queue()
+        self.loop = None
+        self.fd = None
+        self.eof = False
+        self._buffer = ''
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._pasting = False
+        self._escape_timer = None
+        self._old_settings = None
+
+    @property
+    def running(self):
+        """True while stdin is being watched"""
+        return self.loop is not None
+
+    def start(self):
+        """Switches the terminal to raw mode and starts watching stdin"""
+        if self.running or self.eof:
+            return
+        self.loop = aio.get_event_loop()
+        self.fd = sys.stdin.fileno()
+        if os.isatty(self.fd):
+            import tty, termios
+            self._old_settings = termios.tcgetattr(self.fd)
+            tty.setraw(self.fd)
+            # keep output processing enabled so that the screen can be redrawn
+            # (e.g. animated QR codes) while we wait for a key
+            mode = termios.tcgetattr(self.fd)
+            mode[1] |= termios.OPOST | termios.ONLCR
+            termios.tcsetattr(self.fd, termios.TCSANOW, mode)
+            sys.stdout.write('\33[?2004h') # bracketed paste
+            sys.stdout.flush()
+            atexit.register(self.close)
+        self.loop.add_reader(self.fd, self._on_readable)
+
+    def close(self):
+        """Stops watching stdin and restores the terminal settings"""
+        if self.running:
+            self.loop.remove_reader(self.fd)
+            self.loop = None
+        if self._escape_timer is not None:
+            self._escape_timer.cancel()
+            self._escape_timer = None
+        if self._old_settings is not None:
+            import termios
+            sys.stdout.write('\33[?2004l')
+            sys.stdout.flush()
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self._old_settings)
+            self._old_settings = None
+
+    def _on_readable(self):
+        try:
+            data = os.read(self.fd, 4096)
+        except BlockingIOError:
+            return
+        if not data:
+            self.eof = True
+            self.close()
+            self.queue.put_nowait('') # wake up a pending getch
+            return
+        self.feed(self._decoder.decode(data))
+
+    def feed(self, text):
+        """Decodes input text into keys on the queue"""
+        if self._escape_timer is not None:
+            self._escape_timer.cancel()
+            self._escape_timer = None
+        self._buffer += text
+        self._parse()
+        if self._buffer and not self._pasting and self.loop is not None:
+            self._escape_timer = self.loop.call_later(self.ESCAPE_TIMEOUT, self._flush)
+
+    def _flush(self):
+        """An escape sequence never completed: deliver what arrived as separate keys"""
+        self._escape_timer = None
+        buf, self._buffer = self._buffer, ''
+        for ch in buf:
+            self.queue.put_nowait(ch)
+
+    def _parse(self):
+        buf = self._buffer
+        i = 0
+        while i < len(buf):
+            if self._pasting:
+                end = buf.find(PASTE_END, i)
+                if end == -1:
+                    # hold back what could be the start of the end marker
+                    keep = next((k for k in range(len(PASTE_END) - 1, 0, -1) if buf.endswith(PASTE_END[:k])), 0)
+                    stop = len(buf) - keep
+                else:
+                    stop = end
+                for ch in buf[i:stop]:
+                    self.queue.put_nowait(ch)
+                if end == -1:
+                    i = stop
+                    break
+                i = end + len(PASTE_END)
+                self._pasting = False
+                continue
+
+            ch = buf[i]
+            if ch != '\x1b':
+                self.queue.put_nowait(ch)
+                i += 1
+                continue
+
+            seq_len = escape_sequence_length(buf, i)
+            if seq_len is None:
+                break # incomplete, wait for the rest
+            seq = buf[i:i+seq_len]
+            i += seq_len
+            if seq == PASTE_START:
+                self._pasting = True
+            elif seq != PASTE_END:
+                self.queue.put_nowait(KEY_ALIASES.get(seq, seq))
+        self._buffer = buf[i:]
 
-    def __call__(self):
-        import tty, termios
-        fd = sys.stdin.fileno()
-        old_settings = termios.tcgetattr(fd)
+    async def get(self, timeout=None):
+        """
+        Waits for the next key
+
+        Returns:
+            the key, '' once stdin is closed or None if the timeout elapsed first
+        """
+        if self.eof and self.queue.empty():
+            return ''
+        self.start()
         try:
-            tty.setraw(sys.stdin.fileno())
-            ch = sys.stdin.read(1)
-        finally:
-            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-        return ch
-
-async def getch():
-    """Async utility to fetch a single key the user presses"""
-    q = aio.Queue()
-    loop = aio.get_event_loop()
-    aio.ensure_future(q.put(Getch()()), loop=loop)
-    return (await q.get())
+            return await aio.wait_for(self.queue.get(), timeout)
+        except aio.TimeoutError:
+            return None
+
+def escape_sequence_length(buf, i):
+    """
+    Length of the escape sequence starting at buf[i]
+
+    Returns:
+        number of characters in the sequence or None if it is incomplete
+    """
+    if i + 1 >= len(buf):
+        return None
+    kind = buf[i+1]
+    if kind == '[':
+        # CSI: parameter and intermediate bytes followed by a final byte
+        for j in range(i + 2, len(buf)):
+            if '\x40' <= buf[j] <= '\x7e':
+                return j - i + 1
+        return None
+    if kind == 'O':
+        return 3 if i + 2 < len(buf) else None
+    return 1 # Esc followed by an ordinary key
+
+# The keyboard shared by every prompt
+KEYBOARD = KeyReader()
+
+async def getch(timeout=None):
+    """
+    Async utility to fetch a single key the user presses
+
+    Parameters:
+        timeout (float): (optional) seconds to wait for a key
+
+    Returns:
+        the key pressed (a KEY_* constant for special keys) or None if the timeout elapsed first
+    """
+    started = time.perf_counter()
+    try:
+        return await KEYBOARD.get(timeout)
+    finally:
+        telemetry.count_wait(time.perf_counter() - started)
 
 def get_terminal_size():
     """Gets the current size of the terminal"""
@@ -34,6 +236,12 @@ def get_terminal_size():
         "columns": size.columns
     }
 
+def visible_len(ln):
+    """Number of terminal columns a line occupies (ANSI color codes take none)"""
+    if '\x1b' not in ln:
+        return len(ln)
+    return len(ANSI_ESCAPE.sub('', ln))
+
 def word_wrap(ln, w):
     """Utility to wrap a line if it's longer than the given width"""
     while ln:
@@ -55,52 +263,208 @@ def word_wrap(ln, w):
 
         yield left
 
-async def ux_show_story(msg, escape=None):
+def wrap_lines(msg, W):
+    """
+    Splits a story into the lines it occupies on a terminal of the given width
+
+    Parameters:
+        msg (str): story displayed to user
+        W   (int): terminal width
+
+    Returns:
+        list of lines with trailing blank lines removed
+    """
+    lines = []
+    for ln in msg.split('\n'):
+        if visible_len(ln) > W:
+            lines.extend(word_wrap(ln, W))
+        else:
+            # ok if empty string, just a blank line
+            lines.append(ln)
+
+    # trim blank lines at end, add our own marker
+    while len(lines) > 1 and not lines[-1]:
+        lines = lines[:-1]
+    return lines
+
+class Screen:
+    """
+    Terminal renderer that only redraws what changed.
+
+    Keeps the lines of the previous frame and the wrapped lines of recently
+    shown stories (per message and terminal width). Drawing a frame moves the
+    cursor to each changed line with ANSI escape codes and writes all changes
+    in a single buffered write, so scrolling or updating part of a story
+    doesn't clear and reprint the whole terminal. The terminal size is only
+    re-read when the terminal is resized (SIGWINCH).
+    """
+    WRAP_CACHE_SIZE = 32
+
+    def __init__(self):
+        self.previous = None # lines on screen; None forces a full redraw
+        self.previous_lines = None # wrapped story the previous frame was cut from
+        self.previous_top = 0
+        self.size = None
+        self._wrapped = OrderedDict()
+        self._resized = True
+        self._resize_handler_installed = False
+
+    def _install_resize_handler(self):
+        if self._resize_handler_installed or not hasattr(signal, "SIGWINCH"):
+            return
+        try:
+            signal.signal(signal.SIGWINCH, lambda *_: self.invalidate(resized=True))
+        except ValueError: # not on the main thread
+            return
+        self._resize_handler_installed = True
+
+    def invalidate(self, resized=False):
+        """Forces the next frame to be redrawn in full (e.g. after other output)"""
+        self.previous = None
+        if resized:
+            self._resized = True
+
+    def terminal_size(self):
+        """The cached terminal size; refreshed only after a resize"""
+        self._install_resize_handler()
+        if self._resized or self.size is None:
+            self._resized = False
+            self.size = get_terminal_size()
+        return self.size
+
+    def wrap(self, msg):
+        """Wrapped lines of a story for the current width (cached)"""
+        key = (msg, self.terminal_size()['columns'])
+        lines = self._wrapped.get(key)
+        if lines is None:
+            lines = wrap_lines(msg, key[1])
+            self._wrapped[key] = lines
+            if len(self._wrapped) > self.WRAP_CACHE_SIZE:
+                self._wrapped.popitem(last=False)
+        else:
+            self._wrapped.move_to_end(key)
+        return lines
+
+    def draw(self, msg, top=0):
+        """
+        Draws a story starting at the given line
+
+        Parameters:
+            msg (str): story displayed to user
+            top (int): index of the first line to display
+
+        Returns:
+            the total number of lines in the wrapped story
+        """
+        H = self.terminal_size()['lines']
+        lines = self.wrap(msg)
+        frame = lines[top:top+H]
+        frame += [''] * (H - len(frame))
+
+        out = []
+        if self.previous is None or len(self.previous) != H:
+            out.append('\33[H\33[2J')
+            previous = [None] * H
+        else:
+            previous = self.previous
+            shift = top - self.previous_top
+            if self.previous_lines is lines and 0 < abs(shift) < H:
+                # scrolling the same story: shift the viewport and only draw the new lines
+                if shift > 0:
+                    out.append(f'\33[{shift}S')
+                    previous = previous[shift:] + [None] * shift
+                else:
+                    out.append(f'\33[{-shift}T')
+                    previous = [None] * -shift + previous[:shift]
+        for y, (old, new) in enumerate(zip(previous, frame)):
+            if old != new:
+                out.append(f'\33[{y+1};1H{new}\33[0m\33[K')
+        sys.stdout.write(''.join(out))
+        sys.stdout.flush()
+        self.previous = frame
+        self.previous_lines = lines
+        self.previous_top = top
+        return len(lines)
+
+# The screen shared by every story
+SCREEN = Screen()
+
+def render_story(msg, top=0):
+    """
+    Draws a story starting at the given line, redrawing only changed lines
+
+    Parameters:
+        msg (str): story displayed to user
+        top (int): index of the first line to display
+
+    Returns:
+        the total number of lines in the wrapped story
+    """
+    return SCREEN.draw(msg, top)
+
+def ux_show_message(msg):
+    """Show a story without waiting for user input (e.g. progress updates)"""
+    render_story(msg)
+
+async def ux_show_story(msg, escape=None, timeout=None):
     """
     Show a big long string and wait for an escape character to continue
 
-    'U' (up) and 'D' down can be used to scroll through stories that extend past the
-    height of the terminal. Function based on code by Coinkite.
+    'U' (up) and 'D' down (or the arrow and page up/down keys) can be used to scroll
+    through stories that extend past the height of the terminal. Function based on code
+    by Coinkite.
 
     Parameters:
         msg          (str): story displayed to user
         escape (list[chr]): list of escape characters
+        timeout    (float): (optional) seconds to wait for a key before returning None
 
     Returns:
-        character used to escape
+        character used to escape or None if the timeout elapsed
     """
     top = 0
     while 1:
-        size = get_terminal_size()
-        H = size['lines']
-        W = size['columns']
-        ch = None
-        lines = []
-
-        for ln in msg.split('\n'):
-            if len(ln) > W:
-                lines.extend(word_wrap(ln, W))
-            else:
-                # ok if empty string, just a blank line
-                lines.append(ln)
-                
-        # trim blank lines at end, add our own marker
-        while not lines[-1]:
-            lines = lines[:-1]
-        
-        # redraw
-        os.system('clear')
-
-        y=0
-        for ln in lines[top:top+H]:
-            print(ln)
+        num_lines = render_story(msg, top)
 
         # wait to do something
-        ch = await getch()
-        if escape and (ch == escape or ch in escape):
+        ch = await getch(timeout)
+        if ch is None:
+            return None
+        elif escape and (ch == escape or ch in escape):
             # allow another way out for some usages
             return ch
-        elif ch == 'U':     # scroll up
+        elif ch in ('U', KEY_UP):     # scroll up
             top = max(0, top-1)
-        elif ch == 'D':     # scroll dn
-            top = min(len(lines)-2, top+1)
+        elif ch in ('D', KEY_DOWN):   # scroll dn
+            top = min(num_lines-2, top+1)
+        elif ch == KEY_PAGE_UP:
+            top = max(0, top - SCREEN.terminal_size()['lines'] + 1)
+        elif ch == KEY_PAGE_DOWN:
+            top = max(0, min(num_lines-2, top + SCREEN.terminal_size()['lines'] - 1))
+
+PRINTABLE_KEYS = [chr(c) for c in range(32, 127)]
+BACKSPACE_KEYS = ['\x7f', '\x08']
+CANCEL_KEYS = ['\x1b', '\x03'] # Esc, Ctrl-C
+
+async def ux_input(msg, prompt="> "):
+    """
+    Show a story followed by a text prompt and read a line typed by the user
+
+    Parameters:
+        msg    (str): story displayed above the prompt
+        prompt (str): prompt displayed before the typed text
+
+    Returns:
+        the entered text or None if the user cancels with Esc
+    """
+    text = ""
+    while True:
+        ch = await ux_show_story(f"{msg}\n{prompt}{text}", PRINTABLE_KEYS + BACKSPACE_KEYS + CANCEL_KEYS + ['\r'])
+        if ch == '\r':
+            return text
+        elif ch in CANCEL_KEYS:
+            return None
+        elif ch in BACKSPACE_KEYS:
+            text = text[:-1]
+        else:
+            text += ch
@@ -1,9 +1,27 @@
+import asyncio as aio
 import json
+import math
 import os
+import random
 import subprocess
 from proof.bitcoind import BitcoindAdapter
+from proof import telemetry
+from proof.store import get_store
+from proof.utxos import UtxoCache, ADDR_DESCRIPTOR, format_btc
+from proof.coinselect import (
+    select_coins, multisig_input_vsize, output_vsize, TX_OVERHEAD_VSIZE, P2WSH_SCRIPT_LEN, DUST_LIMIT
+)
+from crypto.psbt import remove_non_witness_utxos
 from crypto.mnemonic import Mnemonic
 from crypto import bip32
+from crypto.descriptor import descsum_create
+
+# Version of the public artifacts persisted with saved wallets
+WALLET_FORMAT_VERSION = 1
+# Maximum number of concurrent RPCs when loading many wallets
+RPC_CONCURRENCY = 8
+# Consecutive unused addresses after which an address scan stops
+GAP_LIMIT = 20
 
 class Cosigner:
     """
@@ -31,51 +49,76 @@ class Wallet:
         network    (str): the blockchain this wallet uses; one of {"mainnet", "testnet", "regtest"}
         name       (str): (optional) name of this wallet
     """
-    def __init__(self, mnemonic, cosigners, m, n, network="mainnet", name=None):
-        self.network = network
-        # ensure bitcoind running
-        self.adapter.ensure_bitcoind_running()
+    # adapter used to talk to Bitcoin Core (replaceable for benchmarks)
+    adapter_class = BitcoindAdapter
 
+    def __init__(self, mnemonic, cosigners, m, n, network="mainnet", name=None, public=None):
+        self.network = network
         self.mnemonic = mnemonic
         self.cosigners = cosigners
         self.m = m
         self.n = n
-        self.name = f"wallet-{self.fingerprint}" if name is None else name
 
-        # create wallet
-        self.createwallet()
+        # public artifacts; persisted with saved wallets so that loading a
+        # wallet needs no key derivation or RPCs (see verify_public_data)
+        public = public or {}
+        self._public_loaded = bool(public.get("xpub"))
+        self._xpub = public.get("xpub")
+        self._fingerprint = public.get("fingerprint")
+        self._descriptors = dict(public.get("descriptors") or {})
+        self._xprv = None
+        self._created = False
+        self.verification = None # background verification of the persisted artifacts
+        # highest address index found to be used per branch (-1: none; see scan_usage)
+        self.highest_used = {0: -1, 1: -1}
+        self._utxos = None
+        self.utxo_sync = None # background sync of the UTXO cache
+
+        self.name = f"wallet-{self.fingerprint}" if name is None else name
 
     @property
     def xprv(self):
         """Derives the signer's xprv"""
-        M = Mnemonic()
-        seed = M.to_seed(self.mnemonic)
-        return M.to_hd_master_key(seed, self.adapter.network)
+        if self._xprv is None:
+            M = Mnemonic()
+            seed = M.to_seed(self.mnemonic)
+            self._xprv = M.to_hd_master_key(seed, self.network)
+        return self._xprv
 
-    @property
-    def xpub(self):
-        """Derives the signer's xpub"""
+    def derive_xpub(self):
+        """Derives the signer's xpub from its xprv with Bitcoin Core"""
         desc = f"pk({self.xprv})"
         out = self.adapter.bitcoin_cli_json("getdescriptorinfo", desc)
         pubdesc = out['descriptor'] # 'pk(XPUB)#checksum'
         return pubdesc[3:-10] # slice off 'pk(' prefix and ')#checksum' suffix
 
+    @property
+    def xpub(self):
+        """The signer's xpub"""
+        if self._xpub is None:
+            self._xpub = self.derive_xpub()
+        return self._xpub
+
     @property
     def fingerprint(self):
-        """Derives the signer's bip32 fingerprint"""
-        return bip32.fingerprint(self.xpub)
+        """The signer's bip32 fingerprint"""
+        if self._fingerprint is None:
+            self._fingerprint = bip32.fingerprint(self.xpub)
+        return self._fingerprint
 
     @property
     def adapter(self):
-        """Retrieves an adapter for interfacing with Bitcoin Core"""
-        return BitcoindAdapter(self.network)
+        """Retrieves an adapter for interfacing with Bitcoin Core (starting bitcoind on first use)"""
+        adapter = self.adapter_class(self.network)
+        adapter.ensure_bitcoind_running()
+        return adapter
 
     @staticmethod
     def get_dir():
         """Gets the directory where this wallet can be saved to"""
         _dir = os.getenv("HOME") + "/.proof"
         if not os.path.isdir(_dir):
-            os.makedirs(_dir)
+            os.makedirs(_dir, mode=0o700) # holds the wallet store (see proof/store.py)
         return _dir
 
     @property
@@ -83,24 +126,107 @@ class Wallet:
         """Gets the path where this wallet would be if saved to the filesystem"""
         return Wallet.get_dir() + "/" + self.name
 
+    @property
+    def finalized(self):
+        """True once the wallet knows all of its cosigner xpubs"""
+        return len(self.cosigners) + 1 == self.n
+
+    def public_data(self):
+        """The public artifacts persisted with the wallet"""
+        return {
+            "xpub": self.xpub,
+            "fingerprint": self.fingerprint,
+            "descriptors": {change: self.public_descriptor(change) for change in (0, 1)},
+            "format_version": WALLET_FORMAT_VERSION
+        }
+
     def save(self):
-        """Saves this wallet to the filesystem as a json file"""
-        data = json.dumps(self, default=lambda o: o.__dict__)
-        with open(self.wallet_path, 'w') as f:
-            f.write(data)
+        """Saves this wallet (including its private key data) to the wallet store"""
+        d = {
+            "name": self.name,
+            "network": self.network,
+            "m": self.m,
+            "n": self.n,
+            "mnemonic": self.mnemonic,
+            "cosigners": [c.__dict__ for c in self.cosigners]
+        }
+        d.update(self.public_data())
+        store = get_store()
+        store.save_wallet(d)
+        if self._utxos is not None and self._utxos.synced:
+            store.save_utxos(self.name, self._utxos.state())
 
     @classmethod
     def load(cls, name):
-        """Loads the wallet with the given name from the filesystem"""
-        path = cls.get_dir() + "/" + name
-        with open(path, 'r') as f:
-            d = json.loads(f.read())
-            cosigners_raw = d["cosigners"]
-            cosigners = list(map(
-                lambda x: Cosigner(x["fingerprint"], x["xpub"]),
-                cosigners_raw
-            ))
-            return cls(d["mnemonic"], cosigners, d["m"], d["n"], d["network"], d["name"])
+        """
+        Loads the wallet with the given name from the wallet store
+
+        Wallets saved with the current format are loaded with their public
+        artifacts, so no key derivation or RPCs are needed.
+        """
+        d = get_store().load_wallet(name)
+        if d is None:
+            raise ValueError(f"No saved wallet named {name}")
+        cosigners = list(map(
+            lambda x: Cosigner(x["fingerprint"], x["xpub"]),
+            d["cosigners"]
+        ))
+        public = d if d["format_version"] >= WALLET_FORMAT_VERSION else None
+        w = cls(d["mnemonic"], cosigners, d["m"], d["n"], d["network"], d["name"], public)
+        w.highest_used.update(d["highest_used"])
+        return w
+
+    def verify_public_data(self):
+        """
+        Recomputes the public artifacts from the mnemonic and compares them
+        with the ones the wallet was loaded with (blocking; see start_verification).
+
+        Mismatched artifacts are replaced in memory and in the wallet store.
+        Wallets saved without public artifacts (older formats) get them stored.
+
+        Returns:
+            list of the names of the artifacts that did not match
+        """
+        xpub = self.derive_xpub()
+        expected = {
+            "xpub": xpub,
+            "fingerprint": bip32.fingerprint(xpub),
+            "descriptors": {change: self.public_descriptor(change, xpub) for change in (0, 1)},
+        }
+        mismatches = []
+        if self._public_loaded:
+            loaded = {"xpub": self._xpub, "fingerprint": self._fingerprint, "descriptors": self._descriptors}
+            mismatches = [k for k in expected if loaded[k] != expected[k]]
+        if mismatches or not self._public_loaded:
+            self._xpub = expected["xpub"]
+            self._fingerprint = expected["fingerprint"]
+            self._descriptors = expected["descriptors"]
+            store = get_store()
+            if store.has_wallet(self.name):
+                store.save_public(self.name, self.public_data())
+            self._public_loaded = True
+        return mismatches
+
+    def start_verification(self):
+        """Verifies the persisted public artifacts on a worker thread"""
+        if self.verification is None:
+            loop = aio.get_event_loop()
+            self.verification = loop.run_in_executor(None, self.verify_public_data)
+        return self.verification
+
+    async def verified_public_data(self):
+        """
+        Waits until the public artifacts the wallet was loaded with are verified
+        (starting the verification if needed). Anything derived from them
+        (addresses, PSBT validation, the UTXO cache) must wait for this.
+
+        Returns:
+            list of the names of the artifacts that did not match (see verify_public_data);
+            empty for wallets whose artifacts were derived from the mnemonic this session
+        """
+        if self.verification is None and not self._public_loaded:
+            return []
+        return await self.start_verification()
 
     def createwallet(self):
         """Creates wallet in Bitcoin Core (idempotent)"""
@@ -115,25 +241,57 @@ class Wallet:
             # create wallet with private keys disabled
             self.adapter.bitcoin_cli_checkoutput("createwallet", self.name, "false")
 
-    def wsh_descriptor(self, change = 0):
-        """Gets the wallet's wsh Bitcion Core descriptor"""
-        # create descriptor without checksum
+    async def createwallet_async(self, loaded):
+        """
+        Async createwallet (idempotent)
+
+        Parameters:
+            loaded (list[str]): wallets already loaded in Bitcoin Core (see listwallets)
+        """
+        adapter = self.adapter
+        if self.name not in loaded:
+            try:
+                # try loading the wallet if it already exists
+                await adapter.bitcoin_cli_json_async("loadwallet", self.name)
+            except subprocess.CalledProcessError:
+                # create wallet with private keys disabled
+                await adapter.bitcoin_cli_checkoutput_async("createwallet", self.name, "false")
+        self._created = True
+
+    def ensure_created(self):
+        """Creates (or loads) the wallet in Bitcoin Core the first time it's needed"""
+        if not self._created:
+            self.createwallet()
+            self._created = True
+
+    def multisig_descriptor(self, key, change, fingerprint=None):
+        """Builds the wallet's wsh descriptor with the given key for this signer (without checksum)"""
         desc = "wsh(sortedmulti(" + str(self.m) + ","
-        desc += "[" + self.fingerprint + "]"
-        desc += self.xprv + "/" # define derivation as m/change/idx
+        desc += "[" + (fingerprint or self.fingerprint) + "]"
+        desc += key + "/" # define derivation as m/change/idx
         desc += str(change) + "/*,"
         for i, cosigner in enumerate(self.cosigners):
             desc += "[" + cosigner.fingerprint + "]"
             desc += cosigner.xpub + "/"
             desc += str(change) + "/*,"
         # drop last comma and close parens
-        desc = desc[:-1] + "))"
-        # getdescriptorinfo and append checksum
-        out = self.adapter.bitcoin_cli_json("getdescriptorinfo", desc)
-        return desc + "#" + out["checksum"]
+        return desc[:-1] + "))"
+
+    def wsh_descriptor(self, change = 0):
+        """Gets the wallet's wsh Bitcion Core descriptor (with private key data)"""
+        return descsum_create(self.multisig_descriptor(self.xprv, change))
+
+    def public_descriptor(self, change=0, xpub=None):
+        """Gets the wallet's checksummed wsh descriptor with only public key data"""
+        if xpub is not None:
+            return descsum_create(self.multisig_descriptor(xpub, change, bip32.fingerprint(xpub)))
+        if change not in self._descriptors:
+            self._descriptors[change] = descsum_create(self.multisig_descriptor(self.xpub, change))
+        return self._descriptors[change]
 
     def importmulti(self, start, end):
         """Imports private key data for external and internal addresses over the given range into Bitcoin Core"""
+        self.ensure_created()
         res = {}
         for change in {0, 1}:
             desc = self.wsh_descriptor(change)
@@ -145,21 +303,206 @@ class Wallet:
                 "keypool": False,
                 "watchonly": False
             }]
-            res[change] = self.adapter.bitcoin_cli_json(f"-rpcwallet={self.name}", "importmulti", json.dumps(arg))
+            with telemetry.span("importmulti", change=change, addresses=end - start + 1):
+                res[change] = self.adapter.bitcoin_cli_json(f"-rpcwallet={self.name}", "importmulti", json.dumps(arg))
         return res
 
     def deriveaddresses(self, start, end, change=0):
         """Derives wallet addresses based on the requested parameters"""
-        desc = self.wsh_descriptor(change)
+        desc = self.public_descriptor(change)
         return self.adapter.bitcoin_cli_json("deriveaddresses", desc, json.dumps([start, end]))
 
+    async def scan_usage(self, gap_limit=GAP_LIMIT, window=None, progress=None):
+        """
+        Finds the highest used address index on both branches.
+
+        Walks the receive and change branches in windows of addresses until
+        gap_limit consecutive addresses past the highest used one are unused.
+        Every round checks the next window of each unfinished branch with a
+        single `scantxoutset` (each scan reads the whole UTXO set, so scans
+        are batched). Only addresses holding unspent outputs are found.
+        The result is kept in highest_used and recorded for saved wallets.
+
+        Parameters:
+            gap_limit  (int): number of consecutive unused addresses that ends a branch
+            window     (int): addresses checked per branch per round (defaults to gap_limit)
+            progress  (func): (optional) called with ({change: next index}, highest_used) after each round
+
+        Returns:
+            {change: highest used index (-1 if none)}
+        """
+        window = window or gap_limit
+        adapter = self.adapter
+        highest = {0: -1, 1: -1}
+        next_start = {0: 0, 1: 0}
+        while True:
+            branches = [c for c in (0, 1) if next_start[c] <= highest[c] + gap_limit]
+            if not branches:
+                break
+            index_of = {}
+            for change in branches:
+                start = next_start[change]
+                addresses = await adapter.bitcoin_cli_json_async(
+                    "deriveaddresses", self.public_descriptor(change), json.dumps([start, start + window - 1])
+                )
+                for i, address in enumerate(addresses):
+                    index_of[address] = (change, start + i)
+                next_start[change] = start + window
+            scan_objects = [f"addr({address})" for address in index_of]
+            result = await adapter.bitcoin_cli_json_async("scantxoutset", "start", json.dumps(scan_objects))
+            for utxo in result.get("unspents", []):
+                match = ADDR_DESCRIPTOR.match(utxo.get("desc", ""))
+                if match and match.group(1) in index_of:
+                    change, idx = index_of[match.group(1)]
+                    highest[change] = max(highest[change], idx)
+            if progress is not None:
+                progress(dict(next_start), dict(highest))
+
+        self.highest_used = highest
+        store = get_store()
+        if store.has_wallet(self.name):
+            store.save_usage(self.name, highest)
+        return highest
+
+    @property
+    def utxos(self):
+        """The wallet's UTXO cache (loaded from the wallet store on first use; see sync_utxos)"""
+        if self._utxos is None:
+            self._utxos = UtxoCache.load(self, get_store())
+        return self._utxos
+
+    async def sync_utxos(self):
+        """
+        Brings the UTXO cache up to date with the chain tip.
+
+        Only the blocks mined since the last sync are read (see UtxoCache).
+        The cache and any newly used addresses are recorded for saved wallets.
+
+        Returns:
+            the wallet's UtxoCache
+        """
+        if await self.verified_public_data():
+            raise ValueError("The stored public key data did not match the mnemonic")
+        loop = aio.get_event_loop()
+        adapter = await loop.run_in_executor(None, lambda: self.adapter)
+        highest_used = dict(self.highest_used)
+        cache = self.utxos
+        if await cache.sync(adapter, GAP_LIMIT):
+            store = get_store()
+            if store.has_wallet(self.name):
+                store.save_utxos(self.name, cache.state())
+                if self.highest_used != highest_used:
+                    store.save_usage(self.name, self.highest_used)
+        return cache
+
+    def start_utxo_sync(self):
+        """Syncs the UTXO cache in the background unless a sync is already running"""
+        if self.utxo_sync is None or self.utxo_sync.done():
+            self.utxo_sync = aio.ensure_future(self.sync_utxos())
+        return self.utxo_sync
+
+    def next_change_index(self):
+        """
+        The first change index past every change address known to be used: the
+        highest one found by the last usage scan (see scan_usage) or the UTXO
+        sync, and those of the change coins in the UTXO cache, including the
+        ones spent in the blocks it can still undo.
+        """
+        cache = self.utxos
+        used = [self.highest_used[1]]
+        used += [u.idx for u in cache.utxos.values() if u.change == 1]
+        used += [u["idx"] for entry in cache.undo for u in entry["spent"] if u["change"] == 1]
+        return max(used) + 1
+
+    def create_psbt(self, outputs, fee_rate, min_conf=1, rng=None):
+        """
+        Creates an unsigned PSBT that spends the wallet's coins.
+
+        Coins are selected from the UTXO cache (see sync_utxos), so it must
+        have been synced. Change goes to the first unused change address
+        (m/1/*; see next_change_index). The inputs and change output get their witness scripts and
+        BIP32 derivations from the wallet's public descriptors.
+
+        Parameters:
+            outputs  (dict): {address: amount in satoshis} to pay
+            fee_rate (float): fee rate in sat/vbyte
+            min_conf  (int): minimum number of confirmations of the coins to spend
+
+        Returns:
+            dict with the base64 encoded 'psbt' and its 'inputs' (Utxos), 'fee', 'change'
+            (satoshis; 0 if there is no change output), estimated 'vsize' and the coin
+            selection 'algorithm'
+        """
+        if not self.utxos.synced:
+            raise ValueError("The wallet's UTXOs haven't been loaded yet")
+        coins = self.utxos.spendable(min_conf)
+        adapter = self.adapter
+
+        def fee(vsize):
+            return math.ceil(vsize * fee_rate)
+
+        vsize = TX_OVERHEAD_VSIZE
+        for address in outputs:
+            info = adapter.bitcoin_cli_json("validateaddress", address)
+            if not info.get("isvalid"):
+                raise ValueError(f"Invalid address: {address}")
+            vsize += output_vsize(len(info["scriptPubKey"]) // 2)
+        input_vsize = multisig_input_vsize(self.m, self.n)
+        change_vsize = output_vsize(P2WSH_SCRIPT_LEN)
+        amount = sum(outputs.values())
+
+        # effective values: what each coin adds after paying for its own input
+        values = [u.amount - fee(input_vsize) for u in coins]
+        cost_of_change = fee(change_vsize) + fee(input_vsize)
+        selection, algorithm = select_coins(values, amount + fee(vsize), cost_of_change, rng=rng)
+        inputs = [coins[i] for i in selection]
+        vsize += input_vsize * len(inputs)
+        total = sum(u.amount for u in inputs)
+        change = total - amount - fee(vsize + change_vsize)
+        if algorithm == "branch and bound" or change < DUST_LIMIT:
+            change = 0 # the excess goes to fees
+        else:
+            vsize += change_vsize
+
+        tx_outputs = [{address: format_btc(sats)} for address, sats in outputs.items()]
+        indexes = {0: [], 1: []}
+        for u in inputs:
+            indexes[u.change].append(u.idx)
+        if change:
+            change_idx = self.next_change_index()
+            [change_address] = self.deriveaddresses(change_idx, change_idx, 1)
+            position = (rng or random.SystemRandom()).randrange(len(tx_outputs) + 1)
+            tx_outputs.insert(position, {change_address: format_btc(change)})
+            indexes[1].append(change_idx)
+
+        tx_inputs = [{"txid": u.txid, "vout": u.vout} for u in inputs]
+        psbt = adapter.bitcoin_cli_checkoutput("createpsbt", json.dumps(tx_inputs), json.dumps(tx_outputs))
+        # add the witness UTXOs, witness scripts and derivations of our inputs and change
+        descriptors = [
+            {"desc": self.public_descriptor(branch), "range": [min(idxs), max(idxs)]}
+            for branch, idxs in indexes.items() if idxs
+        ]
+        psbt = adapter.bitcoin_cli_checkoutput("utxoupdatepsbt", psbt.decode().strip(), json.dumps(descriptors))
+        return {
+            "psbt": remove_non_witness_utxos(psbt.decode().strip()),
+            "inputs": inputs,
+            "fee": total - amount - change,
+            "change": change,
+            "vsize": vsize,
+            "algorithm": algorithm
+        }
+
     def decodepsbt(self, psbt):
         """Tries to decode a base64 encoded psbt"""
-        return self.adapter.bitcoin_cli_json("decodepsbt", psbt)
+        with telemetry.span("decodepsbt", chars=len(psbt)) as span:
+            decoded = self.adapter.bitcoin_cli_json("decodepsbt", psbt)
+            span.set(inputs=len(decoded.get("inputs", [])), outputs=len(decoded.get("outputs", [])))
+        return decoded
 
     def analyzepsbt(self, psbt):
         """Tries to analyze a base64 encoded psbt"""
-        return self.adapter.bitcoin_cli_json("analyzepsbt", psbt)
+        with telemetry.span("analyzepsbt", chars=len(psbt)):
+            return self.adapter.bitcoin_cli_json("analyzepsbt", psbt)
 
     def walletprocesspsbt(self, psbt, importmulti_lo=None, importmulti_hi=None):
         """
@@ -172,7 +515,119 @@ class Wallet:
             importmulti_lo (int): lower bound for importing scripts into Bitcoin Core  
             importmulti_hi (int): upper bound for importing scripts into Bitcoin Core
         """
+        self.ensure_created()
         if importmulti_lo is not None and importmulti_hi is not None:
             # import the descriptors necessary to process the provided psbt
             self.importmulti(importmulti_lo, importmulti_hi)
-        return self.adapter.bitcoin_cli_json(f"-rpcwallet={self.name}", "walletprocesspsbt", psbt)
+        with telemetry.span("walletprocesspsbt", chars=len(psbt)):
+            return self.adapter.bitcoin_cli_json(f"-rpcwallet={self.name}", "walletprocesspsbt", psbt)
+
+async def load_wallets(names, concurrency=RPC_CONCURRENCY, executor=None):
+    """
+    Loads many saved wallets concurrently, ready for signing.
+
+    The PBKDF2 key stretching of every mnemonic runs on a thread pool
+    (hashlib releases the GIL) while the wallets are loaded into Bitcoin
+    Core with async RPCs, at most `concurrency` at a time. bitcoind is
+    started and listwallets is called once per network.
+
+    Parameters:
+        names       (list[str]): names of the saved wallets
+        concurrency       (int): maximum number of concurrent RPCs
+        executor     (Executor): (optional) pool for the key derivation
+
+    Returns:
+        list of Wallets in the order of names
+    """
+    loop = aio.get_event_loop()
+    wallets = [Wallet.load(name) for name in names]
+    semaphore = aio.Semaphore(concurrency)
+
+    loaded = {}
+    for network in {w.network for w in wallets}:
+        adapter = Wallet.adapter_class(network)
+        await loop.run_in_executor(executor, adapter.ensure_bitcoind_running)
+        loaded[network] = await adapter.bitcoin_cli_json_async("listwallets")
+
+    async def derive_keys(w):
+        await loop.run_in_executor(executor, lambda: w.xprv)
+
+    async def create(w):
+        async with semaphore:
+            await w.createwallet_async(loaded[w.network])
+
+    await aio.gather(*[derive_keys(w) for w in wallets], *[create(w) for w in wallets])
+    return wallets
+
+class WalletInfo:
+    """
+    Metadata of a saved wallet; enough to list it without loading it
+
+    Attributes:
+        name       (str): name of the wallet
+        network    (str): the blockchain this wallet uses
+        m          (int): the minimum number signatures required to spend bitcoin
+        n          (int): the total number of signatures in this wallet
+        finalized (bool): whether all cosigner xpubs have been imported
+    """
+    def __init__(self, name, network, m, n, finalized):
+        self.name = name
+        self.network = network
+        self.m = m
+        self.n = n
+        self.finalized = finalized
+
+    @classmethod
+    def from_wallet(cls, w):
+        return cls(w.name, w.network, w.m, w.n, w.finalized)
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["name"], d["network"], d["m"], d["n"], d["finalized"])
+
+class WalletRegistry:
+    """
+    The wallets known to this session.
+
+    Startup only reads wallet metadata from the wallet store instead of
+    loading every saved wallet. A Wallet (which derives keys and talks to
+    Bitcoin Core) is only constructed when it is selected, and is kept for the
+    rest of the session. Wallets created during the session are registered
+    directly.
+    """
+    def __init__(self, entries=None):
+        self.entries = {} if entries is None else entries # name -> WalletInfo
+        self.wallets = {} # name -> Wallet materialized this session
+
+    @classmethod
+    def load(cls, network=None):
+        """
+        Reads the metadata of the saved wallets
+
+        Parameters:
+            network (str): (optional) only read the wallets on this network
+        """
+        rows = get_store().list_wallets(network)
+        return cls({d["name"]: WalletInfo.from_dict(d) for d in rows})
+
+    def for_network(self, network):
+        """Metadata of the wallets on the given network, sorted by name"""
+        return sorted((e for e in self.entries.values() if e.network == network), key=lambda e: e.name)
+
+    def add(self, w):
+        """Registers (or replaces) a wallet created or updated this session"""
+        self.entries[w.name] = WalletInfo.from_wallet(w)
+        self.wallets[w.name] = w
+
+    def get(self, name):
+        """The wallet with the given name, loading it on first use"""
+        if name not in self.wallets:
+            self.wallets[name] = Wallet.load(name)
+        return self.wallets[name]
+
+    async def get_many(self, names, concurrency=RPC_CONCURRENCY):
+        """The wallets with the given names, loading the ones not loaded yet concurrently (see load_wallets)"""
+        missing = [name for name in names if name not in self.wallets]
+        for w in await load_wallets(missing, concurrency):
+            self.wallets[w.name] = w
+        return [self.wallets[name] for name in names]
@@ -0,0 +1,42 @@
+import unittest
+
+from crypto import bip32
+from crypto.bech32 import encode_segwit_address
+from proof.addresses import BranchDeriver, sortedmulti_script
+
+# BIP 32 test vectors 1 (m/0H/1/2H) and 2 (m)
+VECTOR_1 = "xpub6D4BDPcP2GT577Vvch3R8wDkScZWzQzMMUm3PWbmWvVJrZwQY4VUNgqFJPMM3No2dFDFGTsxxpG5uJh7n7epu4trkrX7x7DogT5Uv6fcLW5"
+VECTOR_2 = "xpub661MyMwAqRbcFW31YEwpkMuc5THy2PSt5bDMsktWQcFF8syAmRUapSCGu8ED9W6oDMSgv6Zz8idoc4a6mr8BDzTJY47LJhkJ8UB7WEGuduB"
+
+
+class Bip32Test(unittest.TestCase):
+    def test_public_derivation_vectors(self):
+        m_0 = bip32.derive_xpub(VECTOR_2, 0)
+        self.assertEqual(m_0, "xpub69H7F5d8KSRgmmdJg2KhpAK8SR3DjMwAdkxj3ZuxV27CprR9LgpeyGmXUbC6wb7ERfvrnKZjXoUmmDznezpbZb7ap6r1D3tgFxHmwMkQTPH")
+        m_2 = bip32.derive_xpub(VECTOR_1, 2)
+        self.assertEqual(m_2, "xpub6FHa3pjLCk84BayeJxFW2SP4XRrFd1JYnxeLeU8EqN3vDfZmbqBqaGJAyiLjTAwm6ZLRQUMv1ZACTj37sR62cfN7fe5JnJ7dh8zL4fiyLHV")
+        self.assertEqual(bip32.derive_xpub(m_2, 1000000000), "xpub6H1LXWLaKsWFhvm6RVpEL9P4KfRZSW7abD2ttkWP3SSQvnyA8FSVqNTEcYFgJS2UaFcxupHiYkro49S8yGasTvXEYBVPamhGW6cFJodrTHy")
+        self.assertRaises(ValueError, bip32.derive_xpub, VECTOR_2, 0x80000000)
+
+    def test_bech32_vectors(self):
+        # BIP 173 p2wpkh and p2wsh examples
+        program = bytes.fromhex("751e76e8199196d454941c45d1b3a323f1433bd6")
+        self.assertEqual(encode_segwit_address("bc", program), "bc1qw508d6qejxtdg4y5r3zarvary0c5xw7kv8f3t4")
+        program = bytes.fromhex("1863143c14c5166804bd19203356da136c985678cd4d27a1b8c6329604903262")
+        self.assertEqual(encode_segwit_address("tb", program), "tb1qrp33g0q5c5txsp9arysrx4k6zdkfs4nce4xj0gdcccefvpysxf3q0sl5k7")
+
+    def test_sortedmulti_address(self):
+        xpubs = [VECTOR_2, VECTOR_1]
+        deriver = BranchDeriver(1, xpubs, 1, "regtest")
+        address, script_pubkey, witness_script = deriver.derive(7)
+        keys = [bip32.bip32_deserialize(bip32.derive_xpub(bip32.derive_xpub(x, 1), 7))[5] for x in xpubs]
+        self.assertEqual(witness_script, sortedmulti_script(1, keys).hex())
+        self.assertEqual(witness_script, "5121" + min(keys).hex() + "21" + max(keys).hex() + "52ae")
+        self.assertTrue(script_pubkey.startswith("0020"))
+        self.assertTrue(address.startswith("bcrt1q"))
+        # the order of the xpubs doesn't matter
+        self.assertEqual(BranchDeriver(1, xpubs[::-1], 1, "regtest").derive(7), (address, script_pubkey, witness_script))
+
+
+if __name__ == "__main__":
+    unittest.main()
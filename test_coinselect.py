@@ -0,0 +1,67 @@
+import random
+import time
+import unittest
+
+from proof.coinselect import (
+    CoinIndex, branch_and_bound, knapsack, select_coins, multisig_input_vsize, MIN_CHANGE
+)
+
+
+class CoinSelectTest(unittest.TestCase):
+    def test_input_vsize(self):
+        # 2-of-3: 41 bytes + (1 + 1 + 2 * 73 + 1 + 105) / 4 witness bytes
+        self.assertEqual(multisig_input_vsize(2, 3), 105)
+        self.assertEqual(multisig_input_vsize(1, 1), 70)
+
+    def test_coin_index(self):
+        index = CoinIndex([5, -3, 20, 10, 0, 10])
+        self.assertEqual(len(index), 4)
+        self.assertEqual(index.lowest_larger(11), 2)
+        self.assertIsNone(index.lowest_larger(21))
+        self.assertEqual(index.exact(20), 2)
+        self.assertIsNone(index.exact(15))
+        self.assertEqual([index.values[i] for i in index.below(20)], [10, 10, 5])
+        self.assertEqual(index.below(5), [])
+
+    def test_branch_and_bound(self):
+        index = CoinIndex([1, 2, 3, 4, 8])
+        for target in range(1, 19):
+            selection = branch_and_bound(index, target, 0)
+            self.assertEqual(sum(index.values[i] for i in selection), target)
+        # the changeless window allows some excess
+        self.assertEqual(branch_and_bound(CoinIndex([7, 9]), 6, 1), [0])
+        self.assertIsNone(branch_and_bound(CoinIndex([7, 9]), 6, 0))
+        self.assertIsNone(branch_and_bound(CoinIndex([1, 2]), 4, 0))
+
+    def test_knapsack(self):
+        rng = random.Random(0)
+        # a single coin that leaves enough change beats many small coins
+        index = CoinIndex([1000] * 50 + [10 * MIN_CHANGE])
+        self.assertEqual(knapsack(index, 5 * MIN_CHANGE, rng=rng), [50])
+        # small coins that add up exactly
+        index = CoinIndex([30, 20, 10, 10 * MIN_CHANGE])
+        self.assertEqual(sorted(knapsack(index, 60, rng=rng)), [0, 1, 2])
+        self.assertIsNone(knapsack(CoinIndex([30, 20]), 60, rng=rng))
+
+    def test_select_coins(self):
+        values = [10000, 25000, 40000]
+        selection, algorithm = select_coins(values, 35000, 100)
+        self.assertEqual((sorted(selection), algorithm), ([0, 1], "branch and bound"))
+        selection, algorithm = select_coins(values, 45000, 100, rng=random.Random(0))
+        self.assertEqual(algorithm, "knapsack")
+        self.assertGreaterEqual(sum(values[i] for i in selection), 45000)
+        self.assertRaises(ValueError, select_coins, values, 80000, 100)
+
+    def test_large_utxo_set(self):
+        rng = random.Random(1)
+        values = [int(rng.lognormvariate(13, 2)) * 2 for _ in range(10000)]
+        for target, cost_of_change in ((3000000, 20000), (3000001, 0), (sum(values) // 3 + 1, 0)):
+            start = time.perf_counter()
+            selection, _ = select_coins(values, target, cost_of_change, rng=rng)
+            self.assertLess(time.perf_counter() - start, 1)
+            self.assertGreaterEqual(sum(values[i] for i in selection), target)
+            self.assertEqual(len(set(selection)), len(selection))
+
+
+if __name__ == "__main__":
+    unittest.main()
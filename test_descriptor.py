@@ -0,0 +1,16 @@
+import unittest
+
+from crypto.descriptor import descsum_create, descsum_check
+
+
+class DescriptorChecksumTest(unittest.TestCase):
+    def test_bip380_vectors(self):
+        self.assertEqual(descsum_create("raw(deadbeef)"), "raw(deadbeef)#89f8spxm")
+        self.assertTrue(descsum_check("raw(deadbeef)#89f8spxm"))
+        self.assertFalse(descsum_check("raw(deedbeef)#89f8spxm"))
+        self.assertFalse(descsum_check("raw(deadbeef)#"))
+        self.assertRaises(ValueError, descsum_create, "raw(deadébeef)")
+
+
+if __name__ == "__main__":
+    unittest.main()
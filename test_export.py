@@ -0,0 +1,32 @@
+import io
+import json
+import unittest
+
+from proof.export import address_batches, write_rows, FIELDS
+from test_bip32 import VECTOR_1, VECTOR_2
+
+
+class ExportTest(unittest.TestCase):
+    def test_batches_in_order(self):
+        args = (2, [VECTOR_1, VECTOR_2], "testnet", (0, 1), 5, 7)
+        batches = list(address_batches(*args, batch_size=3, processes=1))
+        self.assertEqual([len(b) for b in batches], [3, 3, 1, 3, 3, 1])
+        rows = [row for batch in batches for row in batch]
+        self.assertEqual([(r[0], r[1]) for r in rows], [(c, i) for c in (0, 1) for i in range(5, 12)])
+        parallel = [row for batch in address_batches(*args, batch_size=3, processes=2) for row in batch]
+        self.assertEqual(parallel, rows)
+
+    def test_formats(self):
+        rows = [(0, 0, "tb1qa", "0020aa", "51ae"), (0, 1, "tb1qb", "0020bb", "52ae")]
+        out = io.StringIO()
+        progress = []
+        self.assertEqual(write_rows([rows[:1], rows[1:]], out, "csv", progress.append), 2)
+        self.assertEqual(out.getvalue().splitlines(), [",".join(FIELDS), "0,0,tb1qa,0020aa,51ae", "0,1,tb1qb,0020bb,52ae"])
+        self.assertEqual(progress, [1, 2])
+        out = io.StringIO()
+        write_rows([rows], out, "jsonl")
+        self.assertEqual(json.loads(out.getvalue().splitlines()[1])["witness_script"], "52ae")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import os
+import random
+import unittest
+
+from proof.fountain import FountainEncoder, FountainDecoder, is_fountain_part
+
+
+class FountainTest(unittest.TestCase):
+    def _decode(self, parts):
+        decoder = FountainDecoder()
+        for part in parts:
+            self.assertTrue(decoder.receive_part(part))
+            if decoder.is_complete():
+                break
+        return decoder
+
+    def test_roundtrip_in_order(self):
+        for length in [1, 6, 99, 100, 101, 3000]:
+            message = os.urandom(length)
+            encoder = FountainEncoder(message, 100, "PSBT")
+            parts = [encoder.next_part() for _ in range(encoder.seq_len)]
+            self.assertTrue(all(map(is_fountain_part, parts)))
+            decoder = self._decode(parts)
+            self.assertTrue(decoder.is_complete())
+            self.assertEqual(decoder.result(), message)
+
+    def test_roundtrip_with_missed_frames(self):
+        rng = random.Random(0)
+        message = os.urandom(5000)
+        encoder = FountainEncoder(message, 100)
+        parts = [encoder.next_part() for _ in range(4 * encoder.seq_len)]
+        # drop a third of the frames and receive the rest out of order
+        parts = [p for p in parts if rng.random() > 1 / 3]
+        rng.shuffle(parts)
+        decoder = self._decode(parts)
+        self.assertTrue(decoder.is_complete())
+        self.assertEqual(decoder.result(), message)
+
+    def test_mixed_parts_only(self):
+        message = os.urandom(2000)
+        encoder = FountainEncoder(message, 100)
+        parts = [encoder.part(encoder.seq_len + i + 1) for i in range(10 * encoder.seq_len)]
+        decoder = self._decode(parts)
+        self.assertEqual(decoder.result(), message)
+
+    def test_rejects_foreign_parts(self):
+        first = FountainEncoder(b"first message", 5)
+        second = FountainEncoder(b"second message", 5)
+        decoder = FountainDecoder()
+        self.assertTrue(decoder.receive_part(first.next_part()))
+        self.assertFalse(decoder.receive_part(second.next_part()))
+        self.assertFalse(decoder.receive_part("cHNidP8BAH0CAAAAAb"))
+        self.assertFalse(decoder.is_complete())
+        self.assertRaises(ValueError, decoder.result)
+
+
+if __name__ == "__main__":
+    unittest.main()
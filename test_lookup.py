@@ -0,0 +1,75 @@
+import os
+import tempfile
+import threading
+import unittest
+
+from proof.addresses import BranchDeriver
+from proof.lookup import lookup_address, search_batches
+from proof.store import WalletStore
+from proof.wallet import Cosigner
+from test_bip32 import VECTOR_1, VECTOR_2
+
+
+class WatchOnlyWallet:
+    def __init__(self, name, xpub, cosigners):
+        self.name = name
+        self.xpub = xpub
+        self.cosigners = [Cosigner(None, c) for c in cosigners]
+        self.m = 1
+        self.network = "testnet"
+
+
+class LookupTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = WalletStore(os.path.join(self.dir.name, "proof.db"))
+        self.wallets = [WatchOnlyWallet("wallet-a", VECTOR_1, [VECTOR_2]), WatchOnlyWallet("wallet-b", VECTOR_2, [])]
+        self.store.save_wallet({
+            "name": "wallet-b", "network": "testnet", "m": 1, "n": 1, "mnemonic": "x",
+            "cosigners": [], "descriptors": {}
+        })
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def test_search_batches(self):
+        counts = {"a": {0: 0, 1: 3}, "b": {0: 10, 1: 0}}
+        self.assertEqual(list(search_batches(counts, 8, 4)), [
+            ("a", 0, 0, 4), ("a", 1, 3, 4), ("b", 1, 0, 4),
+            ("a", 0, 4, 8), ("a", 1, 4, 8), ("b", 1, 4, 8),
+        ])
+
+    def test_lookup(self):
+        address = BranchDeriver(1, [VECTOR_2], 1, "testnet").derive(6)[0]
+        result = lookup_address(address.upper(), self.wallets, self.store, max_index=20, batch_size=5, processes=1)
+        self.assertEqual((result["wallet"], result["change"], result["idx"]), ("wallet-b", 1, 6))
+        self.assertEqual((result["derivations"], result["source"]), (40, "search"))
+        # the derived addresses of the saved wallet were indexed
+        self.assertEqual(self.store.indexed_counts("wallet-b"), {0: 10, 1: 10})
+        result = lookup_address(address, self.wallets, self.store, processes=1)
+        self.assertEqual((result["wallet"], result["idx"], result["derivations"], result["source"]),
+                         ("wallet-b", 6, 0, "index"))
+        # the search continues after the indexed addresses
+        result = lookup_address("tb1qunknown", self.wallets, self.store, max_index=12, batch_size=5, processes=2)
+        self.assertIsNone(result["wallet"])
+        self.assertEqual(result["derivations"], 12 * 2 + 2 * 2)
+
+    def test_progress_and_cancel(self):
+        cancel = threading.Event()
+        reports = []
+        def progress(derivations, searched):
+            reports.append((derivations, searched))
+            if derivations >= 15:
+                cancel.set()
+        result = lookup_address("tb1qunknown", self.wallets, self.store, max_index=20, batch_size=5,
+                                processes=1, progress=progress, cancel=cancel)
+        self.assertEqual(reports, [(5, 5), (10, 5), (15, 5)])
+        self.assertTrue(result["cancelled"])
+        self.assertEqual(result["derivations"], 15)
+        # what was derived before cancelling is kept in the index
+        self.assertEqual(self.store.indexed_counts("wallet-b"), {0: 5, 1: 0})
+
+
+if __name__ == "__main__":
+    unittest.main()
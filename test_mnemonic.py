@@ -50,6 +50,19 @@ class MnemonicTest(unittest.TestCase):
             vectors = json.load(f)
         self._check_list(vectors)
 
+    def test_final_words(self):
+        mnemo = Mnemonic()
+        rng = random.Random(0)
+        for length in [16, 20, 24, 28, 32]:
+            data = bytes(rng.getrandbits(8) for _ in range(length))
+            words = mnemo.to_mnemonic(data).split(" ")
+            candidates = mnemo.final_words(words[:-1])
+            self.assertEqual(len(candidates), 2 ** (11 - len(words) // 3))
+            self.assertIn(words[-1], candidates)
+            for word in candidates:
+                self.assertTrue(mnemo.check(" ".join(words[:-1] + [word])))
+        self.assertRaises(ValueError, mnemo.final_words, ["abandon"] * 22)
+
     def test_utf8_nfkd(self):
         # The same sentence in various UTF-8 forms
         words_nfkd = u"Pr\u030ci\u0301s\u030cerne\u030c z\u030clut\u030couc\u030cky\u0301 ku\u030an\u030c u\u0301pe\u030cl d\u030ca\u0301belske\u0301 o\u0301dy za\u0301ker\u030cny\u0301 uc\u030cen\u030c be\u030cz\u030ci\u0301 pode\u0301l zo\u0301ny u\u0301lu\u030a"
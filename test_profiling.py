@@ -0,0 +1,72 @@
+import asyncio as aio
+import os
+import pstats
+import tempfile
+import unittest
+from unittest import mock
+
+from proof import profiling
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+@profiling.profiled
+async def inner():
+    busy(20000)
+    await aio.sleep(0.01)
+    return "inner"
+
+
+@profiling.profiled
+async def outer():
+    busy(20000)
+    await aio.sleep(0.2) # waiting for a keystroke
+    result = await inner()
+    try:
+        await aio.wait_for(aio.sleep(1), 0.01)
+    except aio.TimeoutError:
+        pass
+    return result
+
+
+class ProfilingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def run_outer(self, env):
+        with mock.patch.dict(os.environ, env):
+            return aio.get_event_loop().run_until_complete(outer())
+
+    def test_disabled(self):
+        self.assertEqual(self.run_outer({"PROOF_PROFILE": "0", "PROOF_PROFILE_DIR": self.dir.name}), "inner")
+        self.assertEqual(os.listdir(self.dir.name), [])
+
+    def test_profiles(self):
+        self.assertEqual(self.run_outer({"PROOF_PROFILE": "1", "PROOF_PROFILE_DIR": self.dir.name}), "inner")
+        files = sorted(os.listdir(self.dir.name))
+        self.assertEqual(sorted(f.split("-", 2)[2] for f in files),
+                         ["inner.folded", "inner.pstats", "outer.folded", "outer.pstats"])
+        for name in ("inner", "outer"):
+            [path] = [f for f in files if f.endswith(f"{name}.pstats")]
+            stats = pstats.Stats(os.path.join(self.dir.name, path))
+            # the sleeps are not part of the profile
+            self.assertLess(stats.total_tt, 0.15)
+            functions = {f[2] for f in stats.stats}
+            self.assertIn("busy", functions)
+            # the inner action only counts towards its own profile
+            self.assertEqual(name == "outer", "outer" in functions)
+        [folded] = [f for f in files if f.endswith("outer.folded")]
+        with open(os.path.join(self.dir.name, folded)) as f:
+            for line in f:
+                stack, count = line.rsplit(" ", 1)
+                self.assertNotIn("inner", stack)
+                self.assertGreater(int(count), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
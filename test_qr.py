@@ -0,0 +1,73 @@
+import unittest
+from unittest import mock
+
+from proof import qr, utils
+from proof.ux import wrap_lines
+
+
+class QrTest(unittest.TestCase):
+    def test_byte_capacity_low_ecc(self):
+        # ISO/IEC 18004 table 7, byte mode at error correction level L
+        expected = [
+            17, 32, 53, 78, 106, 134, 154, 192, 230, 271, 321, 367, 425, 458,
+            520, 586, 644, 718, 792, 858, 929, 1003, 1091, 1171, 1273, 1367,
+            1465, 1528, 1628, 1732, 1840, 1952, 2068, 2188, 2303, 2431, 2563,
+            2699, 2809, 2953
+        ]
+        actual = [qr.capacity(v, qr.ECC_LOW, qr.MODE_BYTE) for v in range(1, 41)]
+        self.assertEqual(actual, expected)
+
+    def test_capacity_other_modes(self):
+        self.assertEqual(qr.capacity(1, qr.ECC_LOW, qr.MODE_NUMERIC), 41)
+        self.assertEqual(qr.capacity(1, qr.ECC_HIGH, qr.MODE_ALPHANUMERIC), 10)
+        self.assertEqual(qr.capacity(40, qr.ECC_LOW, qr.MODE_ALPHANUMERIC), 4296)
+        self.assertEqual(qr.capacity(40, qr.ECC_HIGH, qr.MODE_BYTE), 1273)
+
+    def test_encoding_mode(self):
+        self.assertEqual(qr.encoding_mode("0123"), qr.MODE_NUMERIC)
+        self.assertEqual(qr.encoding_mode("PW:PSBT/1-2/3-0A0B0C0D/FF"), qr.MODE_ALPHANUMERIC)
+        self.assertEqual(qr.encoding_mode("cHNidP8B+/="), qr.MODE_BYTE)
+
+    def test_reed_solomon(self):
+        # "HELLO WORLD" as version 1-M data codewords and their known ECC codewords
+        data = [32, 91, 11, 120, 209, 114, 220, 77, 67, 64, 236, 17, 236, 17, 236, 17]
+        ecc = qr.reed_solomon_remainder(data, qr.reed_solomon_divisor(10))
+        self.assertEqual(ecc, [196, 35, 39, 119, 235, 215, 231, 226, 93, 23])
+
+    def test_format_bits(self):
+        # level L with mask 0 has the format information 111011111000100
+        code = qr.QrCode(1, qr.ECC_LOW, bytearray(19), mask=0)
+        bits = [code.modules[8][x] for x in (0, 1, 2, 3, 4, 5, 7, 8)]
+        bits += [code.modules[y][8] for y in (7, 5, 4, 3, 2, 1, 0)]
+        self.assertEqual("".join(map(str, bits)), "111011111000100")
+
+    def test_version_selection(self):
+        self.assertEqual(qr.encode("HELLO WORLD", qr.ECC_MEDIUM).version, 1)
+        data = "a" * qr.capacity(10, qr.ECC_LOW, qr.MODE_BYTE)
+        self.assertEqual(qr.encode(data).version, 10)
+        self.assertEqual(qr.encode(data + "a").version, 11)
+        self.assertRaises(ValueError, qr.encode, "a" * 2954)
+
+    def test_ansi_rendering(self):
+        code = qr.encode("cHNidP8BAH0CAAAAAb")
+        lines = code.to_ansi(margin=2).rstrip("\n").split("\n")
+        full = code.size + 4
+        self.assertEqual(len(lines), (full + 1) // 2)
+        for line in lines:
+            self.assertEqual(line.count(qr.UPPER_HALF_BLOCK), full)
+
+    def test_max_qr_payload_fits_page(self):
+        def page(payload, qr_code):
+            return f"Header\n\nA long line of instructions {'word ' * 40}\n\n{payload}\n\n\n{qr_code}\n"
+        for lines, columns in [(40, 90), (60, 120), (100, 100)]:
+            with mock.patch.object(utils, "get_terminal_size", return_value={"lines": lines, "columns": columns}):
+                size = utils.max_qr_payload(qr.MODE_BYTE, page)
+            payload = "b" * size
+            self.assertLessEqual(len(wrap_lines(page(payload, utils.render_qr(payload)), columns)), lines)
+            # the next version would not fit
+            bigger = "b" * (size + 1)
+            self.assertGreater(len(wrap_lines(page(bigger, utils.render_qr(bigger)), columns)), lines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio as aio
+import unittest
+
+from proof.scanner import QRScanner
+
+
+class FakeZbarcam:
+    """Stands in for the zbarcam process; lines fed to stdout are decoded payloads"""
+    def __init__(self):
+        self.stdout = aio.StreamReader()
+        self.returncode = None
+
+    def feed(self, *payloads):
+        for payload in payloads:
+            self.stdout.feed_data(payload.encode() + b"\n")
+
+    def terminate(self):
+        self.returncode = 0
+        self.stdout.feed_eof()
+
+    async def wait(self):
+        return self.returncode
+
+
+class QRScannerTest(unittest.TestCase):
+    def _run(self, test):
+        async def run():
+            scanner = QRScanner()
+            scanner.process = FakeZbarcam()
+            scanner._reader = aio.ensure_future(scanner._read(scanner.process))
+            try:
+                await test(scanner, scanner.process)
+            finally:
+                await scanner.close()
+        aio.get_event_loop().run_until_complete(run())
+
+    async def _scan(self, scanner):
+        return await aio.wait_for(scanner.scan(), 1)
+
+    def test_repeated_frames_are_delivered_once(self):
+        async def test(scanner, zbarcam):
+            zbarcam.feed("a", "a", "a", "b")
+            self.assertEqual(await self._scan(scanner), "a")
+            self.assertEqual(await self._scan(scanner), "b")
+            self.assertTrue(scanner.queue.empty())
+        self._run(test)
+
+    def test_decoded_before_flush_then_scanned_again(self):
+        async def test(scanner, zbarcam):
+            zbarcam.feed("a")
+            await aio.sleep(0.01)
+            scanner.flush()
+            self.assertTrue(scanner.queue.empty())
+            # the same QR code is still in front of the camera
+            zbarcam.feed("a")
+            self.assertEqual(await self._scan(scanner), "a")
+        self._run(test)
+
+    def test_forget(self):
+        async def test(scanner, zbarcam):
+            zbarcam.feed("a")
+            self.assertEqual(await self._scan(scanner), "a")
+            scanner.forget()
+            zbarcam.feed("a")
+            self.assertEqual(await self._scan(scanner), "a")
+        self._run(test)
+
+
+if __name__ == '__main__':
+    unittest.main()
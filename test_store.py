@@ -0,0 +1,151 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from proof.store import WalletStore, SCHEMA, SCHEMA_VERSION
+
+
+def wallet(name, network="regtest", fingerprint=None, cosigners=()):
+    return {
+        "name": name, "network": network, "m": 2, "n": 3, "mnemonic": "abandon " * 23 + "art",
+        "xpub": None, "fingerprint": fingerprint, "format_version": 0, "descriptors": {}, "highest_used": {},
+        "cosigners": [{"fingerprint": fp, "xpub": "tpub" + fp} for fp in cosigners]
+    }
+
+
+class WalletStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = WalletStore(os.path.join(self.dir.name, "proof.db"))
+
+    def tearDown(self):
+        self.store.close()
+        self.dir.cleanup()
+
+    def test_save_and_load(self):
+        w = wallet("wallet-a", fingerprint="aaaaaaaa", cosigners=["bbbbbbbb", "cccccccc"])
+        self.store.save_wallet(w)
+        self.assertEqual(self.store.load_wallet("wallet-a"), w)
+        self.assertIsNone(self.store.load_wallet("wallet-b"))
+        self.assertTrue(self.store.has_wallet("wallet-a"))
+        self.assertFalse(self.store.has_wallet("wallet-b"))
+        # replacing a wallet replaces its cosigners
+        w["cosigners"] = w["cosigners"][:1]
+        self.store.save_wallet(w)
+        self.assertEqual(self.store.load_wallet("wallet-a")["cosigners"], w["cosigners"])
+
+    def test_save_public(self):
+        self.store.save_wallet(wallet("wallet-a", cosigners=["bbbbbbbb"]))
+        public = {
+            "xpub": "tpubaaaa", "fingerprint": "aaaaaaaa", "format_version": 1,
+            "descriptors": {0: "wsh(a/0/*)#00000000", 1: "wsh(a/1/*)#11111111"}
+        }
+        self.store.save_public("wallet-a", public)
+        d = self.store.load_wallet("wallet-a")
+        self.assertEqual({k: d[k] for k in public}, public)
+
+    def test_save_usage(self):
+        self.store.save_wallet(wallet("wallet-a"))
+        self.store.save_usage("wallet-a", {0: 41, 1: -1})
+        self.store.save_usage("wallet-a", {0: 57})
+        self.store.save_wallet(wallet("wallet-a"))
+        self.assertEqual(self.store.load_wallet("wallet-a")["highest_used"], {0: 57, 1: -1})
+
+    def test_save_utxos(self):
+        self.store.save_wallet(wallet("wallet-a"))
+        self.assertIsNone(self.store.load_utxos("wallet-a"))
+        state = {
+            "height": 120, "hash": "00ab", "watched": {0: 41, 1: 20},
+            "undo": [{"height": 120, "hash": "00ab", "prev": "00aa", "added": [["aa", 0]], "spent": []}],
+            "utxos": [{"txid": "aa", "vout": 0, "change": 0, "idx": 3, "amount": 150000000, "height": 120}]
+        }
+        self.store.save_utxos("wallet-a", state)
+        self.store.save_wallet(wallet("wallet-a"))
+        self.assertEqual(self.store.load_utxos("wallet-a"), state)
+        self.store.delete_wallet("wallet-a")
+        self.assertIsNone(self.store.load_utxos("wallet-a"))
+
+    def test_address_index(self):
+        w = wallet("wallet-a")
+        w["descriptors"] = {0: "wsh(a)", 1: "wsh(b)"}
+        self.store.save_wallet(w)
+        self.store.index_addresses("wallet-a", 0, 0, ["tb1qa", "tb1qb"])
+        # a range after a gap is recorded but doesn't extend the indexed count
+        self.store.index_addresses("wallet-a", 1, 5, ["tb1qc"])
+        self.assertEqual(self.store.indexed_counts("wallet-a"), {0: 2, 1: 0})
+        self.assertEqual(self.store.find_address("tb1qb"), [{"wallet": "wallet-a", "change": 0, "idx": 1}])
+        self.assertEqual(self.store.find_address("tb1qc"), [{"wallet": "wallet-a", "change": 1, "idx": 5}])
+        self.assertEqual(self.store.find_address("tb1qd"), [])
+        # saving the same keys keeps the index; new keys clear it
+        self.store.save_wallet(w)
+        self.assertEqual(self.store.indexed_counts("wallet-a"), {0: 2, 1: 0})
+        w["descriptors"] = {0: "wsh(c)", 1: "wsh(d)"}
+        self.store.save_wallet(w)
+        self.assertEqual(self.store.indexed_counts("wallet-a"), {0: 0, 1: 0})
+        self.assertEqual(self.store.find_address("tb1qa"), [])
+
+    def test_upgrade_from_first_schema(self):
+        path = os.path.join(self.dir.name, "old.db")
+        conn = sqlite3.connect(path)
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.execute("INSERT INTO meta (key, value) VALUES ('schema_version', '1')")
+        conn.execute("INSERT INTO wallets (name, network, m, n, mnemonic) VALUES ('wallet-a', 'regtest', 1, 2, 'x')")
+        conn.commit()
+        conn.close()
+        store = WalletStore(path)
+        self.assertEqual(store.get_meta("schema_version"), str(SCHEMA_VERSION))
+        d = store.load_wallet("wallet-a")
+        self.assertEqual((d["format_version"], d["descriptors"], d["highest_used"]), (0, {}, {}))
+        store.close()
+
+    def test_queries(self):
+        self.store.save_wallet(wallet("wallet-a", fingerprint="aaaaaaaa", cosigners=["bbbbbbbb", "cccccccc"]))
+        self.store.save_wallet(wallet("wallet-b", network="testnet", fingerprint="bbbbbbbb"))
+        self.store.save_wallet(wallet("wallet-c", fingerprint="cccccccc", cosigners=["dddddddd"]))
+        regtest = self.store.list_wallets("regtest")
+        self.assertEqual([w["name"] for w in regtest], ["wallet-a", "wallet-c"])
+        self.assertEqual([w["finalized"] for w in regtest], [True, False])
+        self.assertNotIn("mnemonic", regtest[0])
+        self.assertEqual(len(self.store.list_wallets()), 3)
+        self.store.delete_wallet("wallet-a")
+        self.assertEqual([w["name"] for w in self.store.list_wallets()], ["wallet-b", "wallet-c"])
+
+    def test_permissions(self):
+        path = os.path.join(self.dir.name, "store", "proof.db")
+        store = WalletStore(path)
+        store.save_wallet(wallet("wallet-a"))
+        store.close()
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+        self.assertEqual(os.stat(os.path.dirname(path)).st_mode & 0o777, 0o700)
+        # databases created before are made private too
+        os.chmod(path, 0o644)
+        WalletStore(path).close()
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_failed_write_is_rolled_back(self):
+        w = wallet("wallet-a", cosigners=["bbbbbbbb"])
+        w["cosigners"].append({"fingerprint": "cccccccc"}) # missing xpub
+        self.assertRaises(KeyError, self.store.save_wallet, w)
+        self.assertIsNone(self.store.load_wallet("wallet-a"))
+
+    def test_migrate_json(self):
+        for name in ["wallet-a", "wallet-b"]:
+            d = wallet(name, cosigners=["bbbbbbbb"])
+            with open(os.path.join(self.dir.name, name), "w") as f:
+                f.write(json.dumps({k: d[k] for k in ["mnemonic", "cosigners", "m", "n", "network", "name"]}))
+        with open(os.path.join(self.dir.name, "notes.txt"), "w") as f:
+            f.write("not a wallet")
+        self.assertEqual(self.store.migrate_json(self.dir.name), 2)
+        self.assertEqual(self.store.load_wallet("wallet-b")["cosigners"][0]["fingerprint"], "bbbbbbbb")
+        self.assertTrue(os.path.exists(os.path.join(self.dir.name, "wallet-a")))
+        # only runs once
+        self.store.delete_wallet("wallet-a")
+        self.assertEqual(self.store.migrate_json(self.dir.name), 0)
+        self.assertIsNone(self.store.load_wallet("wallet-a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import asyncio as aio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from proof import telemetry
+
+
+class TelemetryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "logs", "telemetry.jsonl")
+        self.env = mock.patch.dict(os.environ, {"PROOF_TELEMETRY_LOG": self.path, "PROOF_TELEMETRY": "1"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.dir.cleanup()
+
+    def records(self):
+        with open(self.path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_nested_spans(self):
+        async def child():
+            await aio.sleep(0)
+            telemetry.count_subprocess()
+
+        async def run():
+            with telemetry.span("sign_psbt", m=2) as session:
+                with telemetry.span("decodepsbt") as phase:
+                    telemetry.count_subprocess()
+                    phase.set(inputs=3)
+                # tasks started inside a span count towards it
+                await aio.gather(child(), child())
+                telemetry.event("scanned", chunks=4)
+                session.set(signed=True)
+        aio.get_event_loop().run_until_complete(run())
+        phase, event, session = self.records()
+        self.assertEqual((phase["name"], phase["attrs"]["inputs"], phase["subprocesses"]), ("decodepsbt", 3, 1))
+        self.assertEqual((session["name"], session["attrs"], session["subprocesses"]),
+                         ("sign_psbt", {"m": 2, "signed": True}, 3))
+        self.assertEqual((phase["parent"], phase["trace"]), (session["id"], session["id"]))
+        self.assertEqual((event["name"], event["attrs"]["chunks"], event["parent"]), ("scanned", 4, session["id"]))
+        self.assertIsNone(session["parent"])
+        self.assertGreaterEqual(session["duration"], phase["duration"])
+        self.assertAlmostEqual(session["end"] - session["start"], session["duration"], places=5)
+
+    def test_traced(self):
+        @telemetry.traced("sign_psbt")
+        async def sign(m):
+            telemetry.annotate(m=m)
+            with telemetry.span("validation"):
+                pass
+            telemetry.annotate(signed=True)
+            return "signed"
+        self.assertEqual(aio.get_event_loop().run_until_complete(sign(2)), "signed")
+        phase, session = self.records()
+        self.assertEqual((session["name"], session["attrs"]), ("sign_psbt", {"m": 2, "signed": True}))
+        self.assertEqual(phase["parent"], session["id"])
+
+    def test_attributes_cannot_overwrite_fields(self):
+        with telemetry.span("validation", duration=-1) as phase:
+            phase.set(name="other", start=0)
+        [record] = self.records()
+        self.assertEqual(record["name"], "validation")
+        self.assertGreaterEqual(record["duration"], 0)
+        self.assertEqual(record["attrs"], {"duration": -1, "name": "other", "start": 0})
+
+    def test_waiting_and_start_finish(self):
+        with telemetry.span("display") as display:
+            checks = telemetry.span("per_input_validation", inputs=2).start()
+            telemetry.count_wait(0.5)
+            checks.finish()
+            telemetry.count_wait(1.5)
+        checks, display = self.records()
+        self.assertEqual((checks["waiting"], checks["parent"]), (0.5, display["id"]))
+        self.assertEqual(display["waiting"], 2.0)
+
+    def test_errors(self):
+        with self.assertRaises(KeyError):
+            with telemetry.span("decodepsbt"):
+                raise KeyError("inputs")
+        [record] = self.records()
+        self.assertEqual(record["error"], "KeyError")
+
+    def test_off_by_default(self):
+        del os.environ["PROOF_TELEMETRY"]
+        with telemetry.span("decodepsbt") as phase:
+            phase.set(inputs=1)
+        telemetry.event("scanned")
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_unwritable_log(self):
+        blocker = os.path.join(self.dir.name, "file")
+        open(blocker, "w").close()
+        os.environ["PROOF_TELEMETRY_LOG"] = os.path.join(blocker, "telemetry.jsonl")
+        with telemetry.span("decodepsbt"):
+            pass
+
+
+if __name__ == "__main__":
+    unittest.main()
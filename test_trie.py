@@ -0,0 +1,33 @@
+import unittest
+
+from crypto.mnemonic import Mnemonic
+from proof.trie import RadixTrie, bip39_trie
+
+
+class RadixTrieTest(unittest.TestCase):
+    def test_collapsed_options(self):
+        root = RadixTrie.build(["cat", "car", "cart", "dog"])
+        self.assertEqual(root.labels, ("ca*", "dog"))
+        ca = root.options[0][2]
+        self.assertEqual(ca.prefix, "ca")
+        self.assertIs(ca.parent, root)
+        self.assertEqual(ca.labels, ("car", "car*", "cat"))
+        self.assertEqual(ca.options[1][2].labels, ("cart",))
+
+    def test_every_bip39_word_reachable(self):
+        words = []
+        stack = [bip39_trie()]
+        while stack:
+            node = stack.pop()
+            for label, word, child in node.options:
+                if word is not None:
+                    words.append(word)
+                else:
+                    self.assertTrue(label.endswith("*"))
+                    stack.append(child)
+        self.assertEqual(sorted(words), sorted(Mnemonic().wordlist))
+        self.assertIs(bip39_trie(), bip39_trie())
+
+
+if __name__ == "__main__":
+    unittest.main()
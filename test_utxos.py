@@ -0,0 +1,153 @@
+import asyncio as aio
+import json
+import unittest
+
+from proof.utxos import UtxoCache, UNDO_DEPTH, format_btc
+from proof.wallet import Wallet, Cosigner
+
+
+class ChainAdapter:
+    """A fake Bitcoin Core with a chain of blocks paying addresses named '<change>/<idx>'"""
+    def __init__(self):
+        self.blocks = []
+        self.calls = []
+        self.mine([])
+
+    def mine(self, txs, fork=None):
+        height = len(self.blocks) if fork is None else fork
+        del self.blocks[height:]
+        prev = self.blocks[-1]["hash"] if self.blocks else None
+        block_hash = f"{height}-{len(self.calls)}-{len(txs)}-{prev}"
+        self.blocks.append({"height": height, "hash": block_hash, "previousblockhash": prev, "tx": txs})
+
+    def utxo_set(self):
+        utxos = {}
+        for block in self.blocks:
+            for tx in block["tx"]:
+                for vin in tx["vin"]:
+                    utxos.pop((vin["txid"], vin["vout"]), None)
+                for out in tx["vout"]:
+                    utxos[(tx["txid"], out["n"])] = (out, block["height"])
+        return utxos
+
+    async def bitcoin_cli_checkoutput_async(self, *args):
+        self.calls.append(args[0])
+        assert args[0] == "getblockhash"
+        return (self.blocks[int(args[1])]["hash"] + "\n").encode()
+
+    async def bitcoin_cli_json_async(self, *args):
+        self.calls.append(args[0])
+        if args[0] == "deriveaddresses":
+            change = args[1][-1]
+            start, end = json.loads(args[2])
+            return [f"{change}/{i}" for i in range(start, end + 1)]
+        if args[0] == "getblockchaininfo":
+            return {"blocks": len(self.blocks) - 1, "bestblockhash": self.blocks[-1]["hash"]}
+        if args[0] == "getblock":
+            return next(b for b in self.blocks if b["hash"] == args[1])
+        if args[0] == "scantxoutset":
+            watched = {o[len("addr("):-1] for o in json.loads(args[2])}
+            unspents = [
+                {"txid": txid, "vout": vout, "desc": f"addr({out['scriptPubKey']['address']})#abcdefgh",
+                 "amount": out["value"], "height": height}
+                for (txid, vout), (out, height) in self.utxo_set().items()
+                if out["scriptPubKey"]["address"] in watched
+            ]
+            return {"height": len(self.blocks) - 1, "bestblock": self.blocks[-1]["hash"], "unspents": unspents}
+        raise AssertionError(args)
+
+
+def tx(txid, outputs, spends=()):
+    return {
+        "txid": txid,
+        "vin": [{"txid": t, "vout": v} for t, v in spends],
+        "vout": [{"n": n, "value": value, "scriptPubKey": {"address": address}}
+                 for n, (address, value) in enumerate(outputs)]
+    }
+
+
+class UtxoCacheTest(unittest.TestCase):
+    def setUp(self):
+        public = {"xpub": "tpub", "fingerprint": "00000000", "descriptors": {0: "desc/0", 1: "desc/1"}}
+        self.wallet = Wallet("", [Cosigner("11111111", "tpub1")], 1, 2, "regtest", "wallet-a", public)
+        self.chain = ChainAdapter()
+        self.cache = UtxoCache(self.wallet)
+
+    def sync(self, cache=None):
+        return aio.get_event_loop().run_until_complete((cache or self.cache).sync(self.chain, 20))
+
+    def test_build_then_apply_new_blocks(self):
+        self.chain.mine([tx("a", [("0/0", 1.5), ("elsewhere", 2)])])
+        self.assertTrue(self.sync())
+        self.assertEqual(self.chain.calls.count("scantxoutset"), 1)
+        self.assertEqual(self.cache.balance(), 150000000)
+
+        self.chain.calls.clear()
+        self.chain.mine([tx("b", [("1/3", 0.4), ("0/25", 0.00000001)], spends=[("a", 0)])])
+        self.chain.mine([])
+        self.assertTrue(self.sync())
+        self.assertNotIn("scantxoutset", self.chain.calls)
+        self.assertEqual(self.chain.calls.count("getblock"), 2)
+        self.assertEqual(format_btc(self.cache.balance()), "0.40000001")
+        self.assertEqual(self.wallet.highest_used, {0: 25, 1: 3})
+        # addresses past the new highest used one are watched
+        self.chain.mine([tx("c", [("0/45", 1)])])
+        self.sync()
+        self.assertEqual(self.cache.balance(), 140000001)
+        self.assertEqual([(u.change, u.idx) for u in self.cache.spendable()], [(0, 45), (1, 3), (0, 25)])
+        self.assertFalse(self.sync())
+
+    def test_reorg_rewinds_to_fork(self):
+        self.chain.mine([tx("a", [("0/0", 1)])])
+        self.sync()
+        self.chain.mine([tx("b", [("0/1", 2)], spends=[("a", 0)])])
+        self.chain.mine([tx("c", [("0/2", 3)], spends=[("b", 0)])])
+        self.sync()
+        self.assertEqual(self.cache.balance(), 300000000)
+        # blocks 2 and 3 are replaced by a longer branch that only confirms "d"
+        self.chain.mine([tx("d", [("1/0", 4)])], fork=2)
+        self.chain.mine([])
+        self.chain.calls.clear()
+        self.sync()
+        self.assertNotIn("scantxoutset", self.chain.calls)
+        self.assertEqual(self.cache.hash, self.chain.blocks[-1]["hash"])
+        self.assertEqual(sorted(self.cache.utxos), [("a", 0), ("d", 0)])
+
+    def test_deep_reorg_rebuilds(self):
+        self.sync()
+        for i in range(UNDO_DEPTH + 1):
+            self.chain.mine([tx(f"a{i}", [("0/0", 1)])])
+        self.sync()
+        self.chain.mine([tx("b", [("0/1", 1)])], fork=1)
+        self.chain.calls.clear()
+        self.sync()
+        self.assertEqual(self.chain.calls.count("scantxoutset"), 1)
+        self.assertEqual(list(self.cache.utxos), [("b", 0)])
+
+    def test_next_change_index(self):
+        self.wallet._utxos = self.cache
+        self.assertEqual(self.wallet.next_change_index(), 0)
+        self.chain.mine([tx("a", [("1/4", 1), ("1/2", 1)])])
+        self.sync()
+        # the usage recorded by an older scan missed the change coins
+        self.wallet.highest_used = {0: -1, 1: -1}
+        self.assertEqual(self.wallet.next_change_index(), 5)
+        self.chain.mine([tx("b", [("0/0", 1)], spends=[("a", 0), ("a", 1)])])
+        self.sync()
+        self.wallet.highest_used = {0: 0, 1: 1}
+        self.assertEqual(self.wallet.next_change_index(), 5)
+
+    def test_state_round_trip(self):
+        self.chain.mine([tx("a", [("0/0", 1)])])
+        self.sync()
+        json.dumps(self.cache.state())
+        cache = UtxoCache(self.wallet, self.cache.state())
+        self.chain.mine([tx("b", [("0/1", 2)], spends=[("a", 0)])])
+        self.chain.calls.clear()
+        self.sync(cache)
+        self.assertNotIn("scantxoutset", self.chain.calls)
+        self.assertEqual(list(cache.utxos), [("b", 0)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import asyncio as aio
+import unittest
+
+from proof import ux
+from proof.listview import ListView
+
+
+class KeyReaderTest(unittest.TestCase):
+    def _keys(self, *chunks):
+        reader = ux.KeyReader()
+        for chunk in chunks:
+            reader.feed(chunk)
+        keys = []
+        while not reader.queue.empty():
+            keys.append(reader.queue.get_nowait())
+        return keys, reader
+
+    def test_plain_keys(self):
+        keys, _ = self._keys("ab\r")
+        self.assertEqual(keys, ['a', 'b', '\r'])
+
+    def test_escape_sequences(self):
+        keys, _ = self._keys("\x1b[A\x1bOBx\x1b[5~\x1b[1~")
+        self.assertEqual(keys, [ux.KEY_UP, ux.KEY_DOWN, 'x', ux.KEY_PAGE_UP, ux.KEY_HOME])
+
+    def test_split_escape_sequence(self):
+        keys, reader = self._keys("q\x1b", "[", "B")
+        self.assertEqual(keys, ['q', ux.KEY_DOWN])
+        self.assertEqual(reader._buffer, '')
+
+    def test_lone_escape_waits_for_more(self):
+        keys, reader = self._keys("\x1b")
+        self.assertEqual(keys, [])
+        reader._flush()
+        self.assertEqual(reader.queue.get_nowait(), '\x1b')
+
+    def test_bracketed_paste(self):
+        keys, _ = self._keys("\x1b[200~xp", "ub\x1b[2", "01~n")
+        self.assertEqual(keys, ['x', 'p', 'u', 'b', 'n'])
+
+    def test_get_timeout(self):
+        async def run():
+            reader = ux.KeyReader()
+            reader.start = lambda: None
+            self.assertIsNone(await reader.get(0.01))
+            reader.feed("k")
+            self.assertEqual(await reader.get(0.01), 'k')
+        aio.run(run())
+
+
+class ListViewTest(unittest.TestCase):
+    def test_filter(self):
+        options = [f"wallet-{i}" for i in range(1000)] + ["Alpha", "beta"]
+        view = ListView("", options)
+        view.set_query("wallet-99")
+        matches = [options[view.option_index(k)] for k in range(len(view))]
+        self.assertEqual(matches, ["wallet-99"] + [f"wallet-{i}" for i in range(990, 1000)])
+        view.set_query("wallet-999")
+        self.assertEqual(options[view.option_index(0)], "wallet-999")
+        view.set_query("A")
+        self.assertEqual([options[view.option_index(0)]], ["Alpha"])
+        view.set_query("q")
+        self.assertEqual(len(view), 0)
+        view.set_query(None)
+        self.assertEqual(len(view), len(options))
+        self.assertEqual(view.option_index(5), 5)
+
+    def test_move(self):
+        view = ListView("", list("abcdef"))
+        view.move(-1)
+        self.assertEqual(view.selected, 5)
+        view.move(-100)
+        self.assertEqual(view.selected, 0)
+        view.move(4)
+        self.assertEqual(view.selected, 4)
+        view.move(100)
+        self.assertEqual(view.selected, 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
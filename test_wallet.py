@@ -0,0 +1,102 @@
+import asyncio as aio
+import os
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from benchmarks.materialize_wallets import StubAdapter, create_wallets
+from proof import bitcoind, store
+from proof.wallet import Wallet, WalletRegistry
+
+
+class CountingAdapter(StubAdapter):
+    """A stub Bitcoin Core that records how many wallet RPCs run at once"""
+    latency = 0.01
+    running = 0
+    most_running = 0
+    created = []
+    failing = set()
+
+    def respond(self, exe, args):
+        rpc = args[1] if len(args) > 1 else ""
+        if rpc == "createwallet" and args[2] in self.failing:
+            return 1, b"error code: -4"
+        return super().respond(exe, args)
+
+    async def run_subprocess_async(self, exe, *args):
+        cls = CountingAdapter
+        wallet_rpc = len(args) > 1 and args[1] in ("loadwallet", "createwallet")
+        if wallet_rpc:
+            cls.running += 1
+            cls.most_running = max(cls.most_running, cls.running)
+        try:
+            result = await super().run_subprocess_async(exe, *args)
+        finally:
+            if wallet_rpc:
+                cls.running -= 1
+        if wallet_rpc and args[1] == "createwallet" and result[1] == 0:
+            cls.created.append(args[2])
+        return result
+
+
+class WalletRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"HOME": self.dir.name})
+        self.env.start()
+        self.patches = [
+            mock.patch.object(store, "_store", None),
+            mock.patch.object(Wallet, "adapter_class", CountingAdapter),
+        ]
+        for patch in self.patches:
+            patch.start()
+        bitcoind.RUNNING_NETWORKS.discard("regtest")
+        CountingAdapter.running = CountingAdapter.most_running = 0
+        CountingAdapter.created = []
+        CountingAdapter.failing = set()
+        self.names = create_wallets(6)
+        self.registry = WalletRegistry.load("regtest")
+
+    def tearDown(self):
+        store.get_store().close()
+        for patch in reversed(self.patches):
+            patch.stop()
+        bitcoind.RUNNING_NETWORKS.discard("regtest")
+        self.env.stop()
+        self.dir.cleanup()
+
+    def get_many(self, names, concurrency):
+        loop = aio.new_event_loop()
+        try:
+            return loop.run_until_complete(self.registry.get_many(names, concurrency))
+        finally:
+            loop.close()
+
+    def test_order_and_reuse(self):
+        first = self.registry.get(self.names[2])
+        names = list(reversed(self.names))
+        wallets = self.get_many(names, 3)
+        self.assertEqual([w.name for w in wallets], names)
+        self.assertIs(wallets[3], first)
+        # the wallet loaded before was not loaded again
+        self.assertEqual(sorted(CountingAdapter.created), sorted(n for n in self.names if n != self.names[2]))
+        self.assertIs(self.registry.get(names[0]), wallets[0])
+
+    def test_concurrency(self):
+        self.get_many(self.names, 2)
+        self.assertEqual(CountingAdapter.most_running, 2)
+        self.get_many(self.names, 2)
+        # all of them were loaded by the first call
+        self.assertEqual(len(CountingAdapter.created), len(self.names))
+
+    def test_errors_propagate(self):
+        CountingAdapter.failing = {self.names[4]}
+        with self.assertRaises(subprocess.CalledProcessError):
+            self.get_many(self.names, 3)
+        # nothing was registered, so the wallets can be loaded again
+        self.assertEqual(self.registry.wallets, {})
+
+
+if __name__ == "__main__":
+    unittest.main()